@@ -2,7 +2,6 @@ import csv
 import io
 
 from django.contrib.auth.hashers import make_password
-from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -10,6 +9,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from exams.exports import EXPORT_CHUNK_SIZE, stream_csv, stream_excel
+
 from .models import User
 from .serializers import (ChangePasswordSerializer, ExaminerSerializer,
                           LoginSerializer, UserSerializer)
@@ -91,26 +92,23 @@ def current_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_examiners(request):
-    """Export all examiners to CSV"""
-    examiners = User.objects.filter(role='examiner')
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="examiners.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Username', 'Email', 'First Name', 'Last Name', 'Is Active', 'Date Joined'])
-    
-    for examiner in examiners:
-        writer.writerow([
-            examiner.username,
-            examiner.email,
-            examiner.first_name,
-            examiner.last_name,
-            examiner.is_active,
-            examiner.date_joined.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    return response
+    """Export all examiners to CSV (default) or Excel with ?export=excel"""
+    examiners = (
+        User.objects.filter(role='examiner')
+        .order_by('pk')
+        .values_list('username', 'email', 'first_name', 'last_name', 'is_active', 'date_joined')
+    )
+
+    header = ['Username', 'Email', 'First Name', 'Last Name', 'Is Active', 'Date Joined']
+    rows = (
+        [username, email, first_name, last_name, is_active, date_joined.strftime('%Y-%m-%d %H:%M:%S')]
+        for username, email, first_name, last_name, is_active, date_joined
+        in examiners.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    if request.query_params.get('export') == 'excel':
+        return stream_excel('examiners.xlsx', 'Examiners', header, rows)
+    return stream_csv('examiners.csv', header, rows)
 
 
 @api_view(['POST'])
@@ -5,8 +5,9 @@ from unfold.admin import ModelAdmin
 from unfold.contrib.import_export.forms import ExportForm, ImportForm
 from unfold.paginator import InfinitePaginator
 # from accounts.models import User
-from .models import (CarePlan, Procedure, ProcedureStep, ProcedureStepScore,
-                     Program, ReconciledScore, Student, StudentProcedure)
+from .models import (AssessmentEvent, BackgroundJob, CarePlan, Procedure, ProcedureStep, ProcedureStepScore,
+                     Program, ReconciledScore, ScoreSyncReceipt, Student,
+                     StudentGradeSummary, StudentProcedure)
 
 
 # ============== RESOURCES ==============
@@ -216,6 +217,36 @@ class ReconciledScoreAdmin(ModelAdmin):
     )
     date_hierarchy = 'reconciled_at'
 
+@admin.register(ScoreSyncReceipt)
+class ScoreSyncReceiptAdmin(ModelAdmin):
+    list_display = ('key', 'examiner', 'student_procedure', 'outcome', 'processed_at')
+    list_filter = ('outcome', 'processed_at')
+    search_fields = ('key', 'examiner__username')
+    date_hierarchy = 'processed_at'
+
+@admin.register(AssessmentEvent)
+class AssessmentEventAdmin(ModelAdmin):
+    list_display = ('id', 'kind', 'student_procedure', 'status', 'actor', 'created_at')
+    list_filter = ('kind', 'program', 'created_at')
+    search_fields = ('student__index_number', 'student__full_name')
+    date_hierarchy = 'created_at'
+    readonly_fields = [field.name for field in AssessmentEvent._meta.fields]
+
+@admin.register(StudentGradeSummary)
+class StudentGradeSummaryAdmin(ModelAdmin):
+    list_display = ('student', 'total_score', 'max_score', 'percentage', 'grade', 'reconciled_count', 'updated_at')
+    list_filter = ('grade', 'student__program', 'student__level')
+    search_fields = ('student__index_number', 'student__full_name')
+    readonly_fields = [field.name for field in StudentGradeSummary._meta.fields]
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'created_at')
+    search_fields = ('id', 'created_by__username')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
 # Care Plan Admin
 @admin.register(CarePlan)
 class CarePlanAdmin(ModelAdmin):
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ExamsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'exams'
+
+    def ready(self):
+        # Signal receivers that invalidate cached reference data and statistics,
+        # refresh grade summaries and recount scoring after step changes
+        from . import dashboard, grades, reference, scoring  # noqa: F401
@@ -0,0 +1,102 @@
+from .models import StudentProcedure
+from .reference import procedure_steps
+
+
+class AssessmentContext:
+    """
+    Everything the procedure detail screen needs for one student, loaded once
+    per request and shared by every ProcedureDetailSerializer field:
+
+    - the StudentProcedure (with examiners and assigned reconciler)
+    - the procedure's steps
+    - the current examiner's step scores
+    """
+
+    def __init__(self, procedure, student_procedure, steps, user_scores, user=None):
+        self.procedure = procedure
+        self.student_procedure = student_procedure
+        self.steps = steps
+        self.user_scores = user_scores
+        self.user = user
+
+    @classmethod
+    def load(cls, procedure, student_id=None, user=None, student_procedure=None):
+        """
+        Build the context with at most three queries (student procedure, steps,
+        user scores), whatever the number of steps. Pass `student_procedure`
+        when the caller already holds it to skip the lookup.
+        """
+        if student_procedure is None and student_id:
+            student_procedure = (
+                StudentProcedure.objects
+                .select_related('examiner_a', 'examiner_b', 'assigned_reconciler')
+                .filter(student_id=student_id, procedure=procedure)
+                .first()
+            )
+
+        # Reuses the prefetch cache when the queryset prefetched steps,
+        # otherwise the cached reference copy
+        if 'steps' in getattr(procedure, '_prefetched_objects_cache', {}):
+            steps = list(procedure.steps.all())
+        else:
+            steps = procedure_steps(procedure.pk)
+
+        user_scores = []
+        if student_procedure is not None and user is not None and user.is_authenticated:
+            user_scores = list(student_procedure.step_scores.filter(examiner=user))
+
+        return cls(procedure, student_procedure, steps, user_scores, user)
+
+    # ------------------------------------------------------------------
+    # Derived state (no queries)
+    # ------------------------------------------------------------------
+
+    @property
+    def user_id(self):
+        return self.user.pk if self.user is not None else None
+
+    @property
+    def examiner_role(self):
+        sp = self.student_procedure
+        if sp is None or self.user_id is None:
+            return None
+        if self.user_id == sp.examiner_a_id:
+            return "A"
+        if self.user_id == sp.examiner_b_id:
+            return "B"
+        return None
+
+    @property
+    def is_examiner(self):
+        return self.examiner_role is not None
+
+    @property
+    def both_examiners_assigned(self):
+        sp = self.student_procedure
+        return sp is not None and sp.examiner_a_id != sp.examiner_b_id
+
+    @property
+    def is_locked(self):
+        sp = self.student_procedure
+        if sp is None:
+            return False
+        return sp.assigned_reconciler_id is not None or sp.status == "reconciled"
+
+    @property
+    def can_modify_scores(self):
+        """
+        Cannot modify if:
+        1. Not an assigned examiner
+        2. Reconciler has been assigned (locked)
+        3. Already reconciled
+        """
+        sp = self.student_procedure
+        if sp is None:
+            return True  # New procedure, can score
+        if sp.status == "reconciled":
+            return False
+        if not self.is_examiner:
+            return False
+        if sp.assigned_reconciler_id is not None:
+            return False
+        return True
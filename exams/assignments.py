@@ -0,0 +1,193 @@
+"""
+Bulk examiner assignment for a cohort, planned in memory before an exam.
+
+assign_examiners() pairs every (student, procedure) of a program (and
+level) with two examiners from a pool and writes the StudentProcedure
+rows with one bulk_create and one bulk_update, in the transaction that
+read and locked the existing rows. Rows whose scoring has started, or
+that have a reconciler, are never touched.
+Rows that already have two examiners are kept unless `overwrite` is set,
+and count toward the pool's load.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+
+from accounts.models import User
+
+from .dashboard import invalidate_dashboard
+from .models import Procedure, Student, StudentProcedure
+
+
+class AssignmentError(Exception):
+    """An assignment request that cannot be planned; carries the API detail and status code."""
+
+    def __init__(self, detail, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def plan_pairs(count, examiner_ids, load=None):
+    """
+    `count` (examiner_a, examiner_b) pairs from `examiner_ids`. Each pair
+    takes the least-loaded examiner and the least-loaded other one, ties
+    going to whoever was paired with them least often, so loads end at
+    most one assessment apart (beyond any uneven starting `load`) and
+    pairs rotate.
+    """
+    if len(set(examiner_ids)) < 2:
+        raise AssignmentError("At least two examiners are needed.")
+    examiner_ids = sorted(set(examiner_ids))
+    load = {examiner_id: (load or {}).get(examiner_id, 0) for examiner_id in examiner_ids}
+    paired = Counter()
+
+    pairs = []
+    for _ in range(count):
+        first = min(examiner_ids, key=lambda examiner_id: (load[examiner_id], examiner_id))
+        second = min(
+            (examiner_id for examiner_id in examiner_ids if examiner_id != first),
+            key=lambda examiner_id: (load[examiner_id], paired[first, examiner_id], examiner_id),
+        )
+        load[first] += 1
+        load[second] += 1
+        paired[first, second] += 1
+        paired[second, first] += 1
+        pairs.append((first, second))
+    return pairs
+
+
+def _is_started(sp):
+    return (
+        sp.status != 'pending'
+        or sp.assigned_reconciler_id is not None
+        or sp.examiner_a_scored_steps
+        or sp.examiner_b_scored_steps
+    )
+
+
+def _plan_assignments(assessments, student_ids, procedure_ids, examiners, overwrite):
+    """
+    (to_create, to_update, load, unchanged, skipped) for every (student,
+    procedure) pair, reading the existing rows from `assessments`.
+    """
+    existing = {
+        (sp.student_id, sp.procedure_id): sp
+        for sp in assessments.filter(
+            student_id__in=student_ids, procedure_id__in=procedure_ids
+        ).only(
+            'student_id', 'procedure_id', 'examiner_a_id', 'examiner_b_id', 'status',
+            'assigned_reconciler_id', 'examiner_a_scored_steps', 'examiner_b_scored_steps',
+        )
+    }
+
+    load = Counter()
+    slots = []
+    skipped = unchanged = 0
+    for student_id in student_ids:
+        for procedure_id in procedure_ids:
+            sp = existing.get((student_id, procedure_id))
+            if sp is not None and _is_started(sp):
+                skipped += 1
+            elif sp is not None and not overwrite and sp.examiner_a_id != sp.examiner_b_id:
+                unchanged += 1
+                load.update(examiner_id for examiner_id in (sp.examiner_a_id, sp.examiner_b_id)
+                            if examiner_id in examiners)
+            else:
+                slots.append((student_id, procedure_id, sp))
+
+    to_create = []
+    to_update = []
+    now = timezone.now()
+    for (student_id, procedure_id, sp), (examiner_a_id, examiner_b_id) in zip(
+        slots, plan_pairs(len(slots), list(examiners), load)
+    ):
+        load[examiner_a_id] += 1
+        load[examiner_b_id] += 1
+        if sp is None:
+            to_create.append(StudentProcedure(
+                student_id=student_id, procedure_id=procedure_id,
+                examiner_a_id=examiner_a_id, examiner_b_id=examiner_b_id,
+            ))
+        elif (sp.examiner_a_id, sp.examiner_b_id) != (examiner_a_id, examiner_b_id):
+            sp.examiner_a_id, sp.examiner_b_id = examiner_a_id, examiner_b_id
+            sp.updated_at = now  # bulk_update skips auto_now
+            to_update.append(sp)
+        else:
+            unchanged += 1
+    return to_create, to_update, load, unchanged, skipped
+
+
+def assign_examiners(program_id, examiner_ids, level=None, procedure_ids=None,
+                     overwrite=False, dry_run=False, batch_size=500):
+    """
+    Plan (and unless `dry_run`, write) the examiner pairs for the active
+    students of `program_id` (at `level`, if given) on `procedure_ids`
+    (default: all the program's procedures). Returns a summary with the
+    row counts and each pool examiner's resulting load. Raises
+    AssignmentError (409) if another request creates one of the
+    assessments while this one runs.
+    """
+    examiners = {
+        examiner.pk: examiner
+        for examiner in User.objects.filter(pk__in=examiner_ids, role='examiner', is_active=True)
+    }
+    unknown = sorted(set(examiner_ids) - set(examiners))
+    if unknown:
+        raise AssignmentError(f"Not active examiners: {unknown}")
+
+    procedures = Procedure.objects.filter(program_id=program_id)
+    if procedure_ids is not None:
+        procedures = procedures.filter(pk__in=procedure_ids)
+    procedure_ids_found = sorted(procedures.values_list('pk', flat=True))
+    if procedure_ids is not None and len(procedure_ids_found) != len(set(procedure_ids)):
+        raise AssignmentError(
+            f"Procedures not in this program: {sorted(set(procedure_ids) - set(procedure_ids_found))}"
+        )
+
+    students = Student.objects.filter(program_id=program_id, is_active=True)
+    if level:
+        students = students.filter(level=level)
+    student_ids = list(students.order_by('index_number').values_list('pk', flat=True))
+
+    if dry_run:
+        to_create, to_update, load, unchanged, skipped = _plan_assignments(
+            StudentProcedure.objects.all(), student_ids, procedure_ids_found, examiners, overwrite
+        )
+    else:
+        try:
+            with transaction.atomic():
+                # Locked until the writes commit, so scoring cannot start on a
+                # row between the check in the plan and the write
+                to_create, to_update, load, unchanged, skipped = _plan_assignments(
+                    StudentProcedure.objects.select_for_update(), student_ids, procedure_ids_found,
+                    examiners, overwrite,
+                )
+                StudentProcedure.objects.bulk_create(to_create, batch_size=batch_size)
+                StudentProcedure.objects.bulk_update(
+                    to_update, ['examiner_a', 'examiner_b', 'updated_at'], batch_size=batch_size
+                )
+                if to_create:
+                    # Bulk writes send no signals
+                    invalidate_dashboard()
+        except IntegrityError:
+            # Another request created one of the assessments meanwhile
+            raise AssignmentError(
+                "Assignments changed while planning; try again.", status.HTTP_409_CONFLICT
+            )
+
+    return {
+        'dry_run': dry_run,
+        'students': len(student_ids),
+        'procedures': len(procedure_ids_found),
+        'created': len(to_create),
+        'updated': len(to_update),
+        'unchanged': unchanged,
+        'skipped': skipped,
+        'load': [
+            {'id': examiner.pk, 'name': examiner.get_full_name(), 'assessments': load[examiner.pk]}
+            for examiner in sorted(examiners.values(), key=lambda examiner: examiner.pk)
+        ],
+    }
@@ -0,0 +1,374 @@
+"""
+Synthetic-data benchmarks for the exam-day hot paths.
+
+Each scenario seeds its own data inside a transaction that is rolled back
+afterwards, so it is safe to run against a development database:
+
+    python manage.py benchmark reconciliation --sizes 10 40 80
+"""
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+import uuid
+from io import BytesIO
+
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+
+from .models import (Procedure, ProcedureStep, ProcedureStepScore, Program, ReconciledScore,
+                     Student, StudentGradeSummary, StudentProcedure)
+
+SCENARIOS = {}
+
+
+def scenario(name, default_sizes):
+    """Register a benchmark scenario run once per size."""
+    def register(func):
+        func.default_sizes = default_sizes
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def run_scenario(name, sizes=None, repeat=10):
+    """Run a registered scenario for each size and roll back everything it seeded."""
+    func = SCENARIOS[name]
+    results = []
+    with transaction.atomic():
+        for size in sizes or func.default_sizes:
+            results.append({'size': size, **func(size, repeat)})
+        transaction.set_rollback(True)
+    return results
+
+
+class QueryCounter:
+    """execute_wrapper counting statements; unlike CaptureQueriesContext it has no 9000-query cap."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, repeat):
+    """Call `func` `repeat` times; return latency (ms) and queries per call."""
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = counter.count
+    return {
+        'median_ms': round(statistics.median(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': queries,
+    }
+
+
+def peak_memory(func):
+    """Peak Python memory (MB) allocated while calling `func` once."""
+    tracemalloc.start()
+    try:
+        func()
+        return round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def call_view(view, user, method='get', path='/', data=None, **kwargs):
+    """Dispatch a DRF view directly and render the response."""
+    factory = APIRequestFactory()
+    request = getattr(factory, method)(path, data, format='json' if method != 'get' else None)
+    force_authenticate(request, user=user)
+    response = view(request, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+# ------------------------------------------------------------------
+# Seeding helpers
+# ------------------------------------------------------------------
+
+def seed_examiners(count=2):
+    tag = uuid.uuid4().hex[:8]
+    return [
+        User.objects.create(username=f'bench-{tag}-{i}', role='examiner', first_name='Bench', last_name=str(i))
+        for i in range(count)
+    ]
+
+
+def seed_program():
+    tag = uuid.uuid4().hex[:8]
+    return Program.objects.create(name=f'Benchmark Program {tag}', abbreviation=f'B{tag}')
+
+
+def seed_students(program, count, level='300'):
+    tag = uuid.uuid4().hex[:8]
+    return Student.objects.bulk_create([
+        Student(index_number=f'BENCH-{tag}-{i:05d}', full_name=f'Bench Student {i}', program=program, level=level)
+        for i in range(count)
+    ])
+
+
+def seed_procedure(program, step_count, name=None):
+    procedure = Procedure.objects.create(
+        program=program, name=name or f'Procedure {uuid.uuid4().hex[:8]}', total_score=step_count * 4
+    )
+    ProcedureStep.objects.bulk_create([
+        ProcedureStep(procedure=procedure, step_order=order, description=f'Step {order}')
+        for order in range(1, step_count + 1)
+    ])
+    return procedure
+
+
+def seed_scored_assessment(student, procedure, examiner_a, examiner_b):
+    """A StudentProcedure both examiners have fully scored."""
+    sp = StudentProcedure.objects.create(
+        student=student, procedure=procedure,
+        examiner_a=examiner_a, examiner_b=examiner_b, status='scored',
+    )
+    ProcedureStepScore.objects.bulk_create([
+        ProcedureStepScore(student_procedure=sp, step=step, examiner=examiner, score=(step.step_order + offset) % 5)
+        for step in procedure.steps.all()
+        for offset, examiner in enumerate((examiner_a, examiner_b))
+    ])
+    sp.refresh_scoring_counters()
+    sp.save(update_fields=StudentProcedure.COUNTER_FIELDS)
+    return sp
+
+
+# ------------------------------------------------------------------
+# Scenarios
+# ------------------------------------------------------------------
+
+@scenario('reconciliation', default_sizes=(10, 40, 80, 160))
+def reconciliation(step_count, repeat):
+    """Reconciliation screen load for a procedure with `step_count` steps."""
+    from .views import ReconciliationView
+
+    examiner_a, examiner_b = seed_examiners()
+    program = seed_program()
+    student = seed_students(program, 1)[0]
+    procedure = seed_procedure(program, step_count)
+    seed_scored_assessment(student, procedure, examiner_a, examiner_b)
+
+    view = ReconciliationView.as_view()
+    return measure(
+        lambda: call_view(view, examiner_b, student_id=student.id, procedure_id=procedure.id),
+        repeat,
+    )
+
+
+def legacy_import_students(data):
+    """The row-by-row student import the set-based importer replaced, kept as a baseline."""
+    created_count = updated_count = 0
+    for row in data:
+        program = Program.objects.get(name=row['Program'])
+        student, created = Student.objects.update_or_create(
+            index_number=row['Index Number'],
+            defaults={
+                'full_name': row['Full Name'],
+                'program': program,
+                'level': row['Level'],
+                'is_active': row['Status'].lower() in ['yes', 'true', '1', 'active'],
+            }
+        )
+        if created:
+            created_count += 1
+        else:
+            updated_count += 1
+    return created_count, updated_count
+
+
+@scenario('student_import', default_sizes=(500, 1000, 3000))
+def student_import(row_count, repeat):
+    """
+    Student import of `row_count` rows, half of them new, through the
+    legacy per-row path and the set-based importer (rows per second).
+    """
+    from .importers import import_students
+
+    program = seed_program()
+    existing = seed_students(program, row_count // 2)
+    tag = uuid.uuid4().hex[:8]
+    rows = [
+        {'Index Number': s.index_number, 'Full Name': s.full_name + ' Jr', 'Program': program.name,
+         'Level': '400', 'Status': 'Yes'}
+        for s in existing
+    ] + [
+        {'Index Number': f'NEW-{tag}-{i:05d}', 'Full Name': f'New Student {i}', 'Program': program.name,
+         'Level': '100', 'Status': 'Yes'}
+        for i in range(row_count - len(existing))
+    ]
+
+    def run(importer):
+        # Each call starts from the same state
+        def call():
+            sid = transaction.savepoint()
+            importer(rows)
+            transaction.savepoint_rollback(sid)
+        return measure(call, repeat)
+
+    legacy = run(legacy_import_students)
+    bulk = run(lambda data: import_students(enumerate(data, start=2)))
+    return {
+        'legacy_rows_s': round(row_count / legacy['median_ms'] * 1000),
+        'bulk_rows_s': round(row_count / bulk['median_ms'] * 1000),
+        'legacy_queries': legacy['queries'],
+        'bulk_queries': bulk['queries'],
+        'speedup': f"{legacy['median_ms'] / bulk['median_ms']:.1f}x",
+    }
+
+
+@scenario('procedure_import', default_sizes=(20, 50, 100))
+def procedure_import(procedure_count, repeat, program_count=5, step_count=20):
+    """
+    Excel curriculum import of `procedure_count` shared procedures with
+    `step_count` steps each, copied to every program (steps per second).
+    """
+    from openpyxl import Workbook
+
+    from .importers import import_procedures_excel
+
+    for _ in range(program_count):
+        seed_program()
+    tag = uuid.uuid4().hex[:8]
+    names = [f'Procedure {tag} {i}' for i in range(procedure_count)]
+
+    wb = Workbook()
+    wb.active.title = 'Procedures'
+    wb.active.append(['Name', 'Program', 'Total Score'])
+    for name in names:
+        wb.active.append([name, None, step_count * 4])
+    ws = wb.create_sheet('Procedure Steps')
+    ws.append(['Procedure Name', 'Step Order', 'Description'])
+    for name in names:
+        for order in range(1, step_count + 1):
+            ws.append([name, order, f'Step {order} of {name}'])
+    buffer = BytesIO()
+    wb.save(buffer)
+
+    result = {}
+
+    def call():
+        sid = transaction.savepoint()
+        buffer.seek(0)
+        result.update(import_procedures_excel(buffer))
+        transaction.savepoint_rollback(sid)
+
+    timing = measure(call, repeat)
+    return {
+        'steps': result['steps_created'],
+        'median_ms': timing['median_ms'],
+        'steps_s': round(result['steps_created'] / timing['median_ms'] * 1000),
+        'queries': timing['queries'],
+    }
+
+
+def legacy_grades_pdf(data, output):
+    """The single-Table grades PDF the paginated report engine replaced, kept as a baseline."""
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    from .reports import GRID_STYLE
+
+    doc = SimpleDocTemplate(output, pagesize=landscape(letter))
+    table_data = [['Index Number', 'Full Name', 'Program', 'Level', 'Percentage (%)', 'Grade']]
+    for item in data:
+        table_data.append([
+            item['index_number'], item['full_name'], item['program_name'], item['level'],
+            f"{item['percentage']}%", item['grade'],
+        ])
+    table = Table(table_data, repeatRows=1)
+    table.setStyle(TableStyle(GRID_STYLE))
+    doc.build([Paragraph("Student Grades Report", getSampleStyleSheet()['Title']), table])
+
+
+@scenario('grades_pdf', default_sizes=(100, 1000, 10000))
+def grades_pdf(student_count, repeat):
+    """
+    Grades PDF export of `student_count` students, through the legacy
+    single-Table layout and the paginated report engine (latency and
+    peak memory). The legacy layout is quadratic; use a low --repeat.
+    """
+    from .views import StudentGradesView
+
+    program = seed_program()
+    students = seed_students(program, student_count)
+    StudentGradeSummary.objects.bulk_create([
+        StudentGradeSummary(student=student, percentage=(i * 7) % 100, grade='B')
+        for i, student in enumerate(students)
+    ])
+    view = StudentGradesView()
+    params = {'program_id': str(program.id)}
+
+    def run(write):
+        def call():
+            data = view._iter_grades_data(view.get_export_queryset(params).iterator())
+            with tempfile.TemporaryFile() as output:
+                write(data, output)
+        return {**measure(call, repeat), 'peak_mb': peak_memory(call)}
+
+    legacy = run(legacy_grades_pdf)
+    paged = run(view._write_pdf)
+    return {
+        'legacy_ms': legacy['median_ms'],
+        'paged_ms': paged['median_ms'],
+        'legacy_peak_mb': legacy['peak_mb'],
+        'paged_peak_mb': paged['peak_mb'],
+        'speedup': f"{legacy['median_ms'] / paged['median_ms']:.1f}x",
+    }
+
+
+@scenario('transcripts', default_sizes=(50, 200, 1000))
+def transcripts(student_count, repeat, procedure_count=5, step_count=10):
+    """
+    Transcript ZIP of `student_count` students with `procedure_count`
+    reconciled procedures each, rendered in-process and on a pool of one
+    worker per core (transcripts per second).
+    """
+    from .transcripts import write_transcripts_zip
+
+    program = seed_program()
+    examiner_a, examiner_b = seed_examiners()
+    students = seed_students(program, student_count)
+    procedures = [seed_procedure(program, step_count) for _ in range(procedure_count)]
+    assessments = StudentProcedure.objects.bulk_create([
+        StudentProcedure(student=student, procedure=procedure, examiner_a=examiner_a,
+                         examiner_b=examiner_b, status='reconciled')
+        for student in students for procedure in procedures
+    ])
+    steps = {procedure.pk: list(procedure.steps.all()) for procedure in procedures}
+    ReconciledScore.objects.bulk_create([
+        ReconciledScore(student_procedure=sp, step=step, score=i % 5, reconciled_by=examiner_b)
+        for sp in assessments for i, step in enumerate(steps[sp.procedure_id])
+    ], batch_size=1000)
+    queryset = Student.objects.filter(program=program).order_by('index_number')
+
+    def run(workers):
+        def call():
+            with tempfile.TemporaryFile() as output:
+                write_transcripts_zip(queryset, output, workers=workers)
+        return measure(call, repeat)
+
+    serial = run(1)
+    pooled = run(os.cpu_count() or 1)
+    return {
+        'workers': os.cpu_count() or 1,
+        'serial_ms': serial['median_ms'],
+        'pool_ms': pooled['median_ms'],
+        'pool_per_s': round(student_count / pooled['median_ms'] * 1000),
+        'speedup': f"{serial['median_ms'] / pooled['median_ms']:.1f}x",
+        'queries': pooled['queries'],
+    }
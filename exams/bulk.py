@@ -0,0 +1,24 @@
+"""
+Bulk write helpers shared by the importers and the precomputed tables.
+"""
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size=500):
+    """
+    INSERT ... ON CONFLICT DO UPDATE `objs` on `unique_fields`, one statement
+    per batch.
+
+    PostgreSQL and SQLite need the conflict target named. MySQL's ON
+    DUPLICATE KEY UPDATE cannot name one and fires on any unique key; the
+    rows written here can only clash on their natural key (or on the
+    primary key of the same row), so the result is the same.
+    """
+    features = connections[router.db_for_write(model)].features
+    return model.objects.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=unique_fields if features.supports_update_conflicts_with_target else None,
+        update_fields=update_fields,
+    )
@@ -0,0 +1,68 @@
+"""
+Conditional GET (ETag / Last-Modified) for endpoints tablets poll.
+
+A view states what its payload depends on through get_validators(), which
+should cost one indexed lookup at most. When the client's If-None-Match (or
+If-Modified-Since) still matches, the view answers 304 Not Modified without
+loading or serializing anything.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """A strong ETag for the repr of `parts`."""
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+class ConditionalGetMixin:
+    """
+    For DRF views. get_validators(request) returns (etag, last_modified)
+    built from version stamps (last_modified may be None), or None when the
+    response cannot be validated up front, e.g. because this GET may change
+    the resource; they are then read again after the full response, so its
+    headers describe the state actually served.
+    """
+
+    def get_validators(self, request):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators(request)
+        if validators is not None:
+            not_modified = self._conditional_response(request, *validators)
+            if not_modified is not None:
+                return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            if validators is None:
+                validators = self.get_validators(request)
+            if validators is not None:
+                etag, last_modified = validators
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified.timestamp())
+            # Payloads are per user; always revalidate
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _conditional_response(self, request, etag, last_modified):
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified is not None else None,
+        )
+        if response is not None:
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+def latest(*timestamps):
+    """The latest of `timestamps`, or None if any is unknown."""
+    if any(timestamp is None for timestamp in timestamps):
+        return None
+    return max(timestamps)
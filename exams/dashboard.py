@@ -0,0 +1,151 @@
+"""
+Admin dashboard statistics.
+
+Computed from grouped, conditional aggregates: one query over students,
+one over assessments, one over examiners, plus the cached reference data.
+The result is kept in the cache for DASHBOARD_CACHE_TIMEOUT seconds.
+Saving or deleting a student, an examiner, or an assessment whose status
+changes drops it (see the signal receivers below); bulk writes call
+invalidate_dashboard() themselves. Program and procedure changes orphan
+it through the reference version in its key.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import User
+
+from .models import Program, Student, StudentProcedure
+from .reference import cached, reference_version
+
+STATUSES = [status for status, _ in StudentProcedure.STATUS_CHOICES]
+
+
+def _cache_key():
+    return f'exams:dashboard:{reference_version()}'
+
+
+def _programs():
+    """[(id, name, abbreviation, procedure count)] for every program."""
+    return cached('dashboard-programs', lambda: list(
+        Program.objects
+        .annotate(procedure_count=Count('procedure'))
+        .order_by('name')
+        .values_list('id', 'name', 'abbreviation', 'procedure_count')
+    ))
+
+
+def _empty_counts():
+    return {
+        'total_students': 0,
+        'active_students': 0,
+        **{f'{status}_assessments': 0 for status in STATUSES},
+    }
+
+
+def compute_dashboard_stats():
+    programs = _programs()
+    by_program = {
+        program_id: {
+            'id': program_id, 'name': name, 'abbreviation': abbreviation,
+            'total_procedures': procedure_count, **_empty_counts(),
+        }
+        for program_id, name, abbreviation, procedure_count in programs
+    }
+    by_level = {
+        level: {'level': level, 'label': label, **_empty_counts()}
+        for level, label in Student.LEVEL_CHOICES
+    }
+    totals = _empty_counts()
+
+    def add(program_id, level, field, value):
+        totals[field] += value
+        for breakdown, key in ((by_program, program_id), (by_level, level)):
+            if key in breakdown:
+                breakdown[key][field] += value
+
+    students = (
+        Student.objects
+        .values_list('program_id', 'level')
+        .annotate(total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+        .order_by()
+    )
+    for program_id, level, total, active in students:
+        add(program_id, level, 'total_students', total)
+        add(program_id, level, 'active_students', active)
+
+    assessments = (
+        StudentProcedure.objects
+        .values_list('student__program_id', 'student__level', 'status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for program_id, level, status, count in assessments:
+        add(program_id, level, f'{status}_assessments', count)
+
+    return {
+        **totals,
+        'total_examiners': User.objects.filter(role="examiner").count(),
+        'total_procedures': sum(program[3] for program in programs),
+        'total_programs': len(programs),
+        'programs': list(by_program.values()),
+        'levels': list(by_level.values()),
+    }
+
+
+def dashboard_stats():
+    """The dashboard statistics, from the cache when fresh."""
+    key = _cache_key()
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(key, stats, settings.DASHBOARD_CACHE_TIMEOUT)
+    return stats
+
+
+def _drop_cached_stats():
+    cache.delete(_cache_key())
+
+
+def invalidate_dashboard(using=DEFAULT_DB_ALIAS):
+    """
+    Drop the cached statistics now and once the surrounding transaction
+    commits, so a copy cached from the old rows meanwhile goes too.
+    """
+    _drop_cached_stats()
+    connection = transaction.get_connection(using)
+    if not any(func is _drop_cached_stats for _, func, *_ in connection.run_on_commit):
+        transaction.on_commit(_drop_cached_stats, using=using)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def student_changed(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    invalidate_dashboard(using)
+
+
+@receiver(post_save, sender=StudentProcedure)
+def assessment_saved(sender, created=False, update_fields=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Autosave saves the counters on every score; only status counts here
+    if created or update_fields is None or 'status' in update_fields:
+        invalidate_dashboard(using)
+
+
+@receiver(post_delete, sender=StudentProcedure)
+def assessment_deleted(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    invalidate_dashboard(using)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, created=False, update_fields=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Logins save last_login only
+    if created or update_fields is None or 'role' in update_fields:
+        invalidate_dashboard(using)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    invalidate_dashboard(using)
@@ -0,0 +1,98 @@
+"""
+Bulk deletion of students and procedures, and a preview of its cost.
+
+queryset.delete() has Django's collector load every cascaded row into
+memory (assessments, step scores, reconciled scores, care plans...) and
+holds the locks until the whole delete commits. delete_students() and
+delete_procedures() delete in batches of DELETE_BATCH_SIZE, each batch in
+its own transaction. Each dependent table is emptied with one raw DELETE
+per batch, deepest first, so no rows are loaded.
+
+The raw deletes are safe because each plan below lists every table that
+cascades from its model (the tests compare them with the collector) and
+none of those tables is PROTECTed. Raw deletes send no signals, so the
+dashboard and reference caches are invalidated here, and the grade
+summaries of students who lose reconciled procedures are refreshed.
+
+preview_delete() returns the row count each delete would remove, from
+COUNT queries over the same plan.
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+
+from .dashboard import invalidate_dashboard
+from .grades import reconciled_student_ids, refresh_grade_summaries
+from .models import (AssessmentEvent, CarePlan, Procedure, ProcedureStep, ProcedureStepScore,
+                     ReconciledScore, ScoreSyncReceipt, Student, StudentGradeSummary,
+                     StudentProcedure)
+from .reference import invalidate_reference_data
+
+DELETE_BATCH_SIZE = 200
+
+# (model, ids -> filter) for every table a delete cascades to, deepest
+# first, ending with the model itself
+STUDENT_DELETE_PLAN = [
+    (ProcedureStepScore, lambda ids: Q(student_procedure__student_id__in=ids)),
+    (ReconciledScore, lambda ids: Q(student_procedure__student_id__in=ids)),
+    (ScoreSyncReceipt, lambda ids: Q(student_procedure__student_id__in=ids)),
+    (AssessmentEvent, lambda ids: Q(student_id__in=ids) | Q(student_procedure__student_id__in=ids)),
+    (StudentProcedure, lambda ids: Q(student_id__in=ids)),
+    (CarePlan, lambda ids: Q(student_id__in=ids)),
+    (StudentGradeSummary, lambda ids: Q(student_id__in=ids)),
+    (Student, lambda ids: Q(pk__in=ids)),
+]
+
+PROCEDURE_DELETE_PLAN = [
+    (ProcedureStepScore, lambda ids: Q(step__procedure_id__in=ids) | Q(student_procedure__procedure_id__in=ids)),
+    (ReconciledScore, lambda ids: Q(step__procedure_id__in=ids) | Q(student_procedure__procedure_id__in=ids)),
+    (ScoreSyncReceipt, lambda ids: Q(student_procedure__procedure_id__in=ids)),
+    (AssessmentEvent, lambda ids: Q(procedure_id__in=ids) | Q(student_procedure__procedure_id__in=ids)),
+    (StudentProcedure, lambda ids: Q(procedure_id__in=ids)),
+    (ProcedureStep, lambda ids: Q(procedure_id__in=ids)),
+    (Procedure, lambda ids: Q(pk__in=ids)),
+]
+
+
+def _label(model):
+    return model._meta.label
+
+
+def preview_delete(plan, ids):
+    """{model label: rows deleted} for deleting `ids` with `plan`, as queryset.delete() reports it."""
+    return {_label(model): model.objects.filter(lookup(ids)).count() for model, lookup in plan}
+
+
+def _delete_batches(plan, ids, batch_size, before_batch=None, using=DEFAULT_DB_ALIAS):
+    model = plan[-1][0]
+    ids = sorted(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    deleted = dict.fromkeys((_label(model) for model, _ in plan), 0)
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        with transaction.atomic(using=using):
+            after_batch = before_batch(batch) if before_batch else None
+            for model, lookup in plan:
+                queryset = model.objects.filter(lookup(batch))
+                deleted[_label(model)] += queryset._raw_delete(using)
+            if after_batch:
+                after_batch()
+            invalidate_dashboard(using)
+    return deleted
+
+
+def delete_students(student_ids, batch_size=DELETE_BATCH_SIZE):
+    """Delete the students `student_ids` and everything cascading from them, in batches."""
+    return _delete_batches(STUDENT_DELETE_PLAN, student_ids, batch_size)
+
+
+def delete_procedures(procedure_ids, batch_size=DELETE_BATCH_SIZE):
+    """
+    Delete the procedures `procedure_ids` and everything cascading from
+    them, in batches; students who had one reconciled get their grades
+    recomputed.
+    """
+    def before_batch(batch):
+        student_ids = reconciled_student_ids(batch)
+        invalidate_reference_data()
+        return (lambda: refresh_grade_summaries(student_ids)) if student_ids else None
+
+    return _delete_batches(PROCEDURE_DELETE_PLAN, procedure_ids, batch_size, before_batch)
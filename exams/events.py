@@ -0,0 +1,254 @@
+"""
+Live StudentProcedure status transitions, streamed to tablets as
+server-sent events (GET /api/exams/events/, served under ASGI).
+
+The code that changes a status calls publish() inside its transaction. It
+writes an AssessmentEvent row, so the event becomes visible when the change
+commits and disappears if it rolls back. Each process runs one EventHub
+that reads new rows every EVENT_STREAM_POLL_INTERVAL seconds and fans them
+out to all of its open streams. The database therefore sees one indexed
+query per interval per process, however many tablets are connected.
+
+The row id is the SSE event id. A reconnecting EventSource sends it back
+as Last-Event-ID and first receives what it missed.
+
+EventSource cannot send an Authorization header, and an access token in
+the URL would end up in server and proxy logs. Instead, a browser asks for
+a stream ticket with an authenticated POST and opens the stream with
+?ticket=. A ticket is a random key in the cache that opens one stream, and
+only within EVENT_STREAM_TICKET_TIMEOUT seconds of being issued.
+
+While polls fail, the hub logs them and backs off, and its streams stay
+open. If the hub stops (its first read failed, or something unexpected
+went wrong) it ends every open stream; the clients reconnect and the
+first of them starts a new hub.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AssessmentEvent
+
+logger = logging.getLogger(__name__)
+
+# Events stay this long for reconnecting clients (purged by the job worker)
+EVENT_RETENTION = timedelta(days=1)
+# Ids are assigned at insert but rows appear at commit, possibly out of
+# order; the hub re-reads this window so a late commit is not skipped
+COMMIT_GRACE = timedelta(seconds=10)
+BACKLOG_LIMIT = 1000
+# Longest wait between polls while they keep failing, in seconds
+POLL_BACKOFF_LIMIT = 30
+# Queued in place of an event when the hub stops
+HUB_STOPPED = None
+TICKET_KEY_PREFIX = 'exams:events:ticket:'
+
+
+def publish(sp, kind, actor=None):
+    """Record that `sp` went through `kind` (see AssessmentEvent.KIND_CHOICES)."""
+    return AssessmentEvent.objects.create(
+        student_procedure=sp,
+        program_id=sp.procedure.program_id,
+        student_id=sp.student_id,
+        procedure_id=sp.procedure_id,
+        kind=kind,
+        status=sp.status,
+        actor=actor,
+    )
+
+
+def purge_events(older_than=EVENT_RETENTION):
+    return AssessmentEvent.objects.filter(created_at__lt=timezone.now() - older_than).delete()[0]
+
+
+def issue_stream_ticket(user):
+    """A single-use ticket that opens one event stream as `user`."""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(TICKET_KEY_PREFIX + ticket, user.pk, settings.EVENT_STREAM_TICKET_TIMEOUT)
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """The id of the user `ticket` was issued to, or None once used or expired."""
+    key = TICKET_KEY_PREFIX + ticket
+    user_id = cache.get(key)
+    # Of concurrent redemptions, only one deletes the key
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
+
+
+def format_event(event):
+    """The SSE frame for `event`."""
+    data = {
+        'id': event.pk,
+        'kind': event.kind,
+        'status': event.status,
+        'student_procedure': event.student_procedure_id,
+        'student': event.student_id,
+        'procedure': event.procedure_id,
+        'program': event.program_id,
+        'actor': event.actor_id,
+        'created_at': event.created_at.isoformat(),
+    }
+    return f"id: {event.pk}\nevent: {event.kind}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class Subscription:
+    """One open stream: the events of a program and/or a student, or all of them."""
+
+    def __init__(self, program_id=None, student_id=None):
+        self.program_id = program_id
+        self.student_id = student_id
+        self.queue = asyncio.Queue()
+
+    def filter(self, queryset):
+        if self.program_id is not None:
+            queryset = queryset.filter(program_id=self.program_id)
+        if self.student_id is not None:
+            queryset = queryset.filter(student_id=self.student_id)
+        return queryset
+
+    def matches(self, event):
+        return (
+            (self.program_id is None or event.program_id == self.program_id)
+            and (self.student_id is None or event.student_id == self.student_id)
+        )
+
+
+def _current_events(since):
+    """The latest event id and {id: created_at} of the events after `since`."""
+    try:
+        latest_id = AssessmentEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        recent = dict(AssessmentEvent.objects.filter(created_at__gte=since).values_list('id', 'created_at'))
+        return latest_id, recent
+    finally:
+        close_old_connections()
+
+
+def _new_events(last_id, since):
+    try:
+        return list(
+            AssessmentEvent.objects
+            .filter(Q(id__gt=last_id) | Q(created_at__gte=since))
+            .order_by('id')
+        )
+    finally:
+        close_old_connections()
+
+
+def _backlog(subscription, after_id, up_to_id):
+    return list(
+        subscription.filter(AssessmentEvent.objects.filter(id__gt=after_id, id__lte=up_to_id))
+        .order_by('id')[:BACKLOG_LIMIT]
+    )
+
+
+class EventHub:
+    """Polls for new events on behalf of every stream in this process."""
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.task = None
+        self.ready = None
+        self.last_id = 0
+
+    async def subscribe(self, subscription):
+        """
+        Start queueing new events for `subscription`. Returns the id of the
+        last event it will not receive, for catching up with a backlog.
+        """
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.subscriptions = set()
+            self.ready = asyncio.Event()
+            self.task = loop.create_task(self._poll())
+        self.subscriptions.add(subscription)
+        await self.ready.wait()
+        return self.last_id
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+
+    async def _poll(self):
+        try:
+            # Off the request's thread: the hub outlives the request that started it
+            self.last_id, seen = await sync_to_async(_current_events, thread_sensitive=False)(
+                timezone.now() - COMMIT_GRACE
+            )
+            self.ready.set()
+            failures = 0
+            while self.subscriptions:
+                await asyncio.sleep(
+                    min(settings.EVENT_STREAM_POLL_INTERVAL * 2 ** min(failures, 10), POLL_BACKOFF_LIMIT)
+                )
+                since = timezone.now() - COMMIT_GRACE
+                try:
+                    events = await sync_to_async(_new_events, thread_sensitive=False)(self.last_id, since)
+                except Exception:
+                    failures += 1
+                    logger.exception("Polling assessment events failed (%d in a row)", failures)
+                    continue
+                failures = 0
+                for event in events:
+                    if event.pk in seen:
+                        continue
+                    seen[event.pk] = event.created_at
+                    self.last_id = max(self.last_id, event.pk)
+                    for subscription in self.subscriptions:
+                        if subscription.matches(event):
+                            subscription.queue.put_nowait(event)
+                seen = {pk: created_at for pk, created_at in seen.items() if created_at >= since}
+        except Exception:
+            logger.exception("Assessment event hub stopped")
+        finally:
+            # Unblock subscribe() and end the open streams; their clients reconnect
+            self.ready.set()
+            for subscription in self.subscriptions:
+                subscription.queue.put_nowait(HUB_STOPPED)
+
+
+hub = EventHub()
+
+
+async def stream_events(subscription, last_event_id=None):
+    """
+    SSE frames for `subscription`: the events after `last_event_id` if
+    given, then live ones until EVENT_STREAM_TIMEOUT, with a comment every
+    EVENT_STREAM_HEARTBEAT seconds so proxies keep the connection open.
+    The client reconnects when the stream ends.
+    """
+    up_to_id = await hub.subscribe(subscription)
+    try:
+        yield f"retry: {settings.EVENT_STREAM_RETRY_MS}\n\n".encode()
+        sent = set()
+        if last_event_id is not None:
+            for event in await sync_to_async(_backlog)(subscription, last_event_id, up_to_id):
+                sent.add(event.pk)
+                yield format_event(event)
+
+        deadline = time.monotonic() + settings.EVENT_STREAM_TIMEOUT
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), min(settings.EVENT_STREAM_HEARTBEAT, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if event is HUB_STOPPED:
+                break
+            if event.pk not in sent:
+                yield format_event(event)
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,174 @@
+"""
+Student grade totals.
+
+StudentGradeSummary holds one precomputed row per student so the grades
+endpoint and its exports never aggregate scores at read time. Rows are
+refreshed for the affected student whenever a reconciliation is saved or
+a care plan is submitted, and for every student reconciled on a
+procedure whose total score changes or which is deleted (see the signal
+receivers below; bulk writes call refresh_procedure_grade_summaries()
+themselves). `manage.py rebuild_grade_summaries` backfills and checks
+them.
+"""
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .bulk import bulk_upsert
+from .models import CarePlan, Procedure, ReconciledScore, Student, StudentGradeSummary, StudentProcedure
+
+EMPTY_TOTALS = dict.fromkeys(StudentGradeSummary.TOTAL_FIELDS, 0)
+
+
+def calculate_grade(percentage):
+    if percentage >= 80:
+        return 'Distinction'
+    elif percentage >= 70:
+        return 'Credit'
+    elif percentage >= 60:
+        return 'Pass'
+    elif percentage == 0:
+        return 'N/A'
+    return 'Fail'
+
+
+def collect_grade_totals(student_ids):
+    """
+    Raw totals per student with three grouped queries, whatever the number
+    of students. Each sum is aggregated on its own so the joins cannot
+    multiply one another.
+    """
+    totals = {student_id: dict(EMPTY_TOTALS) for student_id in student_ids}
+    if not totals:
+        return totals
+
+    reconciled = StudentProcedure.objects.filter(student_id__in=student_ids, status='reconciled')
+
+    for row in (
+        reconciled.values('student_id')
+        .annotate(max_score=Sum('procedure__total_score'), count=Count('id'))
+    ):
+        totals[row['student_id']]['procedure_max_score'] = row['max_score'] or 0
+        totals[row['student_id']]['reconciled_count'] = row['count']
+
+    for row in (
+        ReconciledScore.objects
+        .filter(student_procedure__in=reconciled)
+        .values('student_procedure__student_id')
+        .annotate(score=Sum('score'))
+    ):
+        totals[row['student_procedure__student_id']]['procedure_score'] = row['score'] or 0
+
+    for row in (
+        CarePlan.objects
+        .filter(student_id__in=student_ids)
+        .values('student_id')
+        .annotate(score=Sum('score'), max_score=Sum('max_score'))
+    ):
+        totals[row['student_id']]['care_plan_score'] = row['score'] or 0
+        totals[row['student_id']]['care_plan_max_score'] = row['max_score'] or 0
+
+    return totals
+
+
+def apply_totals(summary, totals):
+    """Set the raw totals on `summary` and derive total, max, percentage and grade."""
+    for field in StudentGradeSummary.TOTAL_FIELDS:
+        setattr(summary, field, totals[field])
+
+    summary.total_score = summary.procedure_score + summary.care_plan_score
+
+    # The care plan only counts towards the maximum once it has been scored
+    if summary.care_plan_score > 0:
+        summary.max_score = summary.procedure_max_score + summary.care_plan_max_score
+    else:
+        summary.max_score = summary.procedure_max_score
+
+    percentage = (summary.total_score / summary.max_score * 100) if summary.max_score > 0 else 0
+    summary.percentage = percentage
+    summary.grade = calculate_grade(percentage)
+    return summary
+
+
+def save_grade_summaries(summaries, batch_size=500):
+    now = timezone.now()
+    for summary in summaries:
+        summary.updated_at = now  # bulk writes skip auto_now
+    bulk_upsert(
+        StudentGradeSummary,
+        summaries,
+        unique_fields=['student'],
+        update_fields=StudentGradeSummary.TOTAL_FIELDS + StudentGradeSummary.DERIVED_FIELDS + ['updated_at'],
+        batch_size=batch_size,
+    )
+
+
+def refresh_grade_summaries(student_ids):
+    """Recompute and upsert the summaries of `student_ids`. Call inside the writing transaction."""
+    totals = collect_grade_totals(list(set(student_ids)))
+    save_grade_summaries([
+        apply_totals(StudentGradeSummary(student_id=student_id), student_totals)
+        for student_id, student_totals in totals.items()
+    ])
+
+
+def reconciled_student_ids(procedure_ids):
+    """The students with a reconciled assessment of one of `procedure_ids`."""
+    return list(
+        StudentProcedure.objects
+        .filter(procedure_id__in=procedure_ids, status='reconciled')
+        .values_list('student_id', flat=True)
+        .distinct()
+    )
+
+
+def refresh_procedure_grade_summaries(procedure_ids):
+    """Refresh the summaries of the students reconciled on `procedure_ids`, whose maximum they set."""
+    student_ids = reconciled_student_ids(procedure_ids)
+    if student_ids:
+        refresh_grade_summaries(student_ids)
+
+
+@receiver(post_save, sender=Procedure)
+def procedure_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or 'total_score' in update_fields):
+        refresh_procedure_grade_summaries([instance.pk])
+
+
+@receiver(pre_delete, sender=Procedure)
+def procedure_deleting(sender, instance, **kwargs):
+    # The cascade removes the assessments before post_delete is sent
+    instance._reconciled_student_ids = reconciled_student_ids([instance.pk])
+
+
+@receiver(post_delete, sender=Procedure)
+def procedure_deleted(sender, instance, **kwargs):
+    student_ids = getattr(instance, '_reconciled_student_ids', None)
+    if student_ids:
+        refresh_grade_summaries(student_ids)
+
+
+def rebuild_grade_summaries(batch_size=500, dry_run=False):
+    """
+    Recompute every student's summary in batches and write the rows that are
+    missing or out of date (none when `dry_run`). Returns (checked, stale).
+    """
+    checked = stale = 0
+    student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+
+    for start in range(0, len(student_ids), batch_size):
+        batch = student_ids[start:start + batch_size]
+        existing = StudentGradeSummary.objects.in_bulk(batch)
+        changed = []
+        for student_id, totals in collect_grade_totals(batch).items():
+            current = existing.get(student_id)
+            expected = apply_totals(StudentGradeSummary(student_id=student_id), totals)
+            if current is None or current.get_values() != expected.get_values():
+                changed.append(expected)
+        checked += len(batch)
+        stale += len(changed)
+        if changed and not dry_run:
+            save_grade_summaries(changed, batch_size)
+
+    return checked, stale
@@ -0,0 +1,769 @@
+"""
+Student and procedure imports shared by the import endpoints, the
+background job worker and the import management commands.
+
+Uploaded files are read lazily: CSV files are decoded line by line and
+workbooks are opened read-only, so rows are parsed as they are consumed and
+memory stays flat however large the spreadsheet. Importers take rows in
+chunks of IMPORT_CHUNK_SIZE and validate and write one chunk before the
+next is read.
+
+An import runs in one transaction, so a file that fails part-way writes
+nothing. Background jobs pass `commit_chunks=True` instead: each chunk
+then commits on its own and progress is reported between commits, so
+pollers see it as the import runs. A job that fails part-way keeps the
+chunks written before the failure; every row is upserted, so the
+corrected file can simply be imported again.
+
+Each importer returns the summary dict sent back to the client, and raises
+ImportFailed when the file cannot be imported at all. `progress`, when
+given, is called as progress(percent, message).
+
+With `dry_run=True` an importer runs the same parsing and lookups but
+writes nothing, and its summary lists every error instead of the first
+few, so a whole file can be checked in one pass.
+"""
+import codecs
+import csv
+from contextlib import nullcontext
+from itertools import islice
+
+from django.db import connections, router, transaction
+from openpyxl import load_workbook
+
+from .bulk import bulk_upsert
+from .dashboard import invalidate_dashboard
+from .grades import refresh_procedure_grade_summaries
+from .models import Procedure, ProcedureStep, Program, Student
+from .reference import invalidate_reference_data
+from .scoring import refresh_procedure_scoring
+
+# Rows validated and written per round of queries while importing
+IMPORT_CHUNK_SIZE = 500
+
+
+class ImportFailed(Exception):
+    """The whole import was refused; the message is returned to the client."""
+
+
+def import_transaction(commit_chunks):
+    """The transaction around a whole import; none when each chunk commits on its own."""
+    return nullcontext() if commit_chunks else transaction.atomic()
+
+
+def chunk_transaction(commit_chunks):
+    """The transaction around one chunk, when chunks commit on their own."""
+    return transaction.atomic() if commit_chunks else nullcontext()
+
+
+def _report(progress, percent, message):
+    if progress is not None:
+        progress(percent, message)
+
+
+# ------------------------------------------------------------------
+# Reading
+# ------------------------------------------------------------------
+
+def open_workbook(file):
+    """Open an uploaded workbook read-only; cells are parsed only as rows are iterated."""
+    try:
+        return load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFailed(f'Failed to read Excel file: {str(e)}')
+
+
+def iter_sheet_rows(ws):
+    """(row_num, values) for every non-empty row below the header row of `ws`."""
+    for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+        if row and any(row):
+            yield row_num, row
+
+
+def iter_sheet_dicts(ws):
+    """(row_num, {header: value}) for every non-empty row of `ws`, keyed by its first row."""
+    rows = ws.iter_rows(values_only=True)
+    headers = next(rows, ())
+    for row_num, row in enumerate(rows, start=2):
+        if row and any(row):
+            yield row_num, dict(zip(headers, row))
+
+
+def iter_csv_dicts(file):
+    """(row_num, row dict) for every row of a UTF-8 CSV upload, decoded line by line."""
+    try:
+        yield from enumerate(csv.DictReader(codecs.iterdecode(file, 'utf-8')), start=2)
+    except UnicodeDecodeError:
+        raise ImportFailed('File encoding error. Please save as UTF-8.')
+
+
+class ImportRows:
+    """
+    Lazy (row_num, row dict) pairs from an uploaded CSV file or from the
+    active sheet of a workbook. Nothing is read until iteration starts;
+    `total` is then the number of data rows the sheet declares, or None
+    when the file does not say (CSV).
+    """
+
+    def __init__(self, file, file_extension):
+        self.file = file
+        self.file_extension = file_extension
+        self.total = None
+
+    def __iter__(self):
+        if self.file_extension == 'csv':
+            yield from iter_csv_dicts(self.file)
+            return
+
+        wb = open_workbook(self.file)
+        try:
+            ws = wb.active
+            if ws.max_row:
+                self.total = ws.max_row - 1
+            yield from iter_sheet_dicts(ws)
+        finally:
+            wb.close()
+
+
+def chunked(rows, size=IMPORT_CHUNK_SIZE):
+    """Lists of up to `size` items from `rows`, read one chunk at a time."""
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def import_summary(counts, errors, dry_run, limit=20):
+    """
+    The summary returned to the client: `counts` plus the errors, all of
+    them on a dry run, else the first `limit`.
+    """
+    summary = {'success': True, **counts, 'errors': len(errors)}
+    if dry_run:
+        summary.update(dry_run=True, error_details=errors)
+    else:
+        summary['error_details'] = errors[:limit]
+    return summary
+
+
+ERROR_REPORT_HEADER = ['Location', 'Error']
+
+
+def error_report_rows(summary):
+    """Rows of the downloadable error report of a dry-run summary."""
+    for error in summary['error_details']:
+        location, _, message = error.partition(': ')
+        yield [location, message] if message else ['', error]
+
+
+def _chunk_progress(progress, rows, done):
+    total = getattr(rows, 'total', None)
+    percent = min(95, 5 + done * 90 // total) if total else 50
+    _report(progress, percent, f"{done} rows imported")
+
+
+# ------------------------------------------------------------------
+# Students
+# ------------------------------------------------------------------
+
+def parse_student_row(row, row_num):
+    """Validate one import row; returns (fields, None) or (None, error message)."""
+    # Get required fields
+    index_number = str(row.get('Index Number', '')).strip()
+    full_name = str(row.get('Full Name', '')).strip()
+    program_name = str(row.get('Program', '')).strip()
+    # Without a Level column, new students start at 100 and existing ones keep theirs
+    level_str = str(row['Level']).strip() if 'Level' in row else None
+    is_active_str = str(row.get('Status', 'Yes')).strip()
+
+    # Validate required fields
+    if not index_number or not full_name or not program_name:
+        return None, f"Row {row_num}: Missing required fields"
+
+    # Validate and parse level
+    if level_str is not None and level_str not in ['100', '200', '300', '400']:
+        return None, f"Row {row_num}: Invalid level '{level_str}'. Must be 100, 200, 300, or 400"
+
+    for field, value in (('index_number', index_number), ('full_name', full_name)):
+        max_length = Student._meta.get_field(field).max_length
+        if len(value) > max_length:
+            return None, f"Row {row_num}: {Student._meta.get_field(field).verbose_name} longer than {max_length} characters"
+
+    return {
+        'index_number': index_number,
+        'full_name': full_name,
+        'program_name': program_name,
+        'level': level_str,
+        # Parse is_active
+        'is_active': is_active_str.lower() in ['yes', 'true', '1', 'active'],
+    }, None
+
+
+def import_students(rows, progress=None, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False, commit_chunks=False):
+    """
+    Create or update students by index number from (row_num, row dict)
+    pairs, e.g. an ImportRows.
+
+    Set-based: programs come from one cached dict, and each chunk of rows
+    costs one IN lookup of existing students plus a bulk insert and a bulk
+    upsert, so the query count grows with the number of chunks, not rows.
+    A later row for the same index number updates the student an earlier
+    row created, as the row-by-row import did.
+    """
+    errors = []  # (row_num, message)
+    created_count = 0
+    updated_count = 0
+    done = 0
+
+    programs = {program.name: program for program in Program.objects.all()}
+    # Dry runs write nothing; they remember the students they would create
+    planned = set() if dry_run else None
+
+    with import_transaction(commit_chunks):
+        for chunk in chunked(rows, chunk_size):
+            with chunk_transaction(commit_chunks):
+                created, updated = _import_student_chunk(chunk, programs, errors, chunk_size, planned)
+            created_count += created
+            updated_count += updated
+            done += len(chunk)
+            _chunk_progress(progress, rows, done)
+
+    # Errors in file order, as the row-by-row import reported them
+    errors = [message for _, message in sorted(errors, key=lambda error: error[0])]
+
+    return import_summary({
+        'created': created_count,
+        'updated': updated_count,
+    }, errors, dry_run, limit=10)
+
+
+def _import_student_chunk(chunk, programs, errors, batch_size, planned=None):
+    parsed = []
+    for row_num, row in chunk:
+        try:
+            fields, error = parse_student_row(row, row_num)
+        except Exception as e:
+            fields, error = None, f"Row {row_num}: {str(e)}"
+        if error:
+            errors.append((row_num, error))
+        else:
+            parsed.append((row_num, fields))
+
+    existing = Student.objects.in_bulk(
+        {fields['index_number'] for _, fields in parsed}, field_name='index_number'
+    )
+
+    to_create = {}
+    to_update = {}
+    created_count = 0
+    updated_count = 0
+
+    for row_num, fields in parsed:
+        # Get program
+        program = programs.get(fields['program_name'])
+        if program is None:
+            errors.append((row_num, f"Row {row_num}: Program '{fields['program_name']}' not found"))
+            continue
+
+        index_number = fields['index_number']
+        values = {
+            'full_name': fields['full_name'],
+            'program_id': program.pk,
+            'level': fields['level'],
+            'is_active': fields['is_active'],
+        }
+        if values['level'] is None:
+            del values['level']
+
+        student = to_create.get(index_number) or existing.get(index_number)
+        if student is None and planned is not None and index_number in planned:
+            updated_count += 1
+            continue
+        if student is None:
+            to_create[index_number] = Student(index_number=index_number, **values)
+            created_count += 1
+            continue
+
+        updated_count += 1
+        changed = any(getattr(student, field) != value for field, value in values.items())
+        for field, value in values.items():
+            setattr(student, field, value)
+        if changed and index_number not in to_create:
+            to_update[index_number] = student
+
+    if planned is not None:
+        planned.update(to_create)
+        return created_count, updated_count
+
+    Student.objects.bulk_create(to_create.values(), batch_size=batch_size)
+
+    # An upsert on index_number is one INSERT ... ON CONFLICT UPDATE per
+    # batch; bulk_update's per-row CASE expressions cost far more to build
+    bulk_upsert(
+        Student,
+        to_update.values(),
+        unique_fields=['index_number'],
+        update_fields=['full_name', 'program', 'level', 'is_active', 'updated_at'],
+        batch_size=batch_size,
+    )
+    if to_create or to_update:
+        # Bulk writes send no signals
+        invalidate_dashboard()
+    return created_count, updated_count
+
+
+# ------------------------------------------------------------------
+# Procedures and steps
+# ------------------------------------------------------------------
+
+class ProgramLookup:
+    """Programs by name for the procedure importers, loaded once per import."""
+
+    def __init__(self):
+        self.programs = list(Program.objects.all())
+        self.by_name = {program.name: program for program in self.programs}
+
+    def resolve(self, program_name):
+        """
+        (programs, None) for a row's Program column, or (None, error). A
+        blank program means the procedure is shared by every program.
+        """
+        if not program_name:
+            if not self.programs:
+                return None, "No programs found in database"
+            return self.programs, None
+        program = self.by_name.get(program_name)
+        if program is None:
+            return None, f"Program '{program_name}' not found"
+        return [program], None
+
+
+def import_procedures_csv(file, progress=None, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False,
+                          commit_chunks=False):
+    """Import from CSV (combined format)"""
+    reader = iter_csv_dicts(file)
+
+    procedures_created = 0
+    procedures_updated = 0
+    steps_created = 0
+    steps_updated = 0
+    errors = []
+
+    # Group by procedure
+    procedures_data = {}
+
+    try:
+        for row_num, row in reader:
+            proc_name = row.get('Procedure Name', '').strip()
+            program_name = row.get('Program', '').strip()
+            total_score_str = row.get('Total Score', '').strip()
+            step_order_str = row.get('Step Order', '').strip()
+            step_desc = row.get('Step Description', '').strip()
+
+            if not proc_name:
+                continue
+
+            if proc_name not in procedures_data:
+                procedures_data[proc_name] = {
+                    'program_name': program_name,
+                    'total_score': total_score_str,
+                    'steps': []
+                }
+
+            if step_order_str and step_desc:
+                try:
+                    step_order = int(step_order_str)
+                    procedures_data[proc_name]['steps'].append({
+                        'order': step_order,
+                        'description': step_desc
+                    })
+                except ValueError:
+                    errors.append(f"Row {row_num}: Invalid step order '{step_order_str}'")
+
+        _report(progress, 10, f"{len(procedures_data)} procedures read")
+
+        with import_transaction(commit_chunks):
+            programs = ProgramLookup()
+            procedures = []
+
+            for proc_name, data in procedures_data.items():
+                # Validate total_score
+                try:
+                    total_score = int(data['total_score'])
+                except (ValueError, TypeError):
+                    errors.append(f"Procedure '{proc_name}': Invalid total score '{data['total_score']}'")
+                    continue
+
+                # A procedure without a program is shared by all programs
+                targets, error = programs.resolve(data['program_name'])
+                if error:
+                    errors.append(f"Procedure '{proc_name}': {error}")
+                    continue
+
+                procedures.extend(((program.pk, proc_name), total_score) for program in targets)
+
+            # Create or update procedure for each program
+            with chunk_transaction(commit_chunks):
+                procedures_created, procedures_updated, saved = save_procedures(
+                    procedures, existing_procedures(key for key, _ in procedures), chunk_size,
+                    planned=set() if dry_run else None,
+                )
+            _report(progress, 40, f"{len(saved)} procedures imported")
+
+            # Create or update steps
+            steps = [
+                ((procedure_ref(procedure), step['order']), step['description'])
+                for (_, proc_name), procedure in saved.items()
+                for step in procedures_data[proc_name]['steps']
+            ]
+            planned_steps = set() if dry_run else None
+            for chunk in chunked(steps, chunk_size):
+                with chunk_transaction(commit_chunks):
+                    created, updated = save_steps(chunk, existing_steps(chunk), chunk_size, planned_steps)
+                steps_created += created
+                steps_updated += updated
+                _report(progress, 40 + (steps_created + steps_updated) * 60 // len(steps),
+                        f"{steps_created + steps_updated} of {len(steps)} steps")
+
+        return import_summary({
+            'procedures_created': procedures_created,
+            'procedures_updated': procedures_updated,
+            'steps_created': steps_created,
+            'steps_updated': steps_updated,
+        }, errors, dry_run)
+
+    except ImportFailed:
+        raise
+    except Exception as e:
+        raise ImportFailed(f'Import failed: {str(e)}')
+
+
+def import_procedures_excel(file, progress=None, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False,
+                            commit_chunks=False):
+    """
+    Import from Excel (multi-sheet format)
+
+    Steps find their procedures through a name -> {program_id: procedure}
+    index built while the Procedures sheet is imported, so a step shared by
+    every program is matched in one dict lookup. Existing procedures and
+    steps are loaded once per chunk and written with bulk inserts and
+    upserts, keeping a full curriculum to a few queries per chunk.
+    """
+    wb = open_workbook(file)
+
+    procedures_created = 0
+    procedures_updated = 0
+    steps_created = 0
+    steps_updated = 0
+    errors = []
+
+    # Procedures imported from the Procedures sheet, by name
+    procedure_index = {}
+
+    # Dry runs write nothing; they remember the rows they would create
+    planned_procedures = set() if dry_run else None
+    planned_steps = set() if dry_run else None
+
+    try:
+        with import_transaction(commit_chunks):
+            # Import Procedures (Sheet 1)
+            if 'Procedures' not in wb.sheetnames:
+                raise ImportFailed('Sheet "Procedures" not found in Excel file')
+
+            programs = ProgramLookup()
+            for chunk in chunked(iter_sheet_rows(wb['Procedures']), chunk_size):
+                procedures = []
+                for row_num, row in chunk:
+                    try:
+                        proc_name = str(row[0]).strip() if row[0] else ''
+                        program_name = str(row[1]).strip() if row[1] else ''
+
+                        # Handle total_score
+                        try:
+                            total_score = int(row[2]) if row[2] else 0
+                        except (ValueError, TypeError):
+                            errors.append(f"Procedures Row {row_num}: Invalid total score '{row[2]}'")
+                            continue
+
+                        if not proc_name:
+                            errors.append(f"Procedures Row {row_num}: Missing procedure name")
+                            continue
+
+                        # A procedure without a program is shared by all programs
+                        targets, error = programs.resolve(program_name)
+                        if error:
+                            errors.append(f"Procedures Row {row_num}: {error}")
+                            continue
+
+                        procedures.extend(((program.pk, proc_name), total_score) for program in targets)
+
+                    except Exception as e:
+                        errors.append(f"Procedures Row {row_num}: {str(e)}")
+
+                with chunk_transaction(commit_chunks):
+                    created, updated, saved = save_procedures(
+                        procedures, existing_procedures(key for key, _ in procedures), chunk_size, planned_procedures
+                    )
+                procedures_created += created
+                procedures_updated += updated
+                for (program_id, proc_name), procedure in saved.items():
+                    procedure_index.setdefault(proc_name, {})[program_id] = procedure
+
+            _report(progress, 50, f"{procedures_created + procedures_updated} procedures imported")
+
+            # Import Procedure Steps (Sheet 2, optional)
+            if 'Procedure Steps' in wb.sheetnames:
+                # Procedures named only in the steps sheet, looked up in the database once
+                stored_procedures = {}
+
+                for chunk in chunked(iter_sheet_rows(wb['Procedure Steps']), chunk_size):
+                    parsed = []
+                    for row_num, row in chunk:
+                        try:
+                            proc_name = str(row[0]).strip() if row[0] else ''
+
+                            # Handle step_order
+                            try:
+                                step_order = int(row[1]) if row[1] else 0
+                            except (ValueError, TypeError):
+                                errors.append(f"Steps Row {row_num}: Invalid step order '{row[1]}'")
+                                continue
+
+                            description = str(row[2]).strip() if row[2] else ''
+
+                            if not proc_name or not description:
+                                errors.append(f"Steps Row {row_num}: Missing procedure name or description")
+                                continue
+
+                            parsed.append((row_num, proc_name, step_order, description))
+
+                        except Exception as e:
+                            errors.append(f"Steps Row {row_num}: {str(e)}")
+
+                    unknown = {
+                        proc_name for _, proc_name, _, _ in parsed
+                        if proc_name not in procedure_index and proc_name not in stored_procedures
+                    }
+                    if unknown:
+                        for proc_name in unknown:
+                            stored_procedures[proc_name] = []
+                        for procedure in Procedure.objects.filter(name__in=unknown):
+                            stored_procedures[procedure.name].append(procedure)
+
+                    # Create or update step for each matching procedure (all
+                    # programs' copies of a shared procedure)
+                    steps = []
+                    for row_num, proc_name, step_order, description in parsed:
+                        if proc_name in procedure_index:
+                            matching_procedures = procedure_index[proc_name].values()
+                        else:
+                            matching_procedures = stored_procedures[proc_name]
+
+                        if not matching_procedures:
+                            errors.append(f"Steps Row {row_num}: Procedure '{proc_name}' not found")
+                            continue
+
+                        steps.extend(
+                            ((procedure_ref(procedure), step_order), description) for procedure in matching_procedures
+                        )
+
+                    with chunk_transaction(commit_chunks):
+                        created, updated = save_steps(steps, existing_steps(steps), chunk_size, planned_steps)
+                    steps_created += created
+                    steps_updated += updated
+
+        return import_summary({
+            'procedures_created': procedures_created,
+            'procedures_updated': procedures_updated,
+            'steps_created': steps_created,
+            'steps_updated': steps_updated,
+        }, errors, dry_run)
+
+    except ImportFailed:
+        raise
+    except Exception as e:
+        raise ImportFailed(f'Import failed: {str(e)}')
+    finally:
+        wb.close()
+
+
+def import_procedure_steps(procedure, rows, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False, commit_chunks=False):
+    """
+    Create or update the steps of `procedure` by step order from
+    (row_num, row dict) pairs, one lookup and bulk write per chunk.
+    """
+    errors = []
+    created_count = 0
+    updated_count = 0
+    planned = set() if dry_run else None
+
+    with import_transaction(commit_chunks):
+        for chunk in chunked(rows, chunk_size):
+            steps = []
+            for row_num, row in chunk:
+                try:
+                    # Get fields
+                    step_order_str = str(row.get('Step Order', '')).strip()
+                    description = str(row.get('Description', '')).strip()
+
+                    # Validate required fields
+                    if not step_order_str or not description:
+                        errors.append(f"Row {row_num}: Missing step order or description")
+                        continue
+
+                    # Parse step order
+                    try:
+                        step_order = int(step_order_str)
+                    except ValueError:
+                        errors.append(f"Row {row_num}: Invalid step order '{step_order_str}'")
+                        continue
+
+                    steps.append(((procedure.pk, step_order), description))
+                except Exception as e:
+                    errors.append(f"Row {row_num}: {str(e)}")
+
+            with chunk_transaction(commit_chunks):
+                created, updated = save_steps(steps, existing_steps(steps), chunk_size, planned)
+            created_count += created
+            updated_count += updated
+
+    return import_summary({
+        'created': created_count,
+        'updated': updated_count,
+    }, errors, dry_run)
+
+
+def save_steps(steps, existing, batch_size=IMPORT_CHUNK_SIZE, planned=None):
+    """
+    Write ((procedure_id, step_order), description) pairs in file order,
+    given the matching stored steps in `existing` (same keys). New steps
+    are bulk inserted and changed ones bulk upserted on (procedure,
+    step_order). Returns (created, updated), counted per pair as
+    update_or_create would count them.
+
+    For a dry run, `planned` is the set of keys earlier chunks would have
+    created: nothing is written and this call's new keys are added to it.
+    """
+    to_create = {}
+    to_update = {}
+    created_count = 0
+    updated_count = 0
+
+    for key, description in steps:
+        step = to_create.get(key) or existing.get(key)
+        if step is None and planned is not None and key in planned:
+            updated_count += 1
+            continue
+        if step is None:
+            to_create[key] = ProcedureStep(procedure_id=key[0], step_order=key[1], description=description)
+            created_count += 1
+            continue
+
+        updated_count += 1
+        if step.description != description:
+            step.description = description
+            if key not in to_create:
+                to_update[key] = step
+
+    if planned is not None:
+        planned.update(to_create)
+        return created_count, updated_count
+
+    ProcedureStep.objects.bulk_create(to_create.values(), batch_size=batch_size)
+    bulk_upsert(
+        ProcedureStep,
+        to_update.values(),
+        unique_fields=['procedure', 'step_order'],
+        update_fields=['description'],
+        batch_size=batch_size,
+    )
+    if to_create or to_update:
+        # Bulk writes send no signals
+        invalidate_reference_data()
+    if to_create:
+        refresh_procedure_scoring({procedure_id for procedure_id, _ in to_create}, steps_deleted=False)
+    return created_count, updated_count
+
+
+def existing_steps(steps):
+    """Stored steps for the keys of ((procedure_id, step_order), description) pairs, in one query."""
+    keys = {key for key, _ in steps}
+    stored = ProcedureStep.objects.filter(
+        procedure_id__in={procedure_id for procedure_id, _ in keys if isinstance(procedure_id, int)},
+        step_order__in={step_order for _, step_order in keys},
+    )
+    return {(step.procedure_id, step.step_order): step for step in stored}
+
+
+def save_procedures(procedures, existing, batch_size=IMPORT_CHUNK_SIZE, planned=None):
+    """
+    Write ((program_id, name), total_score) pairs in file order, as
+    save_steps() does for steps. Returns (created, updated, saved), where
+    `saved` maps every key written to its Procedure, primary key included
+    except on a dry run.
+    """
+    to_create = {}
+    to_update = {}
+    saved = {}
+    created_count = 0
+    updated_count = 0
+
+    for key, total_score in procedures:
+        procedure = to_create.get(key) or existing.get(key)
+        if procedure is None and planned is not None and key in planned:
+            saved[key] = Procedure(program_id=key[0], name=key[1], total_score=total_score)
+            updated_count += 1
+            continue
+        if procedure is None:
+            to_create[key] = Procedure(program_id=key[0], name=key[1], total_score=total_score)
+            created_count += 1
+            continue
+
+        updated_count += 1
+        saved[key] = procedure
+        if procedure.total_score != total_score:
+            procedure.total_score = total_score
+            if key not in to_create:
+                to_update[key] = procedure
+
+    if planned is not None:
+        planned.update(to_create)
+        saved.update(to_create)
+        return created_count, updated_count, saved
+
+    Procedure.objects.bulk_create(to_create.values(), batch_size=batch_size)
+    if to_create and not connections[router.db_for_write(Procedure)].features.can_return_rows_from_bulk_insert:
+        # MySQL does not return the new primary keys
+        to_create = existing_procedures(to_create)
+    saved.update(to_create)
+
+    bulk_upsert(
+        Procedure,
+        to_update.values(),
+        unique_fields=['program', 'name'],
+        update_fields=['total_score'],
+        batch_size=batch_size,
+    )
+    if to_create or to_update:
+        # Bulk writes send no signals
+        invalidate_reference_data()
+    if to_update:
+        refresh_procedure_grade_summaries([procedure.pk for procedure in to_update.values()])
+    return created_count, updated_count, saved
+
+
+def existing_procedures(keys):
+    """Stored procedures for (program_id, name) keys, by key, in one query."""
+    keys = set(keys)
+    stored = Procedure.objects.filter(
+        program_id__in={program_id for program_id, _ in keys},
+        name__in={name for _, name in keys},
+    )
+    return {
+        (procedure.program_id, procedure.name): procedure
+        for procedure in stored if (procedure.program_id, procedure.name) in keys
+    }
+
+
+def procedure_ref(procedure):
+    """Key of a procedure's steps: its pk, or (program_id, name) while unsaved on a dry run."""
+    return procedure.pk if procedure.pk is not None else (procedure.program_id, procedure.name)
@@ -0,0 +1,224 @@
+"""
+Per-view query counts and timings, switched on with QUERY_INSTRUMENTATION.
+
+QueryBudgetMiddleware counts every SQL query a request runs and times it.
+It splits the request time into database, view, serialize and render time.
+Serialize time is spent in serializer `.data`, where lazy relations run
+their N+1 queries; it excludes those queries, which it counts instead.
+Render time is the rendering of the DRF Response into bytes, and view time
+is everything else the view does, minus its queries. The figures are sent
+back in a Server-Timing header, which browser dev tools show under
+Network → Timing:
+
+    Server-Timing: db;dur=3.1;desc="4 queries", view;dur=4.4, serialize;dur=0.8;desc="2 queries",
+                   render;dur=0.3, total;dur=9.4
+
+They are also added up per view in this process, for the admin endpoint
+GET /api/exams/admin/query-stats/.
+
+A view declares the most queries a request may run with a `query_budget`
+attribute. The budget counts every query of the request, including the
+user lookup of JWT authentication. A request over budget is logged and
+counted, or raises QueryBudgetExceeded when QUERY_BUDGETS_ENFORCED is set,
+as in tests.
+
+When QUERY_INSTRUMENTATION is off, the middleware removes itself at
+startup and costs nothing.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from rest_framework.serializers import ListSerializer, Serializer
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more queries than its view's `query_budget`."""
+
+
+class QueryCounter:
+    """execute_wrapper counting the queries run through it and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class ViewStats:
+    """Totals per view since the process started (or the last reset)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+            self.since = timezone.now()
+
+    def record(self, view, budget, queries, db, view_time, serialize, render, total):
+        with self.lock:
+            stats = self.views.setdefault(view, {
+                'view': view, 'budget': budget, 'requests': 0, 'over_budget': 0,
+                'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'view_ms': 0.0,
+                'serialize_ms': 0.0, 'render_ms': 0.0, 'total_ms': 0.0, 'max_total_ms': 0.0,
+            })
+            stats['requests'] += 1
+            stats['over_budget'] += budget is not None and queries > budget
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['db_ms'] += db * 1000
+            stats['view_ms'] += view_time * 1000
+            stats['serialize_ms'] += serialize * 1000
+            stats['render_ms'] += render * 1000
+            stats['total_ms'] += total * 1000
+            stats['max_total_ms'] = max(stats['max_total_ms'], total * 1000)
+
+    def summary(self):
+        """Per-view averages, the views spending the most database time first."""
+        with self.lock:
+            views = [dict(stats) for stats in self.views.values()]
+        for stats in views:
+            requests = stats['requests']
+            stats['avg_queries'] = round(stats['queries'] / requests, 1)
+            for field in ('db_ms', 'view_ms', 'serialize_ms', 'render_ms', 'total_ms'):
+                stats[f'avg_{field}'] = round(stats[field] / requests, 2)
+                stats[field] = round(stats[field], 2)
+            stats['max_total_ms'] = round(stats['max_total_ms'], 2)
+        views.sort(key=lambda stats: stats['db_ms'], reverse=True)
+        return {'pid': os.getpid(), 'since': self.since, 'views': views}
+
+
+view_stats = ViewStats()
+
+
+def view_target(view_func):
+    """The view class behind `view_func`, or the function itself."""
+    return getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
+
+
+def view_budget(view_func):
+    """The `query_budget` declared by the view class behind `view_func`, if any."""
+    return getattr(view_target(view_func), 'query_budget', None)
+
+
+def view_path(view_func):
+    """Dotted path of the view class behind `view_func`, the name stats are kept under."""
+    view = view_target(view_func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+# The instrumentation of the request being handled, for the serializer hook
+current_request = ContextVar('current_request', default=None)
+
+
+def timed_data(data):
+    """
+    Wrap a serializer `.data` property to add its time and queries to the
+    current request. Nested `.data` calls count once, in the outermost.
+    """
+    def get(serializer):
+        info = current_request.get()
+        if info is None or info['serializing']:
+            return data.fget(serializer)
+        counter = info['counter']
+        queries, db = counter.count, counter.duration
+        info['serializing'] = True
+        start = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            info['serializing'] = False
+            info['serialize'] += time.perf_counter() - start
+            info['serialize_queries'] += counter.count - queries
+            info['serialize_db'] += counter.duration - db
+
+    get.timed = True
+    return property(get)
+
+
+def time_serializers():
+    """Install the `.data` hook on DRF's serializers, once per process."""
+    for serializer_class in (Serializer, ListSerializer):
+        data = serializer_class.__dict__['data']
+        if not getattr(data.fget, 'timed', False):
+            serializer_class.data = timed_data(data)
+
+
+class QueryBudgetMiddleware:
+    """Counts and times each request's queries; see the module docstring."""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        time_serializers()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        request._instrumentation = {
+            'view': None, 'budget': None, 'rendering': None, 'counter': counter, 'serializing': False,
+            'serialize': 0.0, 'serialize_queries': 0, 'serialize_db': 0.0,
+        }
+        token = current_request.set(request._instrumentation)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        end = time.perf_counter()
+
+        info = request._instrumentation
+        if info['view'] is None:
+            # Not routed to a view (404, static files...)
+            return response
+
+        total = end - start
+        render = end - info['rendering'] if info['rendering'] is not None else 0.0
+        serialize = max(info['serialize'] - info['serialize_db'], 0.0)
+        view_time = max(total - render - serialize - counter.duration, 0.0)
+        response['Server-Timing'] = (
+            f'db;dur={counter.duration * 1000:.1f};desc="{counter.count} queries", '
+            f'view;dur={view_time * 1000:.1f}, '
+            f'serialize;dur={serialize * 1000:.1f};desc="{info["serialize_queries"]} queries", '
+            f'render;dur={render * 1000:.1f}, total;dur={total * 1000:.1f}'
+        )
+        view_stats.record(info['view'], info['budget'], counter.count, counter.duration,
+                          view_time, serialize, render, total)
+
+        budget = info['budget']
+        if budget is not None and counter.count > budget:
+            message = f"{info['view']} ran {counter.count} queries, over its budget of {budget}"
+            if settings.QUERY_BUDGETS_ENFORCED:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._instrumentation['view'] = view_path(view_func)
+        request._instrumentation['budget'] = view_budget(view_func)
+
+    def process_template_response(self, request, response):
+        # Called once the view has returned, just before Django renders the response
+        request._instrumentation['rendering'] = time.perf_counter()
+        return response
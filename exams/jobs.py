@@ -0,0 +1,256 @@
+"""
+Database-backed background jobs.
+
+Slow exports and imports are queued as BackgroundJob rows by the API and
+executed by a separate worker process, so no broker is needed:
+
+    python manage.py run_jobs
+
+Clients poll GET /api/exams/jobs/<id>/ for status and progress, and fetch
+GET /api/exams/jobs/<id>/download/ once an export has succeeded.
+"""
+import csv
+import io
+import logging
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.files import File
+from django.http import QueryDict
+from django.utils import timezone
+
+from .events import purge_events
+from .importers import (ERROR_REPORT_HEADER, ImportFailed, ImportRows, error_report_rows,
+                        import_procedures_csv, import_procedures_excel, import_students)
+from .models import BackgroundJob
+from .transcripts import write_transcripts_zip
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """
+    Register `func(job)` as the handler for jobs of `kind`. It returns the
+    JSON result stored on the job and may attach an artifact with
+    save_artifact().
+    """
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+class JobError(Exception):
+    """A handler failure whose message is shown to the user as-is."""
+
+
+def enqueue(kind, user, params=None, upload=None):
+    """Queue a job of `kind`; `upload` is an uploaded file kept for the worker."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    job = BackgroundJob(kind=kind, created_by=user, params=params or {})
+    if upload is not None:
+        job.input_file.save(os.path.basename(upload.name), upload, save=False)
+    job.save()
+    return job
+
+
+def save_artifact(job, filename, fileobj):
+    job.artifact.save(filename, File(fileobj), save=False)
+
+
+def query_params(job):
+    """The job's stored request parameters as a QueryDict, for view code that expects one."""
+    params = QueryDict(mutable=True)
+    for key, value in job.params.items():
+        params[key] = value
+    return params
+
+
+# ------------------------------------------------------------------
+# Worker
+# ------------------------------------------------------------------
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to "running" and return it, or
+    None. The conditional UPDATE lets several workers poll the same table.
+    """
+    candidates = (
+        BackgroundJob.objects
+        .filter(status='queued')
+        .order_by('created_at')
+        .values_list('pk', flat=True)[:5]
+    )
+    for pk in candidates:
+        claimed = BackgroundJob.objects.filter(pk=pk, status='queued').update(
+            status='running', started_at=timezone.now()
+        )
+        if claimed:
+            return BackgroundJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome; never raises."""
+    try:
+        result = JOB_HANDLERS[job.kind](job)
+    except JobError as e:
+        job.status = 'failed'
+        job.error = str(e)
+    except Exception as e:
+        logger.exception("Background job %s (%s) failed", job.pk, job.kind)
+        job.status = 'failed'
+        job.error = f"{type(e).__name__}: {e}"
+    else:
+        job.status = 'succeeded'
+        job.result = result
+        job.progress = 100
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def run_pending_jobs(limit=None):
+    """Run queued jobs until none are left (or `limit` have run). Returns how many ran."""
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
+
+
+def requeue_stale_jobs(timeout):
+    """Put back jobs left "running" longer than `timeout` by a worker that died."""
+    return BackgroundJob.objects.filter(
+        status='running', started_at__lt=timezone.now() - timeout
+    ).update(status='queued', started_at=None, progress=0, message='')
+
+
+def purge_finished_jobs(older_than):
+    """Delete finished jobs (and their files) older than `older_than`."""
+    purged = 0
+    for job in BackgroundJob.objects.filter(
+        status__in=['succeeded', 'failed'], finished_at__lt=timezone.now() - older_than
+    ).iterator():
+        job.input_file.delete(save=False)
+        job.artifact.delete(save=False)
+        job.delete()
+        purged += 1
+    return purged
+
+
+def run_worker(poll_interval=2.0, stale_after=timedelta(hours=1), keep_for=timedelta(days=7), once=False):
+    requeue_stale_jobs(stale_after)
+    purge_finished_jobs(keep_for)
+    purge_events()
+    last_purge = time.monotonic()
+    while True:
+        ran = run_pending_jobs()
+        if once:
+            return ran
+        if time.monotonic() - last_purge > 3600:
+            purge_finished_jobs(keep_for)
+            purge_events()
+            last_purge = time.monotonic()
+        if not ran:
+            time.sleep(poll_interval)
+
+
+# ------------------------------------------------------------------
+# Handlers
+# ------------------------------------------------------------------
+
+@job_handler('grades_pdf')
+def export_grades_pdf(job):
+    from .views import StudentGradesView
+
+    view = StudentGradesView()
+    students = view.get_export_queryset(query_params(job))
+    job.set_progress(10, f"{students.count()} students")
+
+    with tempfile.TemporaryFile() as output:
+        view._write_pdf(view._iter_grades_data(students.iterator()), output)
+        output.seek(0)
+        save_artifact(job, 'student_grades.pdf', output)
+    return {'filename': 'student_grades.pdf'}
+
+
+@job_handler('procedures_excel')
+def export_procedures_excel(job):
+    from .views import ProcedureViewSet
+
+    procedures = ProcedureViewSet().get_export_queryset(query_params(job))
+    export = ProcedureViewSet()._build_excel(procedures)
+    with tempfile.TemporaryFile() as output:
+        export.save(output)
+        output.seek(0)
+        save_artifact(job, 'procedures_and_steps.xlsx', output)
+    return {'filename': 'procedures_and_steps.xlsx'}
+
+
+def save_error_report(job, result):
+    """Attach the full error report of a dry-run import as the job's download."""
+    with tempfile.TemporaryFile() as output:
+        text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(ERROR_REPORT_HEADER)
+        writer.writerows(error_report_rows(result))
+        text.flush()
+        output.seek(0)
+        save_artifact(job, 'import_errors.csv', output)
+        text.detach()
+    result['filename'] = 'import_errors.csv'
+
+
+@job_handler('import_students')
+def import_students_job(job):
+    dry_run = job.params.get('dry_run', False)
+    with job.input_file.open('rb') as upload:
+        try:
+            result = import_students(
+                ImportRows(upload, job.params['file_extension']), progress=job.set_progress, dry_run=dry_run,
+                commit_chunks=True,
+            )
+        except ImportFailed as e:
+            raise JobError(str(e))
+    if dry_run:
+        save_error_report(job, result)
+    return result
+
+
+@job_handler('import_procedures')
+def import_procedures_job(job):
+    importer = import_procedures_csv if job.params['file_extension'] == 'csv' else import_procedures_excel
+    dry_run = job.params.get('dry_run', False)
+    with job.input_file.open('rb') as upload:
+        try:
+            result = importer(upload, progress=job.set_progress, dry_run=dry_run, commit_chunks=True)
+        except ImportFailed as e:
+            raise JobError(str(e))
+    if dry_run:
+        save_error_report(job, result)
+    return result
+
+
+@job_handler('transcripts_zip')
+def export_transcripts_zip(job):
+    from .views import StudentGradesView
+
+    students = StudentGradesView().get_export_queryset(query_params(job))
+
+    def progress(done, total):
+        job.set_progress(done * 95 // max(total, 1), f"{done} of {total} transcripts")
+
+    with tempfile.TemporaryFile() as output:
+        count = write_transcripts_zip(students, output, progress=progress)
+        output.seek(0)
+        save_artifact(job, 'transcripts.zip', output)
+    return {'filename': 'transcripts.zip', 'transcripts': count}
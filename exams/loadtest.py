@@ -0,0 +1,344 @@
+"""
+Exam-day load test: seed a synthetic exam, replay a traffic mix against
+it and report latency percentiles, queries per request and throughput.
+
+    python manage.py loadtest --requests 2000 --save-baseline loadtest.json
+    python manage.py loadtest --requests 2000 --compare loadtest.json
+
+By default requests go through the Django test client in this process,
+inside a transaction that is rolled back afterwards, and every request's
+queries are counted. With --url they go over HTTP to a running server:
+the exam is then committed (and deleted again unless --keep), and query
+counts are read from the Server-Timing header when the server runs with
+QUERY_INSTRUMENTATION.
+
+The traffic is drawn from TRAFFIC_MIX with a seeded random generator, so
+two runs with the same options send the same requests in the same order.
+"""
+import math
+import random
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+
+from .assignments import assign_examiners
+from .benchmarks import QueryCounter, seed_examiners, seed_procedure, seed_program, seed_students
+from .deletion import delete_students
+from .models import ProcedureStep, ProcedureStepScore, Program, StudentProcedure
+
+# operation -> relative weight; an autosave burst sends AUTOSAVE_BURST requests
+TRAFFIC_MIX = {
+    'board_poll': 40,
+    'procedure_detail': 15,
+    'autosave': 25,
+    'reconciliation': 10,
+    'grades_export': 5,
+    'student_import': 5,
+}
+AUTOSAVE_BURST = 5
+IMPORT_ROWS = 20
+# Scored (ready to reconcile) share of the seeded assessments
+SCORED_SHARE = 0.25
+# Latency below this many ms is noise, not a regression
+LATENCY_SLACK_MS = 2.0
+
+
+class SyntheticExam:
+    """The ids the traffic needs, read once after seeding."""
+
+    def __init__(self, programs, examiners, admin):
+        self.programs = programs
+        self.examiners = examiners
+        self.admin = admin
+        self.students = {}  # program id -> [(id, index number, full name, level)]
+        self.steps = {}  # procedure id -> [step ids]
+        self.pending = []  # (sp id, student id, procedure id, program id, examiner a, examiner b)
+        self.scored = []
+
+
+def seed_exam(programs=2, students=50, procedures=8, steps=10, examiners=6, rng=None):
+    """
+    Seed `programs` programs, each with `students` students and
+    `procedures` procedures of `steps` steps, all assigned to pairs from
+    `examiners` examiners. A share of the assessments is fully scored.
+    """
+    rng = rng or random.Random(0)
+    examiner_users = seed_examiners(examiners)
+    admin = User.objects.create(username=f'bench-admin-{rng.getrandbits(32):08x}', role='admin')
+    program_rows = [seed_program() for _ in range(programs)]
+    exam = SyntheticExam(program_rows, examiner_users, admin)
+
+    for program in program_rows:
+        seed_students(program, students)
+        for _ in range(procedures):
+            seed_procedure(program, steps)
+        assign_examiners(program.pk, [examiner.pk for examiner in examiner_users])
+
+    program_ids = [program.pk for program in program_rows]
+    for program in program_rows:
+        exam.students[program.pk] = list(
+            program.student_set.order_by('pk').values_list('pk', 'index_number', 'full_name', 'level')
+        )
+    for procedure_id, step_id in (
+        ProcedureStep.objects
+        .filter(procedure__program_id__in=program_ids)
+        .order_by('procedure_id', 'step_order')
+        .values_list('procedure_id', 'pk')
+    ):
+        exam.steps.setdefault(procedure_id, []).append(step_id)
+
+    assessments = list(
+        StudentProcedure.objects
+        .filter(procedure__program_id__in=program_ids)
+        .order_by('pk')
+        .values_list('pk', 'student_id', 'procedure_id', 'procedure__program_id', 'examiner_a_id', 'examiner_b_id')
+    )
+    rng.shuffle(assessments)
+    split = int(len(assessments) * SCORED_SHARE)
+    exam.scored, exam.pending = assessments[:split], assessments[split:]
+    _score_fully(exam, exam.scored)
+    return exam
+
+
+def _score_fully(exam, assessments):
+    # Examiner A (row[4]) first, then B (row[5]): B scores last and may reconcile
+    for column in (4, 5):
+        ProcedureStepScore.objects.bulk_create([
+            ProcedureStepScore(student_procedure_id=row[0], step_id=step_id, examiner_id=row[column],
+                               score=(index + column) % 5)
+            for row in assessments
+            for index, step_id in enumerate(exam.steps[row[2]])
+        ], batch_size=1000)
+    scored = StudentProcedure.objects.filter(pk__in=[row[0] for row in assessments])
+    scored.rebuild_scoring_counters()
+    scored.update(status='scored', updated_at=timezone.now())
+
+
+def drop_exam(exam):
+    """Delete everything seed_exam() created."""
+    student_ids = [row[0] for rows in exam.students.values() for row in rows]
+    delete_students(student_ids)
+    Program.objects.filter(pk__in=[program.pk for program in exam.programs]).delete()
+    User.objects.filter(pk__in=[exam.admin.pk, *(examiner.pk for examiner in exam.examiners)]).delete()
+
+
+# ------------------------------------------------------------------
+# Traffic
+# ------------------------------------------------------------------
+
+def plan_traffic(exam, count, rng):
+    """`count` requests as (operation, user, method, path, data, format) tuples."""
+    operations, weights = zip(*TRAFFIC_MIX.items())
+    planned = []
+    while len(planned) < count:
+        operation = rng.choices(operations, weights)[0]
+        planned.extend(_requests_for(operation, exam, rng))
+    return planned[:count]
+
+
+def _requests_for(operation, exam, rng):
+    if operation in ('board_poll', 'procedure_detail', 'autosave'):
+        sp_id, student_id, procedure_id, program_id, examiner_a_id, examiner_b_id = rng.choice(exam.pending)
+        examiner_id = rng.choice((examiner_a_id, examiner_b_id))
+        if operation == 'board_poll':
+            return [(operation, examiner_id, 'get', f'/api/exams/programs/{program_id}/procedures/',
+                     {'student_id': student_id}, None)]
+        if operation == 'procedure_detail':
+            return [(operation, examiner_id, 'get', f'/api/exams/students/{student_id}/procedures/{procedure_id}/',
+                     None, None)]
+        # Never the last step, so no assessment completes and the mix stays stable
+        steps = exam.steps[procedure_id][:-1]
+        return [
+            (operation, examiner_id, 'post', '/api/exams/autosave-step-score/',
+             {'student_procedure': sp_id, 'step': rng.choice(steps), 'score': rng.randint(0, 4)}, 'json')
+            for _ in range(AUTOSAVE_BURST)
+        ]
+    if operation == 'reconciliation':
+        sp_id, student_id, procedure_id, program_id, examiner_a_id, examiner_b_id = rng.choice(exam.scored)
+        return [(operation, examiner_b_id, 'get',
+                 f'/api/exams/students/{student_id}/procedures/{procedure_id}/reconciliation/', None, None)]
+
+    program = rng.choice(exam.programs)
+    if operation == 'grades_export':
+        return [(operation, exam.admin.pk, 'get', '/api/exams/grades/',
+                 {'export': 'csv', 'program_id': program.pk}, None)]
+    # Re-import existing students: a realistic parse, lookup and upsert
+    rows = rng.sample(exam.students[program.pk], min(IMPORT_ROWS, len(exam.students[program.pk])))
+    lines = ['Index Number,Full Name,Program,Level,Status'] + [
+        f'{index_number},{full_name},{program.name},{level},Yes' for _, index_number, full_name, level in rows
+    ]
+    return [(operation, exam.admin.pk, 'post', '/api/exams/students/import/', {'csv': '\n'.join(lines)}, 'upload')]
+
+
+class TestClientTransport:
+    """Requests through the Django test client, counting each one's queries."""
+
+    def __init__(self, tokens):
+        self.client = APIClient()
+        self.tokens = tokens
+
+    def send(self, user_id, method, path, data, format):
+        counter = QueryCounter()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.tokens[user_id]}'}
+        if format == 'upload':
+            data, format = {'file': SimpleUploadedFile('students.csv', data['csv'].encode())}, 'multipart'
+        start = time.perf_counter()
+        with connections['default'].execute_wrapper(counter):
+            response = getattr(self.client, method)(path, data, format=format, **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return time.perf_counter() - start, response.status_code, counter.count
+
+
+class HttpTransport:
+    """Requests over HTTP to a running server; one session per thread."""
+
+    SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+    def __init__(self, base_url, tokens):
+        self.base_url = base_url.rstrip('/')
+        self.tokens = tokens
+        self.local = threading.local()
+
+    def send(self, user_id, method, path, data, format):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        kwargs = {'headers': {'Authorization': f'Bearer {self.tokens[user_id]}'}}
+        if format == 'json':
+            kwargs['json'] = data
+        elif format == 'upload':
+            kwargs['files'] = {'file': ('students.csv', data['csv'].encode())}
+        else:
+            kwargs['params'] = data
+        start = time.perf_counter()
+        response = session.request(method.upper(), self.base_url + path, **kwargs)
+        elapsed = time.perf_counter() - start
+        match = self.SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+        return elapsed, response.status_code, int(match.group(1)) if match else None
+
+
+def percentile(sorted_values, share):
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(share * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, duration):
+    """The report for (operation, seconds, status, queries) samples sent in `duration` seconds."""
+    operations = {}
+    for operation in TRAFFIC_MIX:
+        rows = [sample for sample in samples if sample[0] == operation]
+        if not rows:
+            continue
+        latencies = sorted(seconds * 1000 for _, seconds, _, _ in rows)
+        queries = [count for _, _, _, count in rows if count is not None]
+        operations[operation] = {
+            'requests': len(rows),
+            'errors': sum(status >= 400 for _, _, status, _ in rows),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2),
+            'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+        }
+    return {
+        'requests': len(samples),
+        'errors': sum(row['errors'] for row in operations.values()),
+        'duration_s': round(duration, 2),
+        'throughput_rps': round(len(samples) / duration, 1) if duration else 0.0,
+        'operations': operations,
+    }
+
+
+def _replay(transport, traffic, concurrency):
+    def send(request):
+        operation, user_id, method, path, data, format = request
+        seconds, status, queries = transport.send(user_id, method, path, data, format)
+        return operation, seconds, status, queries
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(send, traffic))
+    else:
+        samples = [send(request) for request in traffic]
+    return samples, time.perf_counter() - start
+
+
+def run_load_test(request_count=1000, warmup=50, seed=1, url=None, concurrency=1, keep=False, **exam_options):
+    """
+    Seed an exam, replay `warmup` unrecorded and then `request_count`
+    recorded requests, and return the report (see summarize) with the options used.
+    """
+    config = {'requests': request_count, 'warmup': warmup, 'seed': seed, 'concurrency': concurrency, **exam_options}
+    rng = random.Random(seed)
+
+    def run(exam, transport):
+        traffic = plan_traffic(exam, warmup + request_count, rng)
+        _replay(transport, traffic[:warmup], concurrency)
+        samples, duration = _replay(transport, traffic[warmup:], concurrency)
+        return {'config': config, 'target': url or 'test client', **summarize(samples, duration)}
+
+    def tokens(exam):
+        return {user.pk: str(AccessToken.for_user(user)) for user in [exam.admin, *exam.examiners]}
+
+    if url:
+        exam = seed_exam(rng=rng, **exam_options)
+        try:
+            return run(exam, HttpTransport(url, tokens(exam)))
+        finally:
+            if not keep:
+                drop_exam(exam)
+
+    if concurrency > 1:
+        raise ValueError("Concurrency needs --url; the test client runs one request at a time")
+    with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        exam = seed_exam(rng=rng, **exam_options)
+        report = run(exam, TestClientTransport(tokens(exam)))
+        transaction.set_rollback(True)
+    return report
+
+
+def compare_to_baseline(report, baseline, tolerance=0.25):
+    """
+    Regressions of `report` against `baseline`: p95 latency or throughput
+    worse by more than `tolerance` (a fraction), more queries per request,
+    new errors. Returns a list of messages, empty when none.
+    """
+    regressions = []
+    if report['config'] != baseline.get('config'):
+        regressions.append(f"Options differ from the baseline's: {baseline.get('config')}")
+    if report['throughput_rps'] < baseline['throughput_rps'] / (1 + tolerance):
+        regressions.append(
+            f"throughput {report['throughput_rps']} req/s, baseline {baseline['throughput_rps']} req/s"
+        )
+    for operation, current in report['operations'].items():
+        previous = baseline['operations'].get(operation)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance) + LATENCY_SLACK_MS:
+            regressions.append(f"{operation}: p95 {current['p95_ms']} ms, baseline {previous['p95_ms']} ms")
+        if (current['queries_per_request'] or 0) > (previous['queries_per_request'] or 0):
+            regressions.append(
+                f"{operation}: {current['queries_per_request']} queries per request, "
+                f"baseline {previous['queries_per_request']}"
+            )
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{operation}: {current['errors']} errors, baseline {previous['errors']}")
+    return regressions
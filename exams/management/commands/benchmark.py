@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.benchmarks import SCENARIOS, run_scenario
+
+
+class Command(BaseCommand):
+    help = 'Run a synthetic-data benchmark scenario (all seeded data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenario',
+            type=str,
+            choices=sorted(SCENARIOS),
+            help='Scenario to run'
+        )
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            help='Sizes to run the scenario at (defaults per scenario)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Timed calls per size'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        self.stdout.write(f"Benchmark: {options['scenario']}")
+        results = run_scenario(options['scenario'], sizes=options['sizes'], repeat=options['repeat'])
+
+        columns = [key for key in results[0] if key != 'size']
+        widths = [max(14, len(c) + 2) for c in columns]
+        self.stdout.write('  ' + 'size'.rjust(8) + ''.join(c.rjust(w) for c, w in zip(columns, widths)))
+        for row in results:
+            self.stdout.write(
+                '  ' + str(row['size']).rjust(8) + ''.join(str(row[c]).rjust(w) for c, w in zip(columns, widths))
+            )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.models import Student
+from exams.transcripts import write_transcripts_zip
+
+
+class Command(BaseCommand):
+    help = 'Write one assessment transcript PDF per active student into a ZIP file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default='transcripts.zip',
+            help='ZIP file to write'
+        )
+        parser.add_argument(
+            '--program-id',
+            type=int,
+            help='Only students of this program'
+        )
+        parser.add_argument(
+            '--level',
+            choices=[level for level, _ in Student.LEVEL_CHOICES],
+            help='Only students at this level'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Rendering processes (default: one per CPU core)'
+        )
+
+    def handle(self, *args, **options):
+        students = Student.objects.filter(is_active=True).order_by('index_number')
+        if options['program_id']:
+            students = students.filter(program_id=options['program_id'])
+        if options['level']:
+            students = students.filter(level=options['level'])
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total} transcripts')
+
+        with open(options['output'], 'wb') as output:
+            count = write_transcripts_zip(students, output, workers=options['workers'], progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {count} transcripts written to {options['output']}"))
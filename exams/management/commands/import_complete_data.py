@@ -2,7 +2,10 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from openpyxl import load_workbook
 
-from exams.models import Procedure, ProcedureStep, Program, Student
+from exams.importers import (IMPORT_CHUNK_SIZE, chunked, existing_procedures, existing_steps, import_students,
+                             iter_sheet_rows, save_procedures, save_steps)
+from exams.models import Procedure, Program
+from exams.reference import invalidate_reference_data
 
 
 class Command(BaseCommand):
@@ -23,19 +26,20 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         filename = options['filename']
         dry_run = options['dry_run']
-        
+
         if dry_run:
             self.stdout.write(self.style.WARNING(
                 '=== DRY RUN MODE - No changes will be saved ===\n'
             ))
-        
+
         try:
-            wb = load_workbook(filename)
+            # Read-only: rows are parsed as they are iterated, not all up front
+            wb = load_workbook(filename, read_only=True, data_only=True)
         except FileNotFoundError:
             raise CommandError(f'File not found: {filename}')
         except Exception as e:
             raise CommandError(f'Error loading file: {str(e)}')
-        
+
         # Statistics
         stats = {
             'programs': {'created': 0, 'updated': 0, 'errors': 0},
@@ -43,239 +47,193 @@ class Command(BaseCommand):
             'procedures': {'created': 0, 'updated': 0, 'errors': 0},
             'steps': {'created': 0, 'updated': 0, 'errors': 0},
         }
-        
-        with transaction.atomic():
-            # Import Programs
-            if 'Programs' in wb.sheetnames:
-                self.stdout.write('Importing programs...')
-                ws = wb['Programs']
-                
-                for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                    if not row or not any(row):
-                        continue
-                    
-                    try:
-                        prog_id, name, abbreviation = row[0], row[1], row[2]
-                        
-                        if not name:
-                            self.stdout.write(self.style.WARNING(
-                                f'  Row {row_idx}: Skipped - missing name'
-                            ))
-                            stats['programs']['errors'] += 1
-                            continue
-                        
-                        if prog_id:
-                            # Update existing
-                            program, created = Program.objects.update_or_create(
-                                id=prog_id,
-                                defaults={
-                                    'name': name,
-                                    'abbreviation': abbreviation or None
-                                }
-                            )
-                        else:
-                            # Create new
-                            program, created = Program.objects.get_or_create(
-                                name=name,
-                                defaults={'abbreviation': abbreviation or None}
-                            )
-                        
-                        if created:
-                            stats['programs']['created'] += 1
-                        else:
-                            stats['programs']['updated'] += 1
-                    
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(
-                            f'  Row {row_idx}: Error - {str(e)}'
-                        ))
-                        stats['programs']['errors'] += 1
-                
-                self.stdout.write(self.style.SUCCESS(
-                    f'✓ Programs: {stats["programs"]["created"]} created, '
-                    f'{stats["programs"]["updated"]} updated, '
-                    f'{stats["programs"]["errors"]} errors'
-                ))
-            
-            # Import Students
-            if 'Students' in wb.sheetnames:
-                self.stdout.write('Importing students...')
-                ws = wb['Students']
-                
-                for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                    if not row or not any(row):
-                        continue
-                    
-                    try:
-                        student_id, index_number, full_name, program_name, is_active = row
-                        
-                        if not index_number or not full_name or not program_name:
-                            self.stdout.write(self.style.WARNING(
-                                f'  Row {row_idx}: Skipped - missing required fields'
-                            ))
-                            stats['students']['errors'] += 1
-                            continue
-                        
-                        # Get program
-                        try:
-                            program = Program.objects.get(name=program_name)
-                        except Program.DoesNotExist:
-                            self.stdout.write(self.style.ERROR(
-                                f'  Row {row_idx}: Program not found: {program_name}'
-                            ))
-                            stats['students']['errors'] += 1
-                            continue
-                        
-                        # Parse is_active
-                        active = is_active in ['Yes', 'True', '1', 1, True]
-                        
-                        # Create or update
-                        student, created = Student.objects.update_or_create(
-                            index_number=index_number,
-                            defaults={
-                                'full_name': full_name,
-                                'program': program,
-                                'is_active': active
-                            }
-                        )
-                        
-                        if created:
-                            stats['students']['created'] += 1
-                        else:
-                            stats['students']['updated'] += 1
-                    
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(
-                            f'  Row {row_idx}: Error - {str(e)}'
-                        ))
-                        stats['students']['errors'] += 1
-                
-                self.stdout.write(self.style.SUCCESS(
-                    f'✓ Students: {stats["students"]["created"]} created, '
-                    f'{stats["students"]["updated"]} updated, '
-                    f'{stats["students"]["errors"]} errors'
-                ))
-            
-            # Import Procedures
-            if 'Procedures' in wb.sheetnames:
-                self.stdout.write('Importing procedures...')
-                ws = wb['Procedures']
-                
-                for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                    if not row or not any(row):
-                        continue
-                    
-                    try:
-                        proc_id, program_name, procedure_name, total_score = row
-                        
-                        if not program_name or not procedure_name:
-                            self.stdout.write(self.style.WARNING(
-                                f'  Row {row_idx}: Skipped - missing required fields'
-                            ))
-                            stats['procedures']['errors'] += 1
-                            continue
-                        
-                        # Get program
-                        try:
-                            program = Program.objects.get(name=program_name)
-                        except Program.DoesNotExist:
-                            self.stdout.write(self.style.ERROR(
-                                f'  Row {row_idx}: Program not found: {program_name}'
-                            ))
-                            stats['procedures']['errors'] += 1
-                            continue
-                        
-                        # Create or update
-                        procedure, created = Procedure.objects.update_or_create(
-                            program=program,
-                            name=procedure_name,
-                            defaults={'total_score': total_score or 0}
-                        )
-                        
-                        if created:
-                            stats['procedures']['created'] += 1
-                        else:
-                            stats['procedures']['updated'] += 1
-                    
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(
-                            f'  Row {row_idx}: Error - {str(e)}'
-                        ))
-                        stats['procedures']['errors'] += 1
-                
-                self.stdout.write(self.style.SUCCESS(
-                    f'✓ Procedures: {stats["procedures"]["created"]} created, '
-                    f'{stats["procedures"]["updated"]} updated, '
-                    f'{stats["procedures"]["errors"]} errors'
-                ))
-            
-            # Import Procedure Steps
-            if 'Procedure Steps' in wb.sheetnames:
-                self.stdout.write('Importing procedure steps...')
-                ws = wb['Procedure Steps']
-                
-                for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                    if not row or not any(row):
+
+        # Each sheet is read and written a chunk at a time with the bulk
+        # writes of the API importers; later sheets see the earlier ones
+        sheets = [
+            ('Programs', 'programs', 'Programs', self.import_programs),
+            ('Students', 'students', 'Students', self.import_students),
+            ('Procedures', 'procedures', 'Procedures', self.import_procedures),
+            ('Procedure Steps', 'steps', 'Procedure Steps', self.import_steps),
+        ]
+
+        try:
+            with transaction.atomic():
+                for sheet_name, key, label, import_sheet in sheets:
+                    if sheet_name not in wb.sheetnames:
                         continue
-                    
-                    try:
-                        step_id, procedure_name, step_order, description = row
-                        
-                        if not procedure_name or not description:
-                            self.stdout.write(self.style.WARNING(
-                                f'  Row {row_idx}: Skipped - missing required fields'
-                            ))
-                            stats['steps']['errors'] += 1
-                            continue
-                        
-                        # Get procedure
-                        try:
-                            procedure = Procedure.objects.get(name=procedure_name)
-                        except Procedure.DoesNotExist:
-                            self.stdout.write(self.style.ERROR(
-                                f'  Row {row_idx}: Procedure not found: {procedure_name}'
-                            ))
-                            stats['steps']['errors'] += 1
-                            continue
-                        
-                        # Create or update
-                        step, created = ProcedureStep.objects.update_or_create(
-                            procedure=procedure,
-                            step_order=step_order or 1,
-                            defaults={'description': description}
-                        )
-                        
-                        if created:
-                            stats['steps']['created'] += 1
-                        else:
-                            stats['steps']['updated'] += 1
-                    
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(
-                            f'  Row {row_idx}: Error - {str(e)}'
-                        ))
-                        stats['steps']['errors'] += 1
-                
-                self.stdout.write(self.style.SUCCESS(
-                    f'✓ Procedure Steps: {stats["steps"]["created"]} created, '
-                    f'{stats["steps"]["updated"]} updated, '
-                    f'{stats["steps"]["errors"]} errors'
-                ))
-            
-            # Rollback if dry run
-            if dry_run:
-                transaction.set_rollback(True)
-                self.stdout.write(self.style.WARNING(
-                    '\n=== DRY RUN - All changes rolled back ==='
-                ))
-        
+                    self.stdout.write(f'Importing {label.lower()}...')
+
+                    errors = import_sheet(wb[sheet_name], stats[key])
+                    for error in errors:
+                        self.stdout.write(self.style.ERROR(f'  {error}'))
+
+                    self.stdout.write(self.style.SUCCESS(
+                        f'✓ {label}: {stats[key]["created"]} created, '
+                        f'{stats[key]["updated"]} updated, '
+                        f'{stats[key]["errors"]} errors'
+                    ))
+
+                # Rollback if dry run
+                if dry_run:
+                    transaction.set_rollback(True)
+                    self.stdout.write(self.style.WARNING(
+                        '\n=== DRY RUN - All changes rolled back ==='
+                    ))
+        finally:
+            wb.close()
+
         # Summary
         self.stdout.write(self.style.SUCCESS('\n✓ Import completed'))
         total_created = sum(s['created'] for s in stats.values())
         total_updated = sum(s['updated'] for s in stats.values())
         total_errors = sum(s['errors'] for s in stats.values())
-        
+
         self.stdout.write(f'  Total created: {total_created}')
         self.stdout.write(f'  Total updated: {total_updated}')
         if total_errors > 0:
-            self.stdout.write(self.style.WARNING(f'  Total errors: {total_errors}'))
\ No newline at end of file
+            self.stdout.write(self.style.WARNING(f'  Total errors: {total_errors}'))
+
+    def import_programs(self, ws, stats):
+        """ID, Name, Abbreviation: rows with an ID update that program, others are matched by name."""
+        errors = []
+        for chunk in chunked(iter_sheet_rows(ws), IMPORT_CHUNK_SIZE):
+            rows = []
+            for row_idx, row in chunk:
+                prog_id, name, abbreviation = (tuple(row) + (None,) * 3)[:3]
+                if not name:
+                    errors.append(f'Row {row_idx}: Skipped - missing name')
+                    continue
+                rows.append((prog_id, name, abbreviation or None))
+
+            by_id = Program.objects.in_bulk({prog_id for prog_id, _, _ in rows if prog_id})
+            by_name = Program.objects.in_bulk({name for prog_id, name, _ in rows if not prog_id}, field_name='name')
+
+            to_create = {}
+            to_update = {}
+            for prog_id, name, abbreviation in rows:
+                if prog_id:
+                    # Update existing, or create it under that ID
+                    program = to_create.get(('id', prog_id)) or by_id.get(prog_id)
+                    if program is None:
+                        to_create[('id', prog_id)] = Program(id=prog_id, name=name, abbreviation=abbreviation)
+                        stats['created'] += 1
+                        continue
+                    program.name, program.abbreviation = name, abbreviation
+                    if ('id', prog_id) not in to_create:
+                        to_update[prog_id] = program
+                    stats['updated'] += 1
+                elif name in by_name or ('name', name) in to_create:
+                    # Existing programs named without an ID are left as they are
+                    stats['updated'] += 1
+                else:
+                    to_create[('name', name)] = Program(name=name, abbreviation=abbreviation)
+                    stats['created'] += 1
+
+            Program.objects.bulk_create(to_create.values())
+            Program.objects.bulk_update(to_update.values(), ['name', 'abbreviation'])
+            if to_create or to_update:
+                # Bulk writes send no signals
+                invalidate_reference_data()
+
+        stats['errors'] += len(errors)
+        return errors
+
+    def import_students(self, ws, stats):
+        """ID, Index Number, Full Name, Program Name, Is Active: upserted by index number."""
+        summary = import_students(self.student_rows(ws))
+        for key in ('created', 'updated', 'errors'):
+            stats[key] += summary[key]
+        return summary['error_details']
+
+    def student_rows(self, ws):
+        """The Students sheet as the student importer's row dicts."""
+        for row_idx, row in iter_sheet_rows(ws):
+            _, index_number, full_name, program_name, is_active = (tuple(row) + (None,) * 5)[:5]
+            # No Level column: new students start at level 100, existing ones keep theirs
+            yield row_idx, {
+                'Index Number': index_number or '',
+                'Full Name': full_name or '',
+                'Program': program_name or '',
+                'Status': is_active,
+            }
+
+    def import_procedures(self, ws, stats):
+        """ID, Program Name, Procedure Name, Total Score: upserted by program and name."""
+        errors = []
+        programs = {program.name: program for program in Program.objects.all()}
+        for chunk in chunked(iter_sheet_rows(ws), IMPORT_CHUNK_SIZE):
+            procedures = []
+            for row_idx, row in chunk:
+                _, program_name, procedure_name, total_score = (tuple(row) + (None,) * 4)[:4]
+                if not program_name or not procedure_name:
+                    errors.append(f'Row {row_idx}: Skipped - missing required fields')
+                    continue
+
+                # Get program
+                program = programs.get(program_name)
+                if program is None:
+                    errors.append(f'Row {row_idx}: Program not found: {program_name}')
+                    continue
+
+                try:
+                    total_score = int(total_score or 0)
+                except (TypeError, ValueError):
+                    errors.append(f'Row {row_idx}: Invalid total score: {total_score}')
+                    continue
+
+                procedures.append(((program.pk, procedure_name), total_score))
+
+            created, updated, _ = save_procedures(procedures, existing_procedures(key for key, _ in procedures))
+            stats['created'] += created
+            stats['updated'] += updated
+
+        stats['errors'] += len(errors)
+        return errors
+
+    def import_steps(self, ws, stats):
+        """ID, Procedure Name, Step Order, Description: upserted by procedure and step order."""
+        errors = []
+        # Procedures by name, looked up once per name
+        procedures = {}
+        for chunk in chunked(iter_sheet_rows(ws), IMPORT_CHUNK_SIZE):
+            parsed = []
+            for row_idx, row in chunk:
+                _, procedure_name, step_order, description = (tuple(row) + (None,) * 4)[:4]
+                if not procedure_name or not description:
+                    errors.append(f'Row {row_idx}: Skipped - missing required fields')
+                    continue
+
+                try:
+                    step_order = int(step_order or 1)
+                except (TypeError, ValueError):
+                    errors.append(f'Row {row_idx}: Invalid step order: {step_order}')
+                    continue
+
+                parsed.append((row_idx, procedure_name, step_order, description))
+
+            unknown = {procedure_name for _, procedure_name, _, _ in parsed} - procedures.keys()
+            if unknown:
+                for procedure_name in unknown:
+                    procedures[procedure_name] = []
+                for procedure in Procedure.objects.filter(name__in=unknown):
+                    procedures[procedure.name].append(procedure)
+
+            steps = []
+            for row_idx, procedure_name, step_order, description in parsed:
+                matching = procedures[procedure_name]
+                if not matching:
+                    errors.append(f'Row {row_idx}: Procedure not found: {procedure_name}')
+                    continue
+                # The sheet names procedures without their program
+                if len(matching) > 1:
+                    errors.append(f'Row {row_idx}: Procedure name is not unique: {procedure_name}')
+                    continue
+                steps.append(((matching[0].pk, step_order), description))
+
+            created, updated = save_steps(steps, existing_steps(steps))
+            stats['created'] += created
+            stats['updated'] += updated
+
+        stats['errors'] += len(errors)
+        return errors
@@ -0,0 +1,85 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.loadtest import compare_to_baseline, run_load_test
+
+
+class Command(BaseCommand):
+    help = 'Replay exam-day traffic against a synthetic exam and report latency, queries and throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programs', type=int, default=2, help='Programs to seed')
+        parser.add_argument('--students', type=int, default=50, help='Students per program')
+        parser.add_argument('--procedures', type=int, default=8, help='Procedures per program')
+        parser.add_argument('--steps', type=int, default=10, help='Steps per procedure')
+        parser.add_argument('--examiners', type=int, default=6, help='Examiners shared by all programs')
+        parser.add_argument('--requests', type=int, default=1000, help='Recorded requests')
+        parser.add_argument('--warmup', type=int, default=50, help='Requests sent first and not recorded')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the traffic')
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server (e.g. http://127.0.0.1:8000); default: the in-process test client'
+        )
+        parser.add_argument('--concurrency', type=int, default=1, help='Parallel clients (with --url only)')
+        parser.add_argument('--keep', action='store_true', help='With --url, keep the seeded exam afterwards')
+        parser.add_argument('--save-baseline', metavar='PATH', help='Write the report to this JSON file')
+        parser.add_argument(
+            '--compare',
+            metavar='PATH',
+            help='Baseline JSON to compare with; exit with status 1 on a regression'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed p95 latency / throughput slowdown against the baseline (0.25 = 25%%)'
+        )
+
+    def handle(self, *args, **options):
+        for option in ('programs', 'students', 'procedures', 'steps', 'requests', 'concurrency'):
+            if options[option] < 1:
+                raise CommandError(f'--{option} must be at least 1')
+        if options['steps'] < 2 or options['examiners'] < 2:
+            raise CommandError('--steps and --examiners must be at least 2')
+        if options['concurrency'] > 1 and not options['url']:
+            raise CommandError('--concurrency needs --url')
+
+        self.stdout.write(f"Load test against {options['url'] or 'the test client'}...")
+        report = run_load_test(
+            request_count=options['requests'],
+            warmup=options['warmup'],
+            seed=options['seed'],
+            url=options['url'],
+            concurrency=options['concurrency'],
+            keep=options['keep'],
+            programs=options['programs'],
+            students=options['students'],
+            procedures=options['procedures'],
+            steps=options['steps'],
+            examiners=options['examiners'],
+        )
+
+        columns = ['requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'queries_per_request']
+        widths = [max(10, len(c) + 2) for c in columns]
+        self.stdout.write('  ' + 'operation'.ljust(18) + ''.join(c.rjust(w) for c, w in zip(columns, widths)))
+        for operation, row in report['operations'].items():
+            self.stdout.write(
+                '  ' + operation.ljust(18) + ''.join(str(row[c]).rjust(w) for c, w in zip(columns, widths))
+            )
+        self.stdout.write(
+            f"  {report['requests']} requests in {report['duration_s']} s: "
+            f"{report['throughput_rps']} req/s, {report['errors']} errors"
+        )
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump(report, baseline_file, indent=2)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                regressions = compare_to_baseline(report, json.load(baseline_file), options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('✓ No regressions against the baseline'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from exams.grades import rebuild_grade_summaries
+
+
+class Command(BaseCommand):
+    help = 'Backfill or verify the materialized StudentGradeSummary rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Students recomputed per batch'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report missing or out-of-date summaries; exit with status 1 if any'
+        )
+
+    def handle(self, *args, **options):
+        check = options['check']
+        self.stdout.write('Checking grade summaries...' if check else 'Rebuilding grade summaries...')
+
+        with transaction.atomic():
+            checked, stale = rebuild_grade_summaries(
+                batch_size=options['batch_size'],
+                dry_run=check
+            )
+
+        if check and stale:
+            raise CommandError(f'{stale} of {checked} student summaries are missing or out of date')
+
+        verb = 'out of date' if check else 'updated'
+        self.stdout.write(self.style.SUCCESS(f'✓ {stale} of {checked} student summaries {verb}'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exams.models import StudentProcedure
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-examiner completion counters on StudentProcedure from existing step scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows written per bulk update'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding scoring counters...')
+
+        with transaction.atomic():
+            updated = StudentProcedure.objects.all().rebuild_scoring_counters(
+                batch_size=options['batch_size']
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {updated} of {StudentProcedure.objects.count()} assessments updated'
+        ))
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from exams.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (exports and imports); keeps polling until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=60,
+            help='Minutes after which a job left running by a dead worker is queued again'
+        )
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=7,
+            help='Days finished jobs and their files are kept'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs currently queued, then exit'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Waiting for background jobs...' if not options['once'] else 'Running queued jobs...')
+
+        ran = run_worker(
+            poll_interval=options['poll_interval'],
+            stale_after=timedelta(minutes=options['stale_after']),
+            keep_for=timedelta(days=options['keep_days']),
+            once=options['once'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {ran} jobs run'))
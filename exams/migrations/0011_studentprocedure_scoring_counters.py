@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-17 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0010_alter_student_full_name_alter_student_index_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprocedure',
+            name='examiner_a_last_scored_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentprocedure',
+            name='examiner_a_scored_steps',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentprocedure',
+            name='examiner_b_last_scored_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentprocedure',
+            name='examiner_b_scored_steps',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='procedurestepscore',
+            index=models.Index(fields=['step', 'student_procedure', 'examiner'], name='exams_proce_step_id_2aa4bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reconciledscore',
+            index=models.Index(fields=['student_procedure'], name='exams_recon_student_8e360c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['program', 'level'], name='exams_stude_program_b1deee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprocedure',
+            index=models.Index(fields=['student', 'status'], name='exams_stude_student_4ecbf4_idx'),
+        ),
+    ]
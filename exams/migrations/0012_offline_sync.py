@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-17 20:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('exams', '0011_studentprocedure_scoring_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprocedure',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ScoreSyncReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('outcome', models.CharField(choices=[('applied', 'Applied'), ('stale', 'Stale'), ('rejected', 'Rejected')], max_length=20)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+                ('examiner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_receipts', to=settings.AUTH_USER_MODEL)),
+                ('student_procedure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_receipts', to='exams.studentprocedure')),
+            ],
+            options={
+                'unique_together': {('examiner', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-17 20:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0012_offline_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentGradeSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='grade_summary', serialize=False, to='exams.student')),
+                ('procedure_score', models.PositiveIntegerField(default=0)),
+                ('procedure_max_score', models.PositiveIntegerField(default=0)),
+                ('reconciled_count', models.PositiveIntegerField(default=0)),
+                ('care_plan_score', models.PositiveIntegerField(default=0)),
+                ('care_plan_max_score', models.PositiveIntegerField(default=0)),
+                ('total_score', models.PositiveIntegerField(db_index=True, default=0)),
+                ('max_score', models.PositiveIntegerField(default=0)),
+                ('percentage', models.FloatField(db_index=True, default=0)),
+                ('grade', models.CharField(db_index=True, default='N/A', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-17 21:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('exams', '0015_student_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('scored', 'Scored by both examiners'), ('reconciler_assigned', 'Reconciler assigned'), ('reconciled', 'Reconciled')], max_length=30)),
+                ('status', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('procedure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.procedure')),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.program')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.student')),
+                ('student_procedure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='exams.studentprocedure')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['program', 'id'], name='exams_asses_program_4bd0fc_idx'), models.Index(fields=['student', 'id'], name='exams_asses_student_122bf5_idx')],
+            },
+        ),
+    ]
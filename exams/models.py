@@ -1,5 +1,9 @@
+import uuid
+
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Count, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from accounts.models import User
 
 
@@ -23,6 +27,7 @@ class Student(models.Model):
     program = models.ForeignKey(Program, on_delete=models.PROTECT, db_index=True)
     level = models.CharField(max_length=3, choices=LEVEL_CHOICES, default='100', db_index=True)
     is_active = models.BooleanField(default=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["level", "index_number"]
@@ -60,6 +65,55 @@ class ProcedureStep(models.Model):
     def __str__(self):
         return f"{self.procedure.name} - Step {self.step_order}"
 
+class StudentProcedureQuerySet(models.QuerySet):
+
+    def with_total_steps(self):
+        """
+        Annotate the procedure's step count so completion checks
+        (get_last_scoring_examiner / can_user_reconcile) need no extra query.
+        """
+        step_total = (
+            ProcedureStep.objects
+            .filter(procedure=OuterRef('procedure'))
+            .values('procedure')
+            .annotate(total=Count('id'))
+            .values('total')[:1]
+        )
+        return self.annotate(total_steps=Coalesce(Subquery(step_total), Value(0)))
+
+    def rebuild_scoring_counters(self, batch_size=500):
+        """
+        Recompute the per-examiner completion counters from step_scores.
+        Returns the number of rows whose counters changed.
+        """
+        progress = {}
+        scores = (
+            ProcedureStepScore.objects
+            .filter(student_procedure__in=self.values('pk'))
+            .values('student_procedure', 'examiner')
+            .annotate(scored=Count('id'), last=Max('updated_at'))
+        )
+        for row in scores.iterator():
+            progress[(row['student_procedure'], row['examiner'])] = (row['scored'], row['last'])
+
+        now = timezone.now()
+        changed = []
+        updated = 0
+        for sp in self.only(*StudentProcedure.COUNTER_FIELDS, 'examiner_a', 'examiner_b').iterator():
+            before = sp.get_counter_values()
+            sp.apply_scoring_progress(progress)
+            if sp.get_counter_values() != before:
+                sp.updated_at = now  # bulk_update skips auto_now
+                changed.append(sp)
+            if len(changed) >= batch_size:
+                StudentProcedure.objects.bulk_update(changed, StudentProcedure.COUNTER_FIELDS + ['updated_at'])
+                updated += len(changed)
+                changed = []
+        if changed:
+            StudentProcedure.objects.bulk_update(changed, StudentProcedure.COUNTER_FIELDS + ['updated_at'])
+            updated += len(changed)
+        return updated
+
 class StudentProcedure(models.Model):
     STATUS_CHOICES = (
         ("pending", "Pending"),
@@ -89,6 +143,7 @@ class StudentProcedure(models.Model):
     )
 
     assessed_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     reconciled_by = models.ForeignKey(
         User,
@@ -108,6 +163,22 @@ class StudentProcedure(models.Model):
         help_text="The examiner assigned to perform reconciliation (locked once set)"
     )
 
+    # Completion counters, maintained by record_step_scores() so autosave never
+    # has to count step_scores, and recounted when steps are added or deleted
+    # (exams.scoring.refresh_procedure_scoring). Rebuild with
+    # `manage.py rebuild_scoring_counters`.
+    examiner_a_scored_steps = models.PositiveIntegerField(default=0)
+    examiner_b_scored_steps = models.PositiveIntegerField(default=0)
+    examiner_a_last_scored_at = models.DateTimeField(null=True, blank=True)
+    examiner_b_last_scored_at = models.DateTimeField(null=True, blank=True)
+
+    COUNTER_FIELDS = [
+        'examiner_a_scored_steps', 'examiner_b_scored_steps',
+        'examiner_a_last_scored_at', 'examiner_b_last_scored_at',
+    ]
+
+    objects = StudentProcedureQuerySet.as_manager()
+
     class Meta:
         unique_together = ("student", "procedure")
         indexes = [
@@ -129,40 +200,122 @@ class StudentProcedure(models.Model):
         max_score = self.procedure.total_score
         return (total / max_score * 100) if max_score > 0 else 0
     
-    def get_last_scoring_examiner(self):
+    def get_total_steps(self):
+        """Step count of the procedure, from the with_total_steps() annotation when present"""
+        if hasattr(self, 'total_steps'):
+            return self.total_steps
+        return self.procedure.steps.count()
+
+    def get_scoring_progress(self):
         """
-        Returns the examiner who completed scoring last, or None if scoring incomplete.
+        Returns (total_steps, examiner_a_scored, examiner_b_scored,
+        examiner_a_last_scored_at, examiner_b_last_scored_at).
+        """
+        return (
+            self.get_total_steps(),
+            self.examiner_a_scored_steps,
+            self.examiner_b_scored_steps,
+            self.examiner_a_last_scored_at,
+            self.examiner_b_last_scored_at,
+        )
+
+    def get_completion(self):
+        """Returns (examiner_a_complete, examiner_b_complete); both False until two different examiners are assigned"""
+        if self.examiner_a_id == self.examiner_b_id:
+            return False, False
+        total_steps = self.get_total_steps()
+        return (
+            self.examiner_a_scored_steps == total_steps,
+            self.examiner_b_scored_steps == total_steps,
+        )
+
+    def get_counter_values(self):
+        return tuple(getattr(self, field) for field in self.COUNTER_FIELDS)
+
+    def apply_scoring_progress(self, progress):
+        """
+        Set the counters from {(student_procedure_id, examiner_id): (scored, last_scored_at)}.
+        While examiner_b is still the placeholder (same as examiner_a) only
+        examiner_a's counters are filled.
+        """
+        self.examiner_a_scored_steps, self.examiner_a_last_scored_at = progress.get(
+            (self.pk, self.examiner_a_id), (0, None)
+        )
+        if self.examiner_a_id == self.examiner_b_id:
+            self.examiner_b_scored_steps, self.examiner_b_last_scored_at = 0, None
+        else:
+            self.examiner_b_scored_steps, self.examiner_b_last_scored_at = progress.get(
+                (self.pk, self.examiner_b_id), (0, None)
+            )
+
+    def refresh_scoring_counters(self):
+        """Recompute this row's counters from step_scores (does not save)"""
+        progress = {
+            (self.pk, row['examiner']): (row['scored'], row['last'])
+            for row in self.step_scores.values('examiner').annotate(
+                scored=Count('id'), last=Max('updated_at')
+            )
+        }
+        self.apply_scoring_progress(progress)
+
+    def record_step_scores(self, examiner_id, created_count, scored_at):
+        """
+        Update the completion counters after an examiner's step scores were
+        saved (`created_count` of them new) and flip the status to "scored"
+        once both examiners have scored every step.
+        Callers should hold the row with select_for_update().
+        """
+        role = 'examiner_a' if examiner_id == self.examiner_a_id else 'examiner_b'
+        update_fields = [f'{role}_last_scored_at']
+        if created_count:
+            setattr(self, f'{role}_scored_steps', getattr(self, f'{role}_scored_steps') + created_count)
+            update_fields.append(f'{role}_scored_steps')
+        last_scored_at = getattr(self, f'{role}_last_scored_at')
+        if last_scored_at is None or scored_at > last_scored_at:
+            setattr(self, f'{role}_last_scored_at', scored_at)
+
+        examiner_a_complete, examiner_b_complete = self.get_completion()
+        if examiner_a_complete and examiner_b_complete and self.status == 'pending':
+            self.status = 'scored'
+            update_fields.append('status')
+
+        update_fields.append('updated_at')
+
+        self.save(update_fields=update_fields)
+
+    def get_last_scoring_examiner_id(self):
+        """
+        Returns the id of the examiner who completed scoring last, or None if scoring incomplete.
         Only returns an examiner if BOTH examiners have completed all steps.
         """
-        if self.examiner_a == self.examiner_b:
+        if self.examiner_a_id == self.examiner_b_id:
             return None
-            
-        total_steps = self.procedure.steps.count()
-        
-        # Check if both examiners completed all steps
-        examiner_a_scores = self.step_scores.filter(examiner=self.examiner_a).count()
-        examiner_b_scores = self.step_scores.filter(examiner=self.examiner_b).count()
-        
+
+        total_steps, examiner_a_scores, examiner_b_scores, examiner_a_last, examiner_b_last = (
+            self.get_scoring_progress()
+        )
+
         if examiner_a_scores != total_steps or examiner_b_scores != total_steps:
             return None
-        
-        # Get the most recent score update for each examiner
-        examiner_a_last_update = self.step_scores.filter(
-            examiner=self.examiner_a
-        ).order_by('-updated_at').first()
-        
-        examiner_b_last_update = self.step_scores.filter(
-            examiner=self.examiner_b
-        ).order_by('-updated_at').first()
-        
-        if not examiner_a_last_update or not examiner_b_last_update:
+
+        if not examiner_a_last or not examiner_b_last:
             return None
-        
+
         # Return the examiner who updated last
-        if examiner_a_last_update.updated_at > examiner_b_last_update.updated_at:
-            return self.examiner_a
+        if examiner_a_last > examiner_b_last:
+            return self.examiner_a_id
         else:
-            return self.examiner_b
+            return self.examiner_b_id
+
+    def get_last_scoring_examiner(self):
+        """
+        Returns the examiner who completed scoring last, or None if scoring incomplete.
+        Only returns an examiner if BOTH examiners have completed all steps.
+        """
+        last_examiner_id = self.get_last_scoring_examiner_id()
+        if last_examiner_id is None:
+            return None
+        return self.examiner_a if last_examiner_id == self.examiner_a_id else self.examiner_b
     
     def can_user_reconcile(self, user):
         """
@@ -173,16 +326,16 @@ class StudentProcedure(models.Model):
             return False
         
         # If reconciler already assigned, only that user can reconcile
-        if self.assigned_reconciler:
-            return self.assigned_reconciler == user
+        if self.assigned_reconciler_id:
+            return self.assigned_reconciler_id == user.pk
         
         # If not assigned yet, check if user is the last examiner to complete
-        last_examiner = self.get_last_scoring_examiner()
-        return last_examiner == user
+        last_examiner_id = self.get_last_scoring_examiner_id()
+        return last_examiner_id is not None and last_examiner_id == user.pk
     
     def is_user_assigned_examiner(self, user):
         """Check if user is one of the assigned examiners"""
-        return user in [self.examiner_a, self.examiner_b]
+        return user.pk in [self.examiner_a_id, self.examiner_b_id]
 
 class ProcedureStepScore(models.Model):
     student_procedure = models.ForeignKey(
@@ -213,6 +366,64 @@ class ProcedureStepScore(models.Model):
     def __str__(self):
         return f"{self.step} = {self.score}"
 
+class ScoreSyncReceipt(models.Model):
+    """Idempotency record for a journal entry processed by the offline sync endpoint"""
+    OUTCOME_CHOICES = (
+        ("applied", "Applied"),
+        ("stale", "Stale"),
+        ("rejected", "Rejected"),
+    )
+
+    examiner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sync_receipts")
+    key = models.CharField(max_length=64)
+    student_procedure = models.ForeignKey(
+        StudentProcedure,
+        on_delete=models.CASCADE,
+        related_name="sync_receipts"
+    )
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("examiner", "key")
+
+    def __str__(self):
+        return f"{self.examiner} {self.key} ({self.outcome})"
+
+class AssessmentEvent(models.Model):
+    """
+    A StudentProcedure status transition, written in the transaction that
+    made it and streamed to tablets by exams.events.
+    """
+    KIND_CHOICES = (
+        ("scored", "Scored by both examiners"),
+        ("reconciler_assigned", "Reconciler assigned"),
+        ("reconciled", "Reconciled"),
+    )
+
+    student_procedure = models.ForeignKey(
+        StudentProcedure,
+        on_delete=models.CASCADE,
+        related_name="events"
+    )
+    # Denormalized so streams filter without joins
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name="+")
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="+")
+    procedure = models.ForeignKey(Procedure, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["program", "id"]),
+            models.Index(fields=["student", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.student_procedure} {self.kind}"
+
 class ReconciledScore(models.Model):
     """Final reconciled scores - separate from examiner scores"""
     student_procedure = models.ForeignKey(
@@ -262,3 +473,91 @@ class CarePlan(models.Model):
     
     def get_percentage(self):
         return (self.score / self.max_score * 100) if self.max_score > 0 else 0
+
+
+class StudentGradeSummary(models.Model):
+    """
+    Materialized grade totals for one student, kept in step with
+    reconciliations and care plans by exams.grades.refresh_grade_summaries().
+    """
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='grade_summary'
+    )
+    procedure_score = models.PositiveIntegerField(default=0)
+    procedure_max_score = models.PositiveIntegerField(default=0)
+    reconciled_count = models.PositiveIntegerField(default=0)
+    care_plan_score = models.PositiveIntegerField(default=0)
+    care_plan_max_score = models.PositiveIntegerField(default=0)
+    total_score = models.PositiveIntegerField(default=0, db_index=True)
+    max_score = models.PositiveIntegerField(default=0)
+    percentage = models.FloatField(default=0, db_index=True)
+    grade = models.CharField(max_length=20, default='N/A', db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    TOTAL_FIELDS = [
+        'procedure_score', 'procedure_max_score', 'reconciled_count',
+        'care_plan_score', 'care_plan_max_score',
+    ]
+    DERIVED_FIELDS = ['total_score', 'max_score', 'percentage', 'grade']
+
+    def __str__(self):
+        return f"{self.student} - {self.grade} ({self.percentage:.1f}%)"
+
+    def get_values(self):
+        return tuple(getattr(self, field) for field in self.TOTAL_FIELDS + self.DERIVED_FIELDS)
+
+
+class BackgroundJob(models.Model):
+    """
+    A long-running export or import, queued by the API and executed by the
+    `run_jobs` worker (see exams.jobs).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    params = models.JSONField(default=dict, blank=True)
+    input_file = models.FileField(upload_to='jobs/input/', blank=True)
+    artifact = models.FileField(upload_to='jobs/output/', blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)  # 0-100
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='background_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def set_progress(self, progress, message=''):
+        """Record progress without touching the other columns the worker owns."""
+        self.progress = max(0, min(int(progress), 100))
+        self.message = message[:255]
+        BackgroundJob.objects.filter(pk=self.pk).update(progress=self.progress, message=self.message)
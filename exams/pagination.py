@@ -0,0 +1,106 @@
+import base64
+import json
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a single sort column with the primary key
+    as tie-breaker. The cursor holds the last row's (value, pk), so each page
+    is one `WHERE (col, pk) > (value, pk) ... LIMIT n` query and the cost
+    depends on the page size, not on how far into the list the client is.
+
+    The view supplies the column through `get_ordering(request)`, which
+    returns (field_name, descending). The column must be non-null; annotate
+    it with Coalesce when it comes from an outer join.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field, descending = view.get_ordering(request)
+        page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        backwards = bool(cursor and cursor[2])
+
+        # Walking backwards is the same seek in the opposite direction
+        if backwards:
+            descending = not descending
+        queryset = queryset.order_by(*[
+            f'-{name}' if descending else name for name in (self.field, 'pk')
+        ])
+        if cursor:
+            value, pk = cursor[0], cursor[1]
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) |
+                Q(**{self.field: value, f'pk__{lookup}': pk})
+            )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        self.has_next = True if backwards else has_more
+        self.has_previous = has_more if backwards else cursor is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ------------------------------------------------------------------
+    # Cursors
+    # ------------------------------------------------------------------
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, backwards = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            pk = int(pk)
+        except (TypeError, ValueError, BinasciiError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, bool(backwards)
+
+    def encode_cursor(self, row, backwards):
+        payload = json.dumps([getattr(row, self.field), row.pk, int(backwards)])
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], backwards=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], backwards=True)
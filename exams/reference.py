@@ -0,0 +1,116 @@
+"""
+Cached reference data: programs, procedures and procedure steps.
+
+These hardly change during an exam but are read on almost every request,
+so they are kept in Django's cache (Redis when REDIS_URL is set, the
+in-process cache otherwise). Every entry's key embeds a version number
+that is itself stored in the cache. Saving or deleting a Program,
+Procedure or ProcedureStep bumps the version (see the signal receivers
+below), which orphans every entry at once. Code that writes these models
+without signals (bulk_create, queryset.update(), raw deletes) must call
+invalidate_reference_data() itself.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Procedure, ProcedureStep, Program
+
+VERSION_KEY = 'exams:reference:version'
+CHANGED_AT_KEY = 'exams:reference:changed-at'
+
+_local = threading.local()
+
+
+def reference_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock, not 1, so a version evicted from the cache
+        # never comes back to reach old entries
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def cached(name, build):
+    """The cached value of `name`, built with build() on a miss."""
+    key = f'exams:reference:{reference_version()}:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.REFERENCE_CACHE_TIMEOUT)
+        _local.fresh = False
+    return value
+
+
+def reference_changed_at():
+    """When reference data last changed, as far as this cache knows, or None."""
+    return cache.get(CHANGED_AT_KEY)
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+    cache.set(CHANGED_AT_KEY, timezone.now(), timeout=None)
+    _local.fresh = True
+
+
+def invalidate_reference_data(using=DEFAULT_DB_ALIAS):
+    """
+    Orphan every cached reference entry: now, so this request stops reading
+    them, and again once the surrounding transaction commits, so entries
+    other requests cached from the old rows meanwhile go too.
+
+    A cascade delete sends one signal per step; within a transaction only
+    the first call bumps, unless something was cached since.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        _bump_version()
+        return
+
+    registered = any(func is _bump_version for _, func, *_ in connection.run_on_commit)
+    if not (registered and getattr(_local, 'fresh', False)):
+        _bump_version()
+    if not registered:
+        transaction.on_commit(_bump_version, using=using)
+
+
+@receiver(post_save, sender=Program)
+@receiver(post_save, sender=Procedure)
+@receiver(post_save, sender=ProcedureStep)
+@receiver(post_delete, sender=Program)
+@receiver(post_delete, sender=Procedure)
+@receiver(post_delete, sender=ProcedureStep)
+def reference_data_changed(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    invalidate_reference_data(using)
+
+
+# ------------------------------------------------------------------
+# Cached lookups
+# ------------------------------------------------------------------
+
+def program_procedures(program_id):
+    """A program's procedures with `program` and `step_count`, in one query on a miss."""
+    return cached(f'program-procedures:{program_id}', lambda: list(
+        Procedure.objects
+        .filter(program_id=program_id)
+        .select_related('program')
+        .annotate(step_count=Count('steps'))
+    ))
+
+
+def procedure_steps(procedure_id):
+    """A procedure's steps in step order."""
+    return cached(f'procedure-steps:{procedure_id}', lambda: list(
+        ProcedureStep.objects.filter(procedure_id=procedure_id).order_by('step_order')
+    ))
@@ -0,0 +1,178 @@
+"""
+Paginated PDF reports.
+
+Rows are drawn straight onto a reportlab canvas, one table per page
+holding as many rows as fit under a repeated header. Rows are read from
+an iterator one page at a time, so no flowable for the whole report is
+ever built and layout stays linear in the row count. A single Table over
+every row, laid out by SimpleDocTemplate, is split again for each page,
+which is quadratic. The PDF is written to a spooled temporary file and
+streamed back.
+
+    report = PdfReport(output, "Student Grades Report")
+    report.table(header, rows, style=GRID_STYLE)
+    report.save()
+"""
+import tempfile
+from itertools import islice
+
+from django.http import FileResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+# Reports up to this size are assembled in memory, larger ones on disk
+PDF_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Header plus grid, shared by the exports
+GRID_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+]
+
+
+class PdfReport:
+    """
+    A report drawn top to bottom onto `output` (a file or file-like
+    object): a title, then tables and paragraphs. Call save() at the end.
+    """
+
+    def __init__(self, output, title, pagesize=landscape(letter), margin=0.5 * inch):
+        self.canvas = Canvas(output, pagesize=pagesize, pageCompression=1)
+        self.canvas.setTitle(title)
+        self.styles = getSampleStyleSheet()
+        self.width, self.height = pagesize
+        self.margin = margin
+        self.page = 0
+        self._start_page()
+        self.paragraph(title, 'Title')
+
+    @property
+    def frame_width(self):
+        return self.width - 2 * self.margin
+
+    @property
+    def remaining(self):
+        """Height left on the current page."""
+        return self.y - self.margin
+
+    def _start_page(self):
+        self.page += 1
+        self.y = self.height - self.margin
+        self.fresh_page = True
+
+    def new_page(self):
+        self._draw_footer()
+        self.canvas.showPage()
+        self._start_page()
+
+    def _draw_footer(self):
+        self.canvas.setFont('Helvetica', 8)
+        self.canvas.drawRightString(self.width - self.margin, self.margin / 2, f"Page {self.page}")
+
+    def _draw(self, flowable, height):
+        flowable.drawOn(self.canvas, self.margin, self.y - height)
+        self.y -= height
+        self.fresh_page = False
+
+    def _wrap(self, flowable):
+        return flowable.wrapOn(self.canvas, self.frame_width, self.remaining)[1]
+
+    def spacer(self, height):
+        self.y = max(self.y - height, self.margin)
+
+    def paragraph(self, text, style='Normal', keep_with=0):
+        """
+        Draw a paragraph, on a new page unless it fits here together with
+        `keep_with` points of what follows (so headings are not orphaned).
+        """
+        paragraph = Paragraph(text, self.styles[style])
+        height = self._wrap(paragraph) + paragraph.getSpaceAfter()
+        if height + keep_with > self.remaining and not self.fresh_page:
+            self.new_page()
+            height = self._wrap(paragraph) + paragraph.getSpaceAfter()
+        self._draw(paragraph, height - paragraph.getSpaceAfter())
+        self.spacer(paragraph.getSpaceAfter())
+
+    def _make_table(self, header, rows, col_widths, style):
+        table = Table([header, *rows], colWidths=col_widths, repeatRows=1)
+        table.setStyle(TableStyle(style))
+        return table
+
+    def table(self, header, rows, col_widths=None, style=GRID_STYLE, title=None, title_style='Heading2'):
+        """
+        Draw `rows` (any iterable of row sequences) under `header`, one
+        table per page, each starting with the header. An optional `title`
+        paragraph stays on the page of the first rows.
+        """
+        rows = iter(rows)
+        pending = list(islice(rows, 1))
+        # Single-line rows share one height; measure it on the first row
+        sample = self._make_table(header, pending, col_widths, style)
+        self._wrap(sample)
+        header_height = sample._rowHeights[0]
+        row_height = sample._rowHeights[1] if pending else header_height
+
+        if title:
+            self.paragraph(title, title_style, keep_with=header_height + row_height)
+        if not pending:
+            # An empty table still shows its header
+            if header_height > self.remaining and not self.fresh_page:
+                self.new_page()
+            self._draw(sample, self._wrap(sample))
+            return
+
+        while True:
+            if not pending:
+                pending = list(islice(rows, 1))
+                if not pending:
+                    return
+            if header_height + row_height > self.remaining and not self.fresh_page:
+                self.new_page()
+            fit = max(1, int((self.remaining - header_height) // row_height))
+            batch, pending = pending[:fit], pending[fit:]
+            batch.extend(islice(rows, fit - len(batch)))
+            # Rows taller than the sample (wrapped cells) are carried over
+            pending = self._draw_table(self._make_table(header, batch, col_widths, style), batch) + pending
+
+    def _draw_table(self, table, batch):
+        """Draw as much of `table` as fits; return the rows of `batch` left over."""
+        height = self._wrap(table)
+        if height <= self.remaining or self.fresh_page and len(batch) <= 1:
+            self._draw(table, height)
+            return []
+        parts = table.splitOn(self.canvas, self.frame_width, self.remaining)
+        if len(parts) < 2:
+            if self.fresh_page:
+                # Cannot fit even on an empty page; draw and clip
+                self._draw(table, height)
+                return []
+            self.new_page()
+            return list(batch)
+        drawn = parts[0]._nrows - 1
+        self._draw(parts[0], self._wrap(parts[0]))
+        self.new_page()
+        return list(batch[drawn:])
+
+    def save(self):
+        self._draw_footer()
+        self.canvas.save()
+
+
+def pdf_response(filename, write):
+    """
+    Run write(output) into a spooled temporary file and stream it back as
+    a PDF attachment.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    write(buffer)
+    buffer.seek(0)
+    return FileResponse(buffer, as_attachment=True, filename=filename, content_type='application/pdf')
@@ -0,0 +1,356 @@
+"""
+Step-score writes shared by the autosave and offline sync endpoints.
+
+All helpers expect to run inside transaction.atomic() with the
+StudentProcedure row locked via get_locked_student_procedure().
+
+When a procedure gains or loses steps, refresh_procedure_scoring()
+recounts its assessments' completion counters and moves them between
+"pending" and "scored" (see the signal receivers; the step importers
+call it themselves).
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+
+from .dashboard import invalidate_dashboard
+from .events import publish
+from .grades import refresh_procedure_grade_summaries
+from .models import (ProcedureStep, ProcedureStepScore, ScoreSyncReceipt,
+                     StudentProcedure)
+
+
+class ScoringError(Exception):
+    """A scoring request that must be refused; carries the API detail and status code."""
+
+    def __init__(self, detail, status_code=status.HTTP_403_FORBIDDEN):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def get_locked_student_procedure(student_procedure_id):
+    """
+    Fetch the StudentProcedure with its step total, locking the row: the
+    completion counters are read-modify-write.
+    """
+    try:
+        return (
+            StudentProcedure.objects
+            .select_for_update()
+            .with_total_steps()
+            .get(id=student_procedure_id)
+        )
+    except (StudentProcedure.DoesNotExist, ValueError, TypeError):
+        raise ScoringError("StudentProcedure not found.", status.HTTP_404_NOT_FOUND)
+
+
+def check_can_score(sp, user):
+    """Raise ScoringError unless `user` may still change their scores on `sp`."""
+    # Verify current user is one of the assigned examiners
+    if not sp.is_user_assigned_examiner(user):
+        raise ScoringError("You are not authorized to score this procedure.")
+
+    # Check if procedure is locked
+    if sp.assigned_reconciler_id:
+        raise ScoringError("Cannot modify scores. Reconciler has been assigned.")
+
+    if sp.status == "reconciled":
+        raise ScoringError("Cannot modify scores. Procedure has been reconciled.")
+
+
+def parse_score(value):
+    try:
+        score = int(value)
+    except (TypeError, ValueError):
+        score = -1
+    if score < 0 or isinstance(value, bool):
+        raise ScoringError("score must be a non-negative integer.", status.HTTP_400_BAD_REQUEST)
+    return score
+
+
+def save_step_scores(sp, user, scores):
+    """
+    Upsert `user`'s {step_id: score} on `sp` with one read and bulk writes,
+    then update the completion counters (which may flip the status to
+    "scored"). Step ids must already be validated against the procedure.
+    Returns {step_id: created}.
+    """
+    if not scores:
+        return {}
+
+    now = timezone.now()
+    existing = {
+        step_score.step_id: step_score
+        for step_score in ProcedureStepScore.objects.filter(
+            student_procedure=sp, examiner=user, step_id__in=list(scores)
+        )
+    }
+
+    to_create = []
+    to_update = []
+    created = {}
+    for step_id, score in scores.items():
+        step_score = existing.get(step_id)
+        if step_score is None:
+            to_create.append(ProcedureStepScore(
+                student_procedure=sp, step_id=step_id, examiner=user, score=score
+            ))
+            created[step_id] = True
+        else:
+            step_score.score = score
+            step_score.updated_at = now  # bulk_update skips auto_now
+            to_update.append(step_score)
+            created[step_id] = False
+
+    ProcedureStepScore.objects.bulk_create(to_create)
+    ProcedureStepScore.objects.bulk_update(to_update, ['score', 'updated_at'])
+
+    # auto_now stamped the created rows during bulk_create
+    scored_at = max(step_score.updated_at for step_score in to_create + to_update)
+    previous_status = sp.status
+    sp.record_step_scores(user.pk, len(to_create), scored_at)
+    if sp.status != previous_status:
+        publish(sp, 'scored', actor=user)
+    return created
+
+
+def completion_payload(sp):
+    """Status and lock flags returned by every autosave response."""
+    examiner_a_complete, examiner_b_complete = sp.get_completion()
+    return {
+        "status": sp.status,
+        "examiner_a_complete": examiner_a_complete,
+        "examiner_b_complete": examiner_b_complete,
+        "both_examiners_assigned": sp.examiner_a_id != sp.examiner_b_id,
+        "is_locked": sp.assigned_reconciler_id is not None,
+    }
+
+
+# ------------------------------------------------------------------
+# Step changes
+# ------------------------------------------------------------------
+
+def refresh_procedure_scoring(procedure_ids, steps_deleted=True):
+    """
+    Recount the completion counters of the assessments of `procedure_ids`
+    after steps were deleted, and fix their status: "pending" rows both
+    examiners have now fully scored become "scored", "scored" rows with a
+    step left unscored go back to "pending". When steps were only added
+    no score went away, so only the second check runs. Returns the number
+    of rows whose status changed.
+    """
+    assessments = StudentProcedure.objects.filter(procedure_id__in=procedure_ids)
+    if steps_deleted:
+        assessments.rebuild_scoring_counters()
+
+    open_rows = (
+        assessments
+        .filter(status__in=['pending', 'scored'])
+        .exclude(examiner_b=F('examiner_a'))
+        .with_total_steps()
+    )
+    complete = Q(total_steps__gt=0, examiner_a_scored_steps=F('total_steps'),
+                 examiner_b_scored_steps=F('total_steps'))
+    now_scored = []
+    if steps_deleted:
+        now_scored = list(open_rows.filter(complete, status='pending').values_list('pk', flat=True))
+    now_pending = list(open_rows.filter(status='scored').exclude(complete).values_list('pk', flat=True))
+    if not now_scored and not now_pending:
+        return 0
+
+    now = timezone.now()
+    StudentProcedure.objects.filter(pk__in=now_scored).update(status='scored', updated_at=now)
+    StudentProcedure.objects.filter(pk__in=now_pending).update(status='pending', updated_at=now)
+    for sp in StudentProcedure.objects.filter(pk__in=now_scored).select_related('procedure'):
+        publish(sp, 'scored')
+    # queryset.update() sends no signals
+    invalidate_dashboard()
+    return len(now_scored) + len(now_pending)
+
+
+@receiver(post_save, sender=ProcedureStep)
+def step_saved(sender, instance, created, **kwargs):
+    if created:
+        refresh_procedure_scoring([instance.procedure_id], steps_deleted=False)
+
+
+@receiver(post_delete, sender=ProcedureStep)
+def step_deleted(sender, instance, origin=None, **kwargs):
+    # Steps deleted along with their procedure take its assessments with them
+    if getattr(origin, 'model', type(origin)) is not ProcedureStep:
+        return
+    # The cascade has already deleted the step's scores, reconciled ones included
+    refresh_procedure_scoring([instance.procedure_id])
+    refresh_procedure_grade_summaries([instance.procedure_id])
+
+
+# ------------------------------------------------------------------
+# Offline sync
+# ------------------------------------------------------------------
+
+# Deltas are computed from updated_at > cursor. Handing out a cursor slightly
+# in the past covers writes that were stamped before the delta was read but
+# committed after it; clients may see a row twice, never miss one.
+SYNC_CURSOR_OVERLAP = timedelta(seconds=5)
+
+
+def _parse_client_ts(value):
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(str(value))
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def apply_sync_journal(user, changes):
+    """
+    Apply a tablet's journal of step-score changes, in order.
+
+    Each change is {key, student_procedure, step, score, client_ts}. Keys
+    already processed for this examiner are skipped ("duplicate"). Entries
+    for assessments the examiner may no longer edit are "rejected", and an
+    entry older than the score already on the server (e.g. from another
+    device) is "stale". Returns one result per change, in journal order.
+    """
+    results = [None] * len(changes)
+    pending = []  # (index, change, student_procedure_id, step_id, score, client_ts)
+
+    for index, change in enumerate(changes):
+        key = str(change.get("key") or "").strip() if isinstance(change, dict) else ""
+        if not key or len(key) > 64:
+            results[index] = {"key": key or None, "outcome": "invalid", "detail": "key is required (max 64 characters)."}
+            continue
+        try:
+            student_procedure_id = int(change["student_procedure"])
+            step_id = int(change["step"])
+            score = parse_score(change.get("score"))
+            client_ts = _parse_client_ts(change.get("client_ts"))
+        except (KeyError, TypeError, ValueError, ScoringError):
+            results[index] = {
+                "key": key, "outcome": "invalid",
+                "detail": "student_procedure, step, score and a valid client_ts are required.",
+            }
+            continue
+        pending.append((index, key, student_procedure_id, step_id, score, client_ts))
+
+    # Keys seen before, and keys repeated within this journal
+    seen = dict(
+        ScoreSyncReceipt.objects
+        .filter(examiner=user, key__in=[entry[1] for entry in pending])
+        .values_list("key", "outcome")
+    )
+    fresh = []
+    for entry in pending:
+        index, key = entry[0], entry[1]
+        if key in seen:
+            results[index] = {"key": key, "outcome": "duplicate", "previous_outcome": seen[key]}
+        else:
+            seen[key] = None
+            fresh.append(entry)
+
+    # Lock every assessment touched, in id order to avoid deadlocks
+    sp_ids = sorted({entry[2] for entry in fresh})
+    assessments = {
+        sp.id: sp
+        for sp in StudentProcedure.objects.select_for_update().with_total_steps().filter(id__in=sp_ids).order_by("id")
+    }
+    step_procedures = dict(
+        ProcedureStep.objects
+        .filter(procedure_id__in={sp.procedure_id for sp in assessments.values()})
+        .values_list("id", "procedure_id")
+    )
+    server_updated_at = {
+        (row["student_procedure_id"], row["step_id"]): row["updated_at"]
+        for row in ProcedureStepScore.objects.filter(
+            student_procedure_id__in=list(assessments), examiner=user
+        ).values("student_procedure_id", "step_id", "updated_at")
+    }
+
+    receipts = []
+    to_apply = {}  # student_procedure_id -> {step_id: score}
+    for index, key, student_procedure_id, step_id, score, client_ts in fresh:
+        sp = assessments.get(student_procedure_id)
+        if sp is None or step_procedures.get(step_id) != sp.procedure_id:
+            results[index] = {"key": key, "outcome": "invalid", "detail": "Unknown student_procedure or step."}
+            continue
+
+        try:
+            check_can_score(sp, user)
+        except ScoringError as e:
+            outcome, detail = "rejected", e.detail
+        else:
+            last_write = server_updated_at.get((sp.id, step_id))
+            if client_ts and last_write and client_ts < last_write:
+                outcome, detail = "stale", "A newer score for this step is already on the server."
+            else:
+                outcome, detail = "applied", None
+                to_apply.setdefault(sp.id, {})[step_id] = score
+                if client_ts:
+                    server_updated_at[(sp.id, step_id)] = client_ts
+
+        results[index] = {"key": key, "outcome": outcome}
+        if detail:
+            results[index]["detail"] = detail
+        receipts.append(ScoreSyncReceipt(examiner=user, key=key, student_procedure_id=sp.id, outcome=outcome))
+
+    for student_procedure_id, scores in to_apply.items():
+        save_step_scores(assessments[student_procedure_id], user, scores)
+
+    ScoreSyncReceipt.objects.bulk_create(receipts)
+    return results
+
+
+def sync_delta(user, cursor=None):
+    """
+    Server-side state changed since `cursor` for `user`'s assessments:
+    status/lock flags of each StudentProcedure and the examiner's own step
+    scores. Returns (delta, next_cursor).
+    """
+    next_cursor = timezone.now() - SYNC_CURSOR_OVERLAP
+
+    assessments = (
+        StudentProcedure.objects
+        .filter(Q(examiner_a=user) | Q(examiner_b=user))
+        .with_total_steps()
+        .order_by("id")
+    )
+    scores = ProcedureStepScore.objects.filter(examiner=user).order_by("id")
+    if cursor:
+        assessments = assessments.filter(updated_at__gt=cursor)
+        scores = scores.filter(updated_at__gt=cursor)
+
+    delta = {
+        "assessments": [
+            {
+                "id": sp.id,
+                "student": sp.student_id,
+                "procedure": sp.procedure_id,
+                "examiner_role": "A" if sp.examiner_a_id == user.pk else "B",
+                "updated_at": sp.updated_at,
+                **completion_payload(sp),
+            }
+            for sp in assessments
+        ],
+        "scores": [
+            {
+                "student_procedure": row["student_procedure_id"],
+                "step": row["step_id"],
+                "score": row["score"],
+                "updated_at": row["updated_at"],
+            }
+            for row in scores.values("student_procedure_id", "step_id", "score", "updated_at")
+        ],
+    }
+    return delta, next_cursor
@@ -1,7 +1,11 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from .models import (CarePlan, Procedure, ProcedureStep, ProcedureStepScore,
-                     Program, ReconciledScore, Student, StudentProcedure)
+from rest_framework.reverse import reverse
+
+from .assessment import AssessmentContext
+from .models import (BackgroundJob, CarePlan, Procedure, ProcedureStep,
+                     ProcedureStepScore, Program, ReconciledScore, Student,
+                     StudentProcedure)
 
 User = get_user_model()
 
@@ -26,6 +30,23 @@ class UserCreateSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
+class DashboardBreakdownSerializer(serializers.Serializer):
+    total_students = serializers.IntegerField()
+    active_students = serializers.IntegerField()
+    pending_assessments = serializers.IntegerField()
+    scored_assessments = serializers.IntegerField()
+    reconciled_assessments = serializers.IntegerField()
+
+class DashboardProgramStatsSerializer(DashboardBreakdownSerializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    abbreviation = serializers.CharField(allow_null=True)
+    total_procedures = serializers.IntegerField()
+
+class DashboardLevelStatsSerializer(DashboardBreakdownSerializer):
+    level = serializers.CharField()
+    label = serializers.CharField()
+
 class DashboardStatsSerializer(serializers.Serializer):
     total_students = serializers.IntegerField()
     active_students = serializers.IntegerField()
@@ -35,6 +56,8 @@ class DashboardStatsSerializer(serializers.Serializer):
     scored_assessments = serializers.IntegerField()
     reconciled_assessments = serializers.IntegerField()
     total_programs = serializers.IntegerField()
+    programs = DashboardProgramStatsSerializer(many=True)
+    levels = DashboardLevelStatsSerializer(many=True)
 
 class StudentCreateUpdateSerializer(serializers.ModelSerializer):
     program_id = serializers.IntegerField(write_only=True)
@@ -186,33 +209,44 @@ class ProcedureListSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "total_score", "program_id", "program_name", 
                   "program_abbreviation", "status", "step_count", "can_reconcile", "display_status"]
     
-    def get_status(self, obj):
+    def _get_student_procedure(self, obj):
+        """
+        The student's StudentProcedure for this row. ProcedureByProgramView
+        prefetches these into `student_assessments`; other callers fall back
+        to a lookup.
+        """
         student_id = self.context.get("student_id")
         if not student_id:
-            return "pending"
+            return None
+        
+        if hasattr(obj, "student_assessments"):
+            return obj.student_assessments[0] if obj.student_assessments else None
         
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
+        return obj.studentprocedure_set.filter(student_id=student_id).first()
+    
+    def get_status(self, obj):
+        sp = self._get_student_procedure(obj)
         if not sp:
             return "pending"
         
         # If both examiners are the same (not yet fully assigned), return pending
-        if sp.examiner_a == sp.examiner_b:
+        if sp.examiner_a_id == sp.examiner_b_id:
             return "pending"
         
         return sp.status
     
     def get_step_count(self, obj):
+        if hasattr(obj, "step_count"):
+            return obj.step_count
         return obj.steps.count()
     
     def get_can_reconcile(self, obj):
         """Check if current user can reconcile this procedure"""
-        student_id = self.context.get("student_id")
         request = self.context.get("request")
-        
-        if not student_id or not request:
+        if not request:
             return False
         
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
+        sp = self._get_student_procedure(obj)
         if not sp or sp.status != "scored":
             return False
         
@@ -227,17 +261,15 @@ class ProcedureListSerializer(serializers.ModelSerializer):
         - 'scored': Scored but current user cannot reconcile
         - 'reconciled': Already reconciled
         """
-        student_id = self.context.get("student_id")
         request = self.context.get("request")
-        
-        if not student_id or not request:
+        if not request:
             return "pending"
         
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
+        sp = self._get_student_procedure(obj)
         if not sp:
             return "pending"
         
-        if sp.examiner_a == sp.examiner_b:
+        if sp.examiner_a_id == sp.examiner_b_id:
             return "pending"
         
         if sp.status == "reconciled":
@@ -282,29 +314,25 @@ class ReconciliationSerializer(serializers.ModelSerializer):
         if not request:
             return False
         
-        last_examiner = obj.get_last_scoring_examiner()
-        return last_examiner == request.user
+        last_examiner_id = obj.get_last_scoring_examiner_id()
+        return last_examiner_id is not None and last_examiner_id == request.user.pk
 
     def get_steps(self, obj):
+        # Pivot both examiners' scores and the reconciled scores by step id.
+        # ReconciliationView prefetches all three relations, so this costs no
+        # per-step queries however long the procedure is.
+        examiner_scores = {}
+        for step_score in sorted(obj.step_scores.all(), key=lambda s: s.pk):
+            examiner_scores.setdefault((step_score.step_id, step_score.examiner_id), step_score.score)
+        reconciled = {r.step_id: r.score for r in obj.reconciled_scores.all()}
+
         steps_data = []
         for step in obj.procedure.steps.all():
             # Get scores from both examiners
-            examiner_a_score = obj.step_scores.filter(
-                step=step, 
-                examiner=obj.examiner_a
-            ).first()
-            examiner_b_score = obj.step_scores.filter(
-                step=step, 
-                examiner=obj.examiner_b
-            ).first()
-            
-            # Get existing reconciled score if already reconciled
-            reconciled_score = obj.reconciled_scores.filter(step=step).first()
+            score_a = examiner_scores.get((step.id, obj.examiner_a_id))
+            score_b = examiner_scores.get((step.id, obj.examiner_b_id))
             
             # Calculate valid score range
-            score_a = examiner_a_score.score if examiner_a_score else None
-            score_b = examiner_b_score.score if examiner_b_score else None
-            
             valid_scores = []
             if score_a is not None and score_b is not None:
                 min_score = min(score_a, score_b)
@@ -317,7 +345,7 @@ class ReconciliationSerializer(serializers.ModelSerializer):
                 "step_order": step.step_order,
                 "examiner_a_score": score_a,
                 "examiner_b_score": score_b,
-                "reconciled_score": reconciled_score.score if reconciled_score else None,
+                "reconciled_score": reconciled.get(step.id),
                 "valid_scores": valid_scores,  # NEW FIELD
             })
         return steps_data
@@ -340,117 +368,96 @@ class ProcedureDetailSerializer(serializers.ModelSerializer):
             "can_modify_scores", "is_locked"
         ]
 
+    def _get_assessment(self, obj):
+        """
+        Shared per-request state for all fields. Views pass a preloaded
+        AssessmentContext as context["assessment"]; otherwise it is loaded
+        once here and reused by the remaining fields.
+        """
+        assessment = self.context.get("assessment")
+        if assessment is None or assessment.procedure.pk != obj.pk:
+            request = self.context.get("request")
+            assessment = AssessmentContext.load(
+                obj,
+                student_id=self.context.get("student_id"),
+                user=request.user if request else None,
+            )
+            self.context["assessment"] = assessment
+        return assessment
+
     def get_steps(self, obj):
-        steps = obj.steps.all()
+        steps = self._get_assessment(obj).steps
         return [{"id": s.id, "description": s.description, "step_order": s.step_order} for s in steps]
 
     def get_studentProcedureId(self, obj):
-        student_id = self.context.get("student_id")
-        if not student_id:
+        if not self.context.get("student_id"):
             return None
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
+        sp = self._get_assessment(obj).student_procedure
         return sp.id if sp else None
 
     def get_scores(self, obj):
         """Only return scores for the current logged-in user"""
-        student_id = self.context.get("student_id")
-        request = self.context.get("request")
-        
-        if not student_id or not request:
-            return []
-        
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
-        if not sp:
+        if not self.context.get("student_id") or not self.context.get("request"):
             return []
         
-        # Only fetch scores for the current user (examiner)
-        scores = sp.step_scores.filter(examiner=request.user)
-        return ProcedureStepScoreSerializer(scores, many=True).data
+        return ProcedureStepScoreSerializer(self._get_assessment(obj).user_scores, many=True).data
     
     def get_is_examiner(self, obj):
         """Check if current user is an assigned examiner"""
-        student_id = self.context.get("student_id")
-        request = self.context.get("request")
-        
-        if not student_id or not request:
+        if not self.context.get("student_id") or not self.context.get("request"):
             return False
         
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
-        if not sp:
-            return False
-        
-        return request.user in [sp.examiner_a, sp.examiner_b]
+        return self._get_assessment(obj).is_examiner
     
     def get_examiner_role(self, obj):
         """Return which examiner the current user is (A or B)"""
-        student_id = self.context.get("student_id")
-        request = self.context.get("request")
-        
-        if not student_id or not request:
+        if not self.context.get("student_id") or not self.context.get("request"):
             return None
         
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
-        if not sp:
-            return None
-        
-        if request.user == sp.examiner_a:
-            return "A"
-        elif request.user == sp.examiner_b:
-            return "B"
-        return None
+        return self._get_assessment(obj).examiner_role
     
     def get_both_examiners_assigned(self, obj):
         """Check if both different examiners are assigned"""
-        student_id = self.context.get("student_id")
-        if not student_id:
+        if not self.context.get("student_id"):
             return False
         
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
-        if not sp:
-            return False
-        
-        return sp.examiner_a != sp.examiner_b
+        return self._get_assessment(obj).both_examiners_assigned
     
     def get_can_modify_scores(self, obj):
-        """
-        Check if current user can modify their scores.
-        Cannot modify if:
-        1. Not an assigned examiner
-        2. Reconciler has been assigned (locked)
-        3. Already reconciled
-        """
-        student_id = self.context.get("student_id")
-        request = self.context.get("request")
-        
-        if not student_id or not request:
-            return False
-        
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
-        if not sp:
-            return True  # New procedure, can score
-        
-        # Cannot modify if reconciled
-        if sp.status == "reconciled":
-            return False
-        
-        # Cannot modify if not an assigned examiner
-        if not sp.is_user_assigned_examiner(request.user):
+        """Check if current user can modify their scores (see AssessmentContext)"""
+        if not self.context.get("student_id") or not self.context.get("request"):
             return False
         
-        # Cannot modify if reconciler has been assigned (locked)
-        if sp.assigned_reconciler:
-            return False
-        
-        return True
+        return self._get_assessment(obj).can_modify_scores
     
     def get_is_locked(self, obj):
         """Check if procedure is locked (reconciler assigned or reconciled)"""
-        student_id = self.context.get("student_id")
-        if not student_id:
+        if not self.context.get("student_id"):
             return False
         
-        sp = obj.studentprocedure_set.filter(student_id=student_id).first()
-        if not sp:
-            return False
-        
-        return sp.assigned_reconciler is not None or sp.status == "reconciled"
+        return self._get_assessment(obj).is_locked
+
+
+# ================ BACKGROUND JOB SERIALIZERS ==============
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            'id', 'kind', 'status', 'progress', 'message', 'result', 'error',
+            'created_at', 'started_at', 'finished_at', 'status_url', 'download_url',
+        ]
+
+    def _url(self, name, obj):
+        return reverse(name, kwargs={'job_id': obj.pk}, request=self.context.get('request'))
+
+    def get_status_url(self, obj):
+        return self._url('job-status', obj)
+
+    def get_download_url(self, obj):
+        if obj.status != 'succeeded' or not obj.artifact:
+            return None
+        return self._url('job-download', obj)
@@ -1,3 +1,2016 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import tracemalloc
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connections, transaction
+from openpyxl import Workbook, load_workbook
+from reportlab.platypus import Table
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+
+from . import assignments, events, reference
+from .deletion import (PROCEDURE_DELETE_PLAN, STUDENT_DELETE_PLAN, delete_procedures, delete_students,
+                       preview_delete)
+from .events import Subscription, publish, purge_events
+from .importers import ImportRows, import_procedure_steps, import_students
+from .instrumentation import QueryBudgetExceeded, view_stats
+from .jobs import claim_next_job, run_pending_jobs
+from .loadtest import TRAFFIC_MIX, compare_to_baseline, plan_traffic, run_load_test, seed_exam
+from .models import (AssessmentEvent, BackgroundJob, CarePlan, Procedure, ProcedureStep, ProcedureStepScore,
+                     Program, ReconciledScore, ScoreSyncReceipt, Student, StudentGradeSummary,
+                     StudentProcedure)
+from .reports import PdfReport
+from .transcripts import load_transcripts, render_transcript
+from .views import ProgramListView, StudentByProgramView
+
+
+class ExamTestCase(TestCase):
+    """Shared fixtures: one program, one student, two examiners and an admin."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.program = Program.objects.create(name="Registered General Nursing", abbreviation="RGN")
+        cls.student = Student.objects.create(
+            index_number="RGN-001", full_name="Ama Mensah", program=cls.program, level="300"
+        )
+        cls.examiner_a = User.objects.create_user(
+            username="examiner_a", password="pass", role="examiner", first_name="Kofi", last_name="Boateng"
+        )
+        cls.examiner_b = User.objects.create_user(
+            username="examiner_b", password="pass", role="examiner", first_name="Efua", last_name="Owusu"
+        )
+        cls.admin = User.objects.create_user(username="admin", password="pass", role="admin")
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def create_procedure(self, name="Vital Signs", step_count=5, program=None):
+        procedure = Procedure.objects.create(
+            program=program or self.program, name=name, total_score=step_count * 4
+        )
+        ProcedureStep.objects.bulk_create([
+            ProcedureStep(procedure=procedure, step_order=order, description=f"Step {order}")
+            for order in range(1, step_count + 1)
+        ])
+        return procedure
+
+    def create_assessment(self, procedure, student=None, status="pending"):
+        return StudentProcedure.objects.create(
+            student=student or self.student,
+            procedure=procedure,
+            examiner_a=self.examiner_a,
+            examiner_b=self.examiner_b,
+            status=status,
+        )
+
+    def score_all_steps(self, student_procedure, examiner, score=3):
+        ProcedureStepScore.objects.bulk_create([
+            ProcedureStepScore(
+                student_procedure=student_procedure, step=step, examiner=examiner, score=score
+            )
+            for step in student_procedure.procedure.steps.all()
+        ])
+        self.refresh_counters(student_procedure)
+
+    def refresh_counters(self, student_procedure):
+        student_procedure.refresh_scoring_counters()
+        student_procedure.save(update_fields=StudentProcedure.COUNTER_FIELDS)
+
+
+class ProcedureDetailQueryTests(ExamTestCase):
+
+    def get_detail(self, procedure):
+        return self.client.get(f"/api/exams/students/{self.student.id}/procedures/{procedure.id}/")
+
+    def test_detail_payload(self):
+        procedure = self.create_procedure(step_count=3)
+        sp = self.create_assessment(procedure)
+        self.score_all_steps(sp, self.examiner_a, score=2)
+        self.client.force_authenticate(self.examiner_a)
+
+        response = self.get_detail(procedure)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["studentProcedureId"], sp.id)
+        self.assertEqual(len(response.data["steps"]), 3)
+        self.assertEqual([s["score"] for s in response.data["scores"]], [2, 2, 2])
+        self.assertTrue(response.data["is_examiner"])
+        self.assertEqual(response.data["examiner_role"], "A")
+        self.assertTrue(response.data["both_examiners_assigned"])
+        self.assertTrue(response.data["can_modify_scores"])
+        self.assertFalse(response.data["is_locked"])
+
+    def test_query_count_is_constant_in_step_count(self):
+        self.client.force_authenticate(self.examiner_b)
+        for step_count in (3, 40):
+            procedure = self.create_procedure(name=f"Procedure {step_count}", step_count=step_count)
+            sp = self.create_assessment(procedure)
+            self.score_all_steps(sp, self.examiner_b)
+
+            # procedure, steps (reference cache miss), student procedure, current examiner's scores
+            with self.assertNumQueries(4):
+                response = self.get_detail(procedure)
+            self.assertEqual(len(response.data["scores"]), step_count)
+
+
+class ProcedureBoardQueryTests(ExamTestCase):
+
+    def get_board(self):
+        return self.client.get(
+            f"/api/exams/programs/{self.program.id}/procedures/", {"student_id": self.student.id}
+        )
+
+    def test_reconcile_eligibility_follows_last_scorer(self):
+        procedure = self.create_procedure(step_count=4)
+        sp = self.create_assessment(procedure, status="scored")
+        self.score_all_steps(sp, self.examiner_a)
+        self.score_all_steps(sp, self.examiner_b)
+        ProcedureStepScore.objects.filter(examiner=self.examiner_b).update(
+            updated_at=timezone.now() + timedelta(minutes=1)
+        )
+        self.refresh_counters(sp)
+
+        self.client.force_authenticate(self.examiner_b)
+        row = self.get_board().data[0]
+        self.assertEqual(row["step_count"], 4)
+        self.assertEqual(row["status"], "scored")
+        self.assertTrue(row["can_reconcile"])
+        self.assertEqual(row["display_status"], "ready_to_reconcile")
+
+        self.client.force_authenticate(self.examiner_a)
+        row = self.get_board().data[0]
+        self.assertFalse(row["can_reconcile"])
+        self.assertEqual(row["display_status"], "scored")
+
+    def test_query_count_is_constant_in_procedure_count(self):
+        self.client.force_authenticate(self.examiner_a)
+        for index in range(12):
+            procedure = self.create_procedure(name=f"Procedure {index}", step_count=3)
+            if index % 2:
+                sp = self.create_assessment(procedure, status="scored")
+                self.score_all_steps(sp, self.examiner_a)
+                self.score_all_steps(sp, self.examiner_b)
+
+            # ETag validator, procedures with program and step count
+            # (reference cache miss), assessments
+            with self.assertNumQueries(3):
+                response = self.get_board()
+            self.assertEqual(len(response.data), index + 1)
+
+
+class ReconciliationQueryTests(ExamTestCase):
+
+    def get_reconciliation(self, procedure):
+        return self.client.get(
+            f"/api/exams/students/{self.student.id}/procedures/{procedure.id}/reconciliation/"
+        )
+
+    def test_steps_are_pivoted_per_examiner(self):
+        procedure = self.create_procedure(step_count=3)
+        sp = self.create_assessment(procedure, status="scored")
+        self.score_all_steps(sp, self.examiner_a, score=1)
+        self.score_all_steps(sp, self.examiner_b, score=3)
+        self.client.force_authenticate(self.examiner_b)
+
+        response = self.get_reconciliation(procedure)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["steps"]), 3)
+        step = response.data["steps"][0]
+        self.assertEqual(step["examiner_a_score"], 1)
+        self.assertEqual(step["examiner_b_score"], 3)
+        self.assertEqual(step["valid_scores"], [1, 2, 3])
+        self.assertIsNone(step["reconciled_score"])
+
+    def test_query_count_is_constant_in_step_count(self):
+        self.client.force_authenticate(self.examiner_b)
+        for step_count in (3, 40):
+            procedure = self.create_procedure(name=f"Procedure {step_count}", step_count=step_count)
+            sp = self.create_assessment(procedure, status="scored")
+            self.score_all_steps(sp, self.examiner_a)
+            self.score_all_steps(sp, self.examiner_b)
+            sp.assigned_reconciler = self.examiner_b
+            sp.save()
+
+            # ETag validator, student procedure, then steps, examiner scores
+            # and reconciled scores
+            with self.assertNumQueries(5):
+                response = self.get_reconciliation(procedure)
+            self.assertEqual(len(response.data["steps"]), step_count)
+
+
+class AutosaveCounterTests(ExamTestCase):
+
+    def autosave(self, sp, step, score=3):
+        return self.client.post(
+            "/api/exams/autosave-step-score/",
+            {"student_procedure": sp.id, "step": step.id, "score": score},
+            format="json",
+        )
+
+    def test_counters_drive_status_transition(self):
+        procedure = self.create_procedure(step_count=2)
+        sp = self.create_assessment(procedure)
+        steps = list(procedure.steps.all())
+
+        self.client.force_authenticate(self.examiner_a)
+        for step in steps:
+            response = self.autosave(sp, step)
+        self.assertTrue(response.data["examiner_a_complete"])
+        self.assertFalse(response.data["examiner_b_complete"])
+
+        # Re-scoring an existing step does not double count
+        self.autosave(sp, steps[0], score=1)
+
+        self.client.force_authenticate(self.examiner_b)
+        self.autosave(sp, steps[0])
+        response = self.autosave(sp, steps[1])
+        self.assertEqual(response.data["status"], "scored")
+
+        sp.refresh_from_db()
+        self.assertEqual(sp.examiner_a_scored_steps, 2)
+        self.assertEqual(sp.examiner_b_scored_steps, 2)
+        self.assertEqual(sp.get_last_scoring_examiner_id(), self.examiner_b.id)
+
+    def test_autosave_does_not_count_step_scores(self):
+        self.client.force_authenticate(self.examiner_a)
+        for step_count in (3, 40):
+            procedure = self.create_procedure(name=f"Procedure {step_count}", step_count=step_count)
+            sp = self.create_assessment(procedure)
+            step = procedure.steps.last()
+            # locked assessment, step, existing score, insert, counters update,
+            # plus SAVEPOINT/RELEASE around the view's atomic
+            with self.assertNumQueries(7):
+                self.autosave(sp, step)
+
+    def test_rejects_step_from_another_procedure(self):
+        sp = self.create_assessment(self.create_procedure(name="First"))
+        other_step = self.create_procedure(name="Second").steps.first()
+        self.client.force_authenticate(self.examiner_a)
+        self.assertEqual(self.autosave(sp, other_step).status_code, 404)
+
+    def test_rebuild_command_repairs_drift(self):
+        procedure = self.create_procedure(step_count=3)
+        sp = self.create_assessment(procedure)
+        self.score_all_steps(sp, self.examiner_a)
+        StudentProcedure.objects.filter(pk=sp.pk).update(examiner_a_scored_steps=0)
+
+        call_command("rebuild_scoring_counters", stdout=StringIO())
+
+        sp.refresh_from_db()
+        self.assertEqual(sp.examiner_a_scored_steps, 3)
+        self.assertEqual(sp.examiner_b_scored_steps, 0)
+        self.assertIsNotNone(sp.examiner_a_last_scored_at)
+
+    def test_step_changes_recount_completion(self):
+        procedure = self.create_procedure(step_count=3)
+        scored = self.create_assessment(procedure)
+        self.score_all_steps(scored, self.examiner_a)
+        self.score_all_steps(scored, self.examiner_b)
+        StudentProcedure.objects.filter(pk=scored.pk).update(status="scored")
+        other = Student.objects.create(index_number="RGN-002", full_name="Yaw Asante", program=self.program)
+        pending = self.create_assessment(procedure, student=other)
+        first_steps = list(procedure.steps.order_by("step_order"))[:2]
+        for examiner in (self.examiner_a, self.examiner_b):
+            ProcedureStepScore.objects.bulk_create([
+                ProcedureStepScore(student_procedure=pending, step=step, examiner=examiner, score=2)
+                for step in first_steps
+            ])
+        self.refresh_counters(pending)
+        self.client.force_authenticate(self.admin)
+
+        # Deleting a scored step keeps the scored row complete...
+        response = self.client.delete(f"/api/exams/admin/procedure-steps/{first_steps[0].id}/")
+        self.assertEqual(response.status_code, 204)
+        scored.refresh_from_db()
+        self.assertEqual((scored.examiner_a_scored_steps, scored.examiner_b_scored_steps), (2, 2))
+        self.assertEqual((scored.status, scored.get_completion()), ("scored", (True, True)))
+
+        # ...and deleting the step nobody scored completes the other one
+        procedure.steps.get(step_order=3).delete()
+        pending.refresh_from_db()
+        self.assertEqual((pending.examiner_a_scored_steps, pending.status), (1, "scored"))
+        self.assertTrue(AssessmentEvent.objects.filter(student_procedure=pending, kind="scored").exists())
+
+        # A new step has to be scored again
+        response = self.client.post("/api/exams/admin/procedure-steps/", {
+            "procedure_id": procedure.id, "step_order": 4, "description": "Document care",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            set(StudentProcedure.objects.values_list("status", flat=True)), {"pending"}
+        )
+
+
+class BatchAutosaveTests(ExamTestCase):
+
+    def batch_autosave(self, sp, scores):
+        return self.client.post(
+            "/api/exams/autosave-step-scores/",
+            {"student_procedure": sp.id, "scores": scores},
+            format="json",
+        )
+
+    def test_batch_upserts_and_completes(self):
+        procedure = self.create_procedure(step_count=3)
+        sp = self.create_assessment(procedure)
+        steps = list(procedure.steps.all())
+        self.score_all_steps(sp, self.examiner_b)
+
+        self.client.force_authenticate(self.examiner_a)
+        response = self.batch_autosave(sp, [{"step": steps[0].id, "score": 1}])
+        self.assertEqual(response.data["saved"], [{"step": steps[0].id, "score": 1, "created": True}])
+        self.assertEqual(response.data["status"], "pending")
+
+        response = self.batch_autosave(sp, [{"step": s.id, "score": 4} for s in steps])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e["created"] for e in response.data["saved"]], [False, True, True])
+        self.assertEqual(response.data["status"], "scored")
+        self.assertTrue(response.data["examiner_a_complete"])
+        self.assertTrue(response.data["examiner_b_complete"])
+        self.assertEqual(
+            list(sp.step_scores.filter(examiner=self.examiner_a).values_list("score", flat=True)),
+            [4, 4, 4],
+        )
+
+    def test_batch_rejects_foreign_steps_without_writing(self):
+        sp = self.create_assessment(self.create_procedure(name="First", step_count=2))
+        own_step = sp.procedure.steps.first()
+        other_step = self.create_procedure(name="Second").steps.first()
+        self.client.force_authenticate(self.examiner_a)
+
+        response = self.batch_autosave(
+            sp, [{"step": own_step.id, "score": 2}, {"step": other_step.id, "score": 2}]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["invalid_steps"], [other_step.id])
+        self.assertFalse(sp.step_scores.exists())
+
+    def test_batch_query_count_is_constant(self):
+        self.client.force_authenticate(self.examiner_a)
+        for step_count in (3, 40):
+            procedure = self.create_procedure(name=f"Procedure {step_count}", step_count=step_count)
+            sp = self.create_assessment(procedure)
+            scores = [{"step": s.id, "score": 2} for s in procedure.steps.all()]
+            # locked assessment, step set, existing scores, bulk insert,
+            # counters update, plus SAVEPOINT/RELEASE around the view's atomic
+            with self.assertNumQueries(7):
+                self.batch_autosave(sp, scores)
+
+
+class OfflineSyncTests(ExamTestCase):
+
+    def sync(self, changes, cursor=None):
+        return self.client.post(
+            "/api/exams/sync/", {"cursor": cursor, "changes": changes}, format="json"
+        )
+
+    def change(self, key, sp, step, score, client_ts=None):
+        return {
+            "key": key, "student_procedure": sp.id, "step": step.id, "score": score,
+            "client_ts": (client_ts or timezone.now()).isoformat(),
+        }
+
+    def test_journal_is_applied_in_order_and_idempotent(self):
+        procedure = self.create_procedure(step_count=2)
+        sp = self.create_assessment(procedure)
+        first, second = procedure.steps.all()
+        self.client.force_authenticate(self.examiner_a)
+        journal = [
+            self.change("k1", sp, first, 1),
+            self.change("k2", sp, second, 2),
+            self.change("k3", sp, first, 4),
+        ]
+
+        response = self.sync(journal)
+        self.assertEqual([r["outcome"] for r in response.data["results"]], ["applied"] * 3)
+        self.assertEqual(
+            dict(sp.step_scores.values_list("step_id", "score")), {first.id: 4, second.id: 2}
+        )
+
+        replay = self.sync(journal)
+        self.assertEqual([r["outcome"] for r in replay.data["results"]], ["duplicate"] * 3)
+        sp.refresh_from_db()
+        self.assertEqual(sp.examiner_a_scored_steps, 2)
+
+    def test_locked_and_stale_changes_are_not_applied(self):
+        procedure = self.create_procedure(step_count=1)
+        step = procedure.steps.first()
+        locked = self.create_assessment(procedure)
+        locked.assigned_reconciler = self.examiner_b
+        locked.save()
+        open_sp = self.create_assessment(
+            self.create_procedure(name="Other", step_count=1)
+        )
+        other_step = open_sp.procedure.steps.first()
+        self.client.force_authenticate(self.examiner_a)
+        self.sync([self.change("fresh", open_sp, other_step, 3)])
+
+        response = self.sync([
+            self.change("locked", locked, step, 2),
+            self.change("old", open_sp, other_step, 1, client_ts=timezone.now() - timedelta(hours=1)),
+        ])
+
+        self.assertEqual([r["outcome"] for r in response.data["results"]], ["rejected", "stale"])
+        self.assertFalse(locked.step_scores.exists())
+        self.assertEqual(open_sp.step_scores.get().score, 3)
+
+    def test_delta_since_cursor(self):
+        procedure = self.create_procedure(step_count=1)
+        sp = self.create_assessment(procedure)
+        self.client.force_authenticate(self.examiner_a)
+
+        initial = self.sync([])
+        self.assertEqual([a["id"] for a in initial.data["assessments"]], [sp.id])
+        self.assertEqual(initial.data["scores"], [])
+
+        StudentProcedure.objects.filter(pk=sp.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        quiet = self.sync([], cursor=(timezone.now() - timedelta(hours=1)).isoformat())
+        self.assertEqual(quiet.data["assessments"], [])
+
+        step = procedure.steps.first()
+        changed = self.sync([self.change("k", sp, step, 2)], cursor=quiet.data["cursor"])
+        self.assertEqual([a["id"] for a in changed.data["assessments"]], [sp.id])
+        self.assertEqual(changed.data["scores"][0]["score"], 2)
+
+
+class GradeSummaryTests(ExamTestCase):
+
+    def reconcile(self, procedure, score):
+        sp = self.create_assessment(procedure, status="scored")
+        self.client.force_authenticate(self.examiner_b)
+        response = self.client.post("/api/exams/save-reconciliation/", {
+            "student_procedure_id": sp.id,
+            "reconciled_scores": [{"step_id": step.id, "score": score} for step in procedure.steps.all()],
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        return sp
+
+    def submit_care_plan(self, score):
+        self.client.force_authenticate(self.examiner_a)
+        response = self.client.post(
+            f"/api/exams/students/{self.student.id}/programs/{self.program.id}/care-plan/",
+            {"score": score}, format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_summary_follows_reconciliation_and_care_plan(self):
+        self.reconcile(self.create_procedure(step_count=5), score=3)  # 15 / 20
+
+        summary = StudentGradeSummary.objects.get(student=self.student)
+        self.assertEqual((summary.total_score, summary.max_score, summary.reconciled_count), (15, 20, 1))
+        self.assertEqual(summary.grade, "Credit")
+
+        self.submit_care_plan(18)  # 33 / 40
+
+        summary.refresh_from_db()
+        self.assertEqual((summary.total_score, summary.max_score), (33, 40))
+        self.assertEqual(summary.grade, "Distinction")
+
+    def test_grades_endpoint_reads_summaries(self):
+        self.reconcile(self.create_procedure(step_count=5), score=2)
+        Student.objects.create(index_number="RGN-002", full_name="Yaw Asante", program=self.program, level="300")
+        self.client.force_authenticate(self.admin)
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/exams/grades/", {"program_id": self.program.id})
+
+        grades = {row["index_number"]: row for row in response.data["results"]}
+        self.assertEqual(grades["RGN-001"]["percentage"], 50.0)
+        self.assertEqual(grades["RGN-001"]["grade"], "Fail")
+        self.assertEqual(grades["RGN-002"]["grade"], "N/A")
+
+        csv_export = self.client.get("/api/exams/grades/", {"export": "csv"})
+        self.assertIn("RGN-001,Ama Mensah,Registered General Nursing,300,50.0,Fail", b"".join(csv_export.streaming_content).decode())
+
+    def test_rebuild_command_backfills_and_checks(self):
+        sp = self.create_assessment(self.create_procedure(step_count=2), status="reconciled")
+        sp.reconciled_scores.create(step=sp.procedure.steps.first(), score=4, reconciled_by=self.examiner_b)
+        CarePlan.objects.create(student=self.student, program=self.program, examiner=self.examiner_a, score=10)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_grade_summaries", "--check", stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_grade_summaries", stdout=out)
+        self.assertIn("1 of 1 student summaries updated", out.getvalue())
+
+        summary = StudentGradeSummary.objects.get(student=self.student)
+        self.assertEqual((summary.procedure_score, summary.procedure_max_score), (4, 8))
+        self.assertEqual((summary.care_plan_score, summary.care_plan_max_score), (10, 20))
+        self.assertEqual(summary.percentage, 50.0)
+
+        call_command("rebuild_grade_summaries", "--check", stdout=StringIO())
+
+    def test_summary_follows_procedure_changes(self):
+        procedure = self.create_procedure(step_count=5)
+        self.reconcile(procedure, score=3)  # 15 / 20
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.patch(f"/api/exams/admin/procedures/{procedure.id}/", {"total_score": 30}, format="json")
+        self.assertEqual(response.status_code, 200)
+        summary = StudentGradeSummary.objects.get(student=self.student)
+        self.assertEqual((summary.total_score, summary.max_score, summary.grade), (15, 30, "Fail"))
+
+        upload = SimpleUploadedFile(
+            "procedures.csv",
+            b"Procedure Name,Program,Total Score,Step Order,Step Description\n"
+            b"Vital Signs,Registered General Nursing,25,1,Step 1\n",
+        )
+        self.assertEqual(self.client.post("/api/exams/procedures/import/", {"file": upload}).status_code, 200)
+        summary.refresh_from_db()
+        self.assertEqual(summary.max_score, 25)
+
+        self.assertEqual(self.client.delete(f"/api/exams/admin/procedures/{procedure.id}/").status_code, 204)
+        summary.refresh_from_db()
+        self.assertEqual((summary.total_score, summary.max_score, summary.reconciled_count), (0, 0, 0))
+
+        call_command("rebuild_grade_summaries", "--check", stdout=StringIO())
+
+    def test_bulk_procedure_delete_refreshes_summaries(self):
+        kept, deleted = self.create_procedure("Wound Care", step_count=5), self.create_procedure(step_count=5)
+        self.reconcile(kept, score=4)
+        self.reconcile(deleted, score=2)
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.post("/api/exams/procedures/bulk-delete/", {"procedure_ids": [deleted.id]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        summary = StudentGradeSummary.objects.get(student=self.student)
+        self.assertEqual((summary.total_score, summary.max_score, summary.reconciled_count), (20, 20, 1))
+
+
+class GradesPaginationTests(ExamTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Student.objects.bulk_create([
+            Student(index_number=f"RGN-1{i:02d}", full_name=f"Student {i}", program=cls.program, level="300")
+            for i in range(12)
+        ])
+        # Percentages cycle through 0, 25, 50 so the sort column has ties
+        StudentGradeSummary.objects.bulk_create([
+            StudentGradeSummary(
+                student=student, total_score=(i % 3) * 5, max_score=20, percentage=(i % 3) * 25.0,
+            )
+            for i, student in enumerate(Student.objects.filter(index_number__startswith="RGN-1").order_by("pk"))
+        ])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def walk(self, params):
+        rows = []
+        url, data = "/api/exams/grades/", params
+        while url:
+            response = self.client.get(url, data)
+            self.assertLessEqual(len(response.data["results"]), params["page_size"])
+            rows.extend(response.data["results"])
+            url, data = response.data["next"], None
+        return rows
+
+    def test_pages_follow_sql_ordering(self):
+        rows = self.walk({"sort_by": "percentage", "order": "desc", "page_size": 5})
+
+        # Students without a summary sort as 0%
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(len({row["student_id"] for row in rows}), 13)
+        percentages = [row["percentage"] for row in rows]
+        self.assertEqual(percentages, sorted(percentages, reverse=True))
+
+    def test_page_query_count_does_not_depend_on_offset(self):
+        first = self.client.get("/api/exams/grades/", {"sort_by": "total_score", "page_size": 4})
+        with self.assertNumQueries(1):
+            second = self.client.get(first.data["next"])
+
+        previous = self.client.get(second.data["previous"])
+        self.assertEqual(previous.data["results"], first.data["results"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/exams/grades/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class StreamingExportTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def seed_students(self, count, prefix):
+        Student.objects.bulk_create([
+            Student(index_number=f"{prefix}-{i:06d}", full_name=f"Student {i}", program=self.program, level="200")
+            for i in range(count)
+        ], batch_size=1000)
+
+    def peak_export_memory(self, url):
+        tracemalloc.start()
+        try:
+            response = self.client.get(url)
+            self.assertTrue(response.streaming)
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            return tracemalloc.get_traced_memory()[1], size
+        finally:
+            tracemalloc.stop()
+
+    def test_csv_exports_stream(self):
+        procedure = self.create_procedure(step_count=2)
+        self.create_procedure(name="Empty", step_count=0)
+
+        students = self.client.get("/api/exams/admin/students/", {"export": "csv"})
+        self.assertTrue(students.streaming)
+        self.assertEqual(
+            b"".join(students.streaming_content).decode().splitlines(),
+            ["Index Number,Full Name,Program,Level,Status", "RGN-001,Ama Mensah,Registered General Nursing,Level 300,Yes"],
+        )
+
+        with self.assertNumQueries(2):
+            content = b"".join(
+                self.client.get("/api/exams/admin/procedures/", {"export": "csv"}).streaming_content
+            ).decode()
+        self.assertEqual(content.splitlines()[1:], [
+            "Vital Signs,Registered General Nursing,8,1,Step 1",
+            "Vital Signs,Registered General Nursing,8,2,Step 2",
+            "Empty,Registered General Nursing,0,,",
+        ])
+        self.assertIn(procedure.name, content)
+
+    def test_grades_csv_memory_is_flat(self):
+        self.seed_students(1500, "SMALL")
+        small_peak, small_size = self.peak_export_memory("/api/exams/grades/?export=csv")
+
+        self.seed_students(13500, "LARGE")
+        large_peak, large_size = self.peak_export_memory("/api/exams/grades/?export=csv")
+
+        # Ten times the rows, roughly the same peak: memory is bounded by the chunk size
+        self.assertGreater(large_size, small_size * 9)
+        self.assertLess(large_peak, small_peak * 2)
+
+
+class ExcelExportTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def download(self, url, params):
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response["Content-Type"], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+        return load_workbook(BytesIO(b"".join(response.streaming_content)))
+
+    def test_procedure_workbook(self):
+        self.create_procedure(step_count=3)
+        self.create_procedure(name="Empty", step_count=0)
+
+        with self.assertNumQueries(2):
+            workbook = self.download("/api/exams/admin/procedures/", {"export": "excel"})
+
+        self.assertEqual(workbook.sheetnames, ["Procedures", "Procedure Steps"])
+        procedures, steps = workbook["Procedures"], workbook["Procedure Steps"]
+        self.assertEqual(
+            [list(row) for row in procedures.iter_rows(values_only=True)],
+            [["Name", "Program", "Total Score", "Steps Count"],
+             ["Vital Signs", "Registered General Nursing", 12, 3],
+             ["Empty", "Registered General Nursing", 0, 0]],
+        )
+        self.assertEqual([row[1] for row in steps.iter_rows(min_row=2, values_only=True)], [1, 2, 3])
+        self.assertTrue(procedures["A1"].font.bold)
+        self.assertEqual(procedures["A1"].fill.start_color.rgb, "004472C4")
+        self.assertEqual(procedures.column_dimensions["B"].width, len("Registered General Nursing") + 2)
+
+    def test_widths_are_capped(self):
+        Student.objects.create(index_number="RGN-002", full_name="N" * 80, program=self.program, level="100")
+
+        sheet = self.download("/api/exams/admin/students/", {"export": "excel"})["Students"]
+
+        self.assertEqual(sheet.max_row, 3)
+        self.assertEqual(sheet.column_dimensions["B"].width, 50)
+        self.assertEqual(sheet.column_dimensions["A"].width, len("Index Number") + 2)
+
+    def test_grades_and_examiner_exports(self):
+        grades = self.download("/api/exams/grades/", {"export": "excel"})["Student Grades"]
+        self.assertEqual(grades["A2"].value, "RGN-001")
+        self.assertEqual(grades["F2"].value, "N/A")
+
+        examiners = self.download("/api/accounts/examiners/export/", {"export": "excel"})["Examiners"]
+        self.assertEqual(
+            sorted(row[0] for row in examiners.iter_rows(min_row=2, values_only=True)),
+            ["examiner_a", "examiner_b"],
+        )
+
+        csv_response = self.client.get("/api/accounts/examiners/export/")
+        self.assertTrue(b"".join(csv_response.streaming_content).startswith(b"Username,Email"))
+
+
+class BackgroundJobTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_authenticate(self.admin)
+
+    def test_grades_pdf_export_runs_in_worker(self):
+        response = self.client.get("/api/exams/grades/", {"export": "pdf", "background": "1"})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "queued")
+        self.assertEqual(response.data["status_url"], f"http://testserver/api/exams/jobs/{response.data['id']}/")
+        self.assertIsNone(response.data["download_url"])
+
+        self.assertEqual(run_pending_jobs(), 1)
+
+        status_response = self.client.get(response.data["status_url"])
+        self.assertEqual(status_response.data["status"], "succeeded")
+        self.assertEqual(status_response.data["progress"], 100)
+
+        download = self.client.get(status_response.data["download_url"])
+        self.assertEqual(download["Content-Disposition"], 'attachment; filename="student_grades.pdf"')
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"%PDF"))
+
+    def test_student_import_runs_in_worker(self):
+        upload = SimpleUploadedFile(
+            "intake.csv",
+            b"Index Number,Full Name,Program,Level,Status\n"
+            b"RGN-500,Kwame Nkrumah,Registered General Nursing,100,Yes\n"
+            b"RGN-501,Missing Program,Nowhere,100,Yes\n",
+        )
+        response = self.client.post("/api/exams/students/import/", {"file": upload, "background": "true"})
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Student.objects.filter(index_number="RGN-500").exists())
+
+        run_pending_jobs()
+
+        job = BackgroundJob.objects.get(pk=response.data["id"])
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual((job.result["created"], job.result["errors"]), (1, 1))
+        self.assertTrue(Student.objects.filter(index_number="RGN-500").exists())
+
+        # Imports produce no file
+        self.assertEqual(self.client.get(f"/api/exams/jobs/{job.pk}/download/").status_code, 409)
+
+    def test_failed_job_reports_error(self):
+        upload = SimpleUploadedFile("curriculum.xlsx", b"not a workbook")
+        response = self.client.post("/api/exams/procedures/import/?background=1", {"file": upload})
+
+        run_pending_jobs()
+
+        job = BackgroundJob.objects.get(pk=response.data["id"])
+        self.assertEqual(job.status, "failed")
+        self.assertTrue(job.error.startswith("Failed to read Excel file"))
+
+    def test_jobs_are_claimed_once_and_private(self):
+        response = self.client.get("/api/exams/admin/procedures/", {"export": "excel", "background": "1"})
+
+        job = claim_next_job()
+        self.assertEqual(str(job.pk), response.data["id"])
+        self.assertIsNone(claim_next_job())
+
+        self.client.force_authenticate(self.examiner_a)
+        self.assertEqual(self.client.get(response.data["status_url"]).status_code, 404)
+
+    def test_dry_run_job_attaches_error_report(self):
+        upload = SimpleUploadedFile(
+            "intake.csv",
+            b"Index Number,Full Name,Program,Level,Status\n"
+            b"RGN-500,Kwame Nkrumah,Registered General Nursing,100,Yes\n"
+            b"RGN-501,Missing Program,Nowhere,100,Yes\n",
+        )
+        response = self.client.post(
+            "/api/exams/students/import/", {"file": upload, "background": "1", "dry_run": "1"}
+        )
+
+        run_pending_jobs()
+
+        job = BackgroundJob.objects.get(pk=response.data["id"])
+        self.assertEqual((job.status, job.result["dry_run"], job.result["created"]), ("succeeded", True, 1))
+        self.assertFalse(Student.objects.filter(index_number="RGN-500").exists())
+        download = self.client.get(f"/api/exams/jobs/{job.pk}/download/")
+        self.assertEqual(download["Content-Disposition"], 'attachment; filename="import_errors.csv"')
+        self.assertEqual(
+            b"".join(download.streaming_content).decode().splitlines(),
+            ["Location,Error", "Row 3,Program 'Nowhere' not found"],
+        )
+
+    def test_transcripts_zip_runs_in_worker(self):
+        response = self.client.post("/api/exams/transcripts/", {"program_id": self.program.id}, format="json")
+        self.assertEqual(response.status_code, 202)
+
+        run_pending_jobs()
+
+        job = BackgroundJob.objects.get(pk=response.data["id"])
+        self.assertEqual((job.status, job.result["transcripts"]), ("succeeded", 1))
+        download = self.client.get(f"/api/exams/jobs/{job.pk}/download/")
+        self.assertEqual(download["Content-Disposition"], 'attachment; filename="transcripts.zip"')
+        with zipfile.ZipFile(BytesIO(b"".join(download.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ["RGN-001.pdf"])
+
+
+class ImportProgressTests(TransactionTestCase):
+    """Progress must be committed while the import runs, so it is read from another connection."""
+
+    def setUp(self):
+        Program.objects.create(name="Registered General Nursing", abbreviation="RGN")
+        self.job = BackgroundJob.objects.create(kind="import_students", status="running")
+
+    def read_elsewhere(self):
+        """(progress, message, students) as another connection sees them."""
+        seen = []
+
+        def read():
+            try:
+                job = BackgroundJob.objects.get(pk=self.job.pk)
+                seen.append((job.progress, job.message, Student.objects.count()))
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        return seen[0]
+
+    def test_progress_is_visible_during_import(self):
+        rows = [
+            (row_num, {"Index Number": f"RGN-{row_num}", "Full Name": "Student", "Program": "Registered General Nursing"})
+            for row_num in range(2, 7)
+        ]
+        observed = []
+
+        def progress(percent, message):
+            self.job.set_progress(percent, message)
+            observed.append(self.read_elsewhere())
+
+        import_students(rows, progress=progress, chunk_size=2, commit_chunks=True)
+
+        self.assertEqual(observed, [
+            (50, "2 rows imported", 2),
+            (50, "4 rows imported", 4),
+            (50, "5 rows imported", 5),
+        ])
+
+    def test_request_import_is_all_or_nothing(self):
+        rows = [
+            (row_num, {"Index Number": f"RGN-{row_num}", "Full Name": "Student", "Program": "Registered General Nursing"})
+            for row_num in range(2, 7)
+        ]
+
+        def progress(percent, message):
+            if message == "4 rows imported":
+                raise DatabaseError("connection lost")
+
+        with self.assertRaises(DatabaseError):
+            import_students(rows, progress=progress, chunk_size=2)
+
+        self.assertEqual(Student.objects.count(), 0)
+
+
+class StudentImportTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def import_csv(self, lines):
+        content = "\n".join(["Index Number,Full Name,Program,Level,Status", *lines]).encode()
+        return self.client.post("/api/exams/students/import/", {"file": SimpleUploadedFile("intake.csv", content)})
+
+    def test_creates_updates_and_reports_errors_in_row_order(self):
+        response = self.import_csv([
+            "RGN-001,Ama Mensah,Registered General Nursing,400,No",  # existing
+            "RGN-010,Kojo Antwi,Registered General Nursing,100,Yes",
+            "RGN-011,,Registered General Nursing,100,Yes",
+            "RGN-012,Esi Badu,Midwifery,100,Yes",
+            "RGN-013,Yaa Asantewaa,Registered General Nursing,500,Yes",
+            "RGN-010,Kojo Antwi Jnr,Registered General Nursing,200,Yes",  # same file, again
+        ])
+
+        self.assertEqual((response.data["created"], response.data["updated"], response.data["errors"]), (1, 2, 3))
+        self.assertEqual(response.data["error_details"], [
+            "Row 4: Missing required fields",
+            "Row 5: Program 'Midwifery' not found",
+            "Row 6: Invalid level '500'. Must be 100, 200, 300, or 400",
+        ])
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.level, self.student.is_active), ("400", False))
+        self.assertEqual(
+            Student.objects.values_list("full_name", "level").get(index_number="RGN-010"), ("Kojo Antwi Jnr", "200")
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        lines = [f"RGN-{i:04d},Student {i},Registered General Nursing,100,Yes" for i in range(100, 250)]
+        lines += ["RGN-001,Ama Mensah,Registered General Nursing,200,Yes"]
+
+        # savepoint, programs, existing students, insert, upsert, release
+        with self.assertNumQueries(6):
+            response = self.import_csv(lines)
+
+        self.assertEqual((response.data["created"], response.data["updated"]), (150, 1))
+
+    def test_dry_run_reports_every_error_without_writing(self):
+        lines = [f"RGN-{i:03d},Student {i},Midwifery,100,Yes" for i in range(100, 125)]
+        lines += ["RGN-001,Ama Mensah,Registered General Nursing,400,No", "RGN-200,New Student,Registered General Nursing,100,Yes"]
+        content = "\n".join(["Index Number,Full Name,Program,Level,Status", *lines]).encode()
+
+        # savepoint, programs, existing students, release
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                "/api/exams/students/import/?dry_run=1", {"file": SimpleUploadedFile("intake.csv", content)}
+            )
+
+        self.assertEqual((response.data["created"], response.data["updated"], response.data["errors"]), (1, 1, 25))
+        self.assertEqual(len(response.data["error_details"]), 25)
+        self.assertEqual(Student.objects.count(), 1)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.level, "300")
+
+        report = self.client.post(
+            "/api/exams/students/import/?dry_run=1&report=csv", {"file": SimpleUploadedFile("intake.csv", content)}
+        )
+        rows = b"".join(report.streaming_content).decode().splitlines()
+        self.assertEqual(report["Content-Disposition"], 'attachment; filename="student_import_errors.csv"')
+        self.assertEqual((len(rows), rows[1]), (26, "Row 2,Program 'Midwifery' not found"))
+
+    def xlsx_upload(self, name, header, rows):
+        wb = Workbook()
+        wb.active.append(header)
+        for row in rows:
+            wb.active.append(row)
+        buffer = BytesIO()
+        wb.save(buffer)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def test_excel_rows_keep_sheet_row_numbers(self):
+        upload = self.xlsx_upload("intake.xlsx", ["Index Number", "Full Name", "Program", "Level", "Status"], [
+            ["RGN-020", "Abena Ofori", "Registered General Nursing", 100, "Yes"],
+            [None, None, None, None, None],
+            ["RGN-021", "Kwesi Arthur", "Midwifery", 100, "Yes"],
+        ])
+
+        response = self.client.post("/api/exams/students/import/", {"file": upload})
+
+        self.assertEqual((response.data["created"], response.data["errors"]), (1, 1))
+        self.assertEqual(response.data["error_details"], ["Row 4: Program 'Midwifery' not found"])
+
+    def test_rows_are_written_chunk_by_chunk(self):
+        rows = ImportRows(self.xlsx_upload("intake.xlsx", ["Index Number", "Full Name", "Program", "Level"], [
+            [f"RGN-{i:03d}", f"Student {i}", "Registered General Nursing", 100] for i in range(100, 105)
+        ] + [["RGN-100", "Student 100 Jnr", "Registered General Nursing", 200]]), "xlsx")
+
+        result = import_students(rows, chunk_size=2)
+
+        self.assertEqual((result["created"], result["updated"]), (5, 1))
+        self.assertEqual(rows.total, 6)
+        self.assertEqual(
+            Student.objects.values_list("full_name", "level").get(index_number="RGN-100"), ("Student 100 Jnr", "200")
+        )
+
+    def test_procedure_steps_import_upserts_in_bulk(self):
+        procedure = self.create_procedure(step_count=2)
+        upload = self.xlsx_upload("steps.xlsx", ["Step Order", "Description"], [
+            [1, "Wash hands"], [2, "Step 2"], [3, "Explain procedure"], ["x", "Bad order"],
+        ])
+
+        # procedure, savepoint, existing steps, insert, upsert, scored assessments
+        # the new step reopens, release
+        with self.assertNumQueries(7):
+            response = self.client.post(f"/api/exams/procedures/{procedure.id}/steps/import/", {"file": upload})
+
+        self.assertEqual((response.data["created"], response.data["updated"], response.data["errors"]), (1, 2, 1))
+        self.assertEqual(
+            list(procedure.steps.values_list("description", flat=True)), ["Wash hands", "Step 2", "Explain procedure"]
+        )
+
+
+class ProcedureImportTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.midwifery = Program.objects.create(name="Midwifery", abbreviation="RM")
+
+    def import_workbook(self, procedures, steps):
+        return self.client.post("/api/exams/procedures/import/", {"file": self.workbook_upload(procedures, steps)})
+
+    def workbook_upload(self, procedures, steps):
+        wb = Workbook()
+        wb.active.title = "Procedures"
+        wb.active.append(["Name", "Program", "Total Score"])
+        for row in procedures:
+            wb.active.append(row)
+        ws = wb.create_sheet("Procedure Steps")
+        ws.append(["Procedure Name", "Step Order", "Description"])
+        for row in steps:
+            ws.append(row)
+        buffer = BytesIO()
+        wb.save(buffer)
+        return SimpleUploadedFile("curriculum.xlsx", buffer.getvalue())
+
+    def test_shared_procedure_steps_are_written_to_every_program(self):
+        vital_signs = self.create_procedure("Vital Signs", step_count=2)
+        wound_care = self.create_procedure("Wound Care", step_count=0, program=self.midwifery)
+
+        # savepoint, programs, procedures, insert procedures, upsert procedures,
+        # students reconciled on the changed procedure, procedures only named in the
+        # steps sheet, steps, insert steps, upsert steps, scored assessments the new
+        # steps reopen, release
+        with self.assertNumQueries(12):
+            response = self.import_workbook(
+                [["Vital Signs", None, 12], ["Catheterisation", "Unknown", 4]],
+                [
+                    ["Vital Signs", 1, "Wash hands"],
+                    ["Vital Signs", 3, "Record findings"],
+                    ["Wound Care", 1, "Clean the wound"],
+                    ["Ghost Procedure", 1, "Nothing"],
+                ],
+            )
+
+        data = response.data
+        self.assertEqual((data["procedures_created"], data["procedures_updated"]), (1, 1))
+        self.assertEqual((data["steps_created"], data["steps_updated"], data["errors"]), (4, 1, 2))
+        self.assertEqual(data["error_details"], [
+            "Procedures Row 3: Program 'Unknown' not found",
+            "Steps Row 5: Procedure 'Ghost Procedure' not found",
+        ])
+
+        vital_signs.refresh_from_db()
+        self.assertEqual(vital_signs.total_score, 12)
+        self.assertEqual(
+            list(vital_signs.steps.values_list("description", flat=True)), ["Wash hands", "Step 2", "Record findings"]
+        )
+        copy = Procedure.objects.get(name="Vital Signs", program=self.midwifery)
+        self.assertEqual(list(copy.steps.values_list("step_order", flat=True)), [1, 3])
+        self.assertEqual(list(wound_care.steps.values_list("description", flat=True)), ["Clean the wound"])
+
+    def test_csv_import_writes_procedures_and_steps_in_bulk(self):
+        content = "\n".join([
+            "Procedure Name,Program,Total Score,Step Order,Step Description",
+            "Vital Signs,,8,1,Wash hands",
+            "Vital Signs,,8,2,Check pulse",
+        ]).encode()
+
+        response = self.client.post(
+            "/api/exams/procedures/import/", {"file": SimpleUploadedFile("curriculum.csv", content)}
+        )
+
+        self.assertEqual((response.data["procedures_created"], response.data["steps_created"]), (2, 4))
+        self.assertEqual(ProcedureStep.objects.filter(procedure__name="Vital Signs").count(), 4)
+
+    def test_dry_run_counts_match_the_real_import(self):
+        self.create_procedure("Vital Signs", step_count=2)
+        procedures = [["Vital Signs", None, 12], ["Wound Care", "Midwifery", 8], ["Wound Care", "Midwifery", 8]]
+        steps = [["Vital Signs", 1, "Wash hands"], ["Vital Signs", 3, "Record"], ["Wound Care", 1, "Clean"],
+                 ["Wound Care", 1, "Clean again"], ["Ghost", 1, "x"]]
+
+        dry_run = self.client.post(
+            "/api/exams/procedures/import/?dry_run=1", {"file": self.workbook_upload(procedures, steps)}
+        ).data
+        self.assertEqual(Procedure.objects.count(), 1)
+        self.assertEqual(ProcedureStep.objects.count(), 2)
+
+        real = self.import_workbook(procedures, steps).data
+        self.assertTrue(dry_run.pop("dry_run"))
+        self.assertEqual(dry_run, real)
+        self.assertEqual(Procedure.objects.count(), 3)
+
+
+class CompleteDataImportTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_procedure("Vital Signs", step_count=2)
+        self.path = os.path.join(tempfile.mkdtemp(), "complete.xlsx")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.path))
+
+    def write_workbook(self, programs=(), students=(), procedures=(), steps=()):
+        wb = Workbook()
+        wb.remove(wb.active)
+        for title, header, rows in [
+            ("Programs", ["ID", "Name", "Abbreviation"], programs),
+            ("Students", ["ID", "Index Number", "Full Name", "Program Name", "Is Active"], students),
+            ("Procedures", ["ID", "Program Name", "Procedure Name", "Total Score"], procedures),
+            ("Procedure Steps", ["ID", "Procedure Name", "Step Order", "Description"], steps),
+        ]:
+            ws = wb.create_sheet(title)
+            ws.append(header)
+            for row in rows:
+                ws.append(row)
+        wb.save(self.path)
+
+    def test_sheets_are_upserted(self):
+        self.write_workbook(
+            programs=[[self.program.id, "Registered General Nursing", "RGN"], [None, "Midwifery", "RM"]],
+            students=[[self.student.id, "RGN-001", "Ama Mensah Jnr", "Registered General Nursing", "Yes"],
+                      [None, "RM-001", "Akosua Darko", "Midwifery", "No"]],
+            procedures=[[None, "Registered General Nursing", "Vital Signs", 12], [None, "Midwifery", "Wound Care", 8]],
+            steps=[[None, "Vital Signs", 1, "Wash hands"], [None, "Wound Care", 1, "Clean the wound"],
+                   [None, "Ghost Procedure", 1, "Nothing"]],
+        )
+        out = StringIO()
+
+        call_command("import_complete_data", self.path, stdout=out)
+
+        self.assertIn("Total created: 4", out.getvalue())
+        self.assertIn("Total errors: 1", out.getvalue())
+        self.assertIn("Row 4: Procedure not found: Ghost Procedure", out.getvalue())
+        # No Level column: the existing student keeps theirs
+        self.assertEqual(
+            Student.objects.values_list("full_name", "level").get(index_number="RGN-001"), ("Ama Mensah Jnr", "300")
+        )
+        self.assertEqual(
+            Student.objects.values_list("program__name", "level", "is_active").get(index_number="RM-001"),
+            ("Midwifery", "100", False),
+        )
+        self.assertEqual(Procedure.objects.get(name="Vital Signs").total_score, 12)
+        self.assertEqual(
+            list(ProcedureStep.objects.filter(step_order=1).values_list("procedure__name", "description")),
+            [("Vital Signs", "Wash hands"), ("Wound Care", "Clean the wound")],
+        )
+
+    def test_dry_run_writes_nothing(self):
+        self.write_workbook(
+            programs=[[None, "Midwifery", "RM"]],
+            students=[[None, "RM-001", "Akosua Darko", "Midwifery", "Yes"]],
+        )
+
+        call_command("import_complete_data", self.path, "--dry-run", stdout=StringIO())
+
+        self.assertFalse(Program.objects.filter(name="Midwifery").exists())
+        self.assertEqual(Student.objects.count(), 1)
+
+    def test_workbook_is_closed_when_the_import_fails(self):
+        self.write_workbook(students=[[None, "RGN-002", "Kwame Asante", "Registered General Nursing", "Yes"]])
+
+        with mock.patch.object(Workbook, "close", autospec=True) as close, mock.patch(
+            "exams.management.commands.import_complete_data.import_students", side_effect=DatabaseError("lost")
+        ):
+            with self.assertRaises(DatabaseError):
+                call_command("import_complete_data", self.path, stdout=StringIO())
+
+        close.assert_called_once()
+
+
+class ReferenceCacheTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.examiner_a)
+
+    def get_board(self):
+        return self.client.get(f"/api/exams/programs/{self.program.id}/procedures/", {"student_id": self.student.id})
+
+    def test_warm_reads_skip_reference_queries(self):
+        self.create_procedure(step_count=3)
+        self.get_board()
+        self.client.get("/api/exams/programs/")
+
+        # ETag validator and the student's assessments only
+        with self.assertNumQueries(2):
+            self.get_board()
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/exams/programs/")
+        self.assertEqual([program["name"] for program in response.data], ["Registered General Nursing"])
+
+    def test_save_and_delete_invalidate(self):
+        procedure = self.create_procedure(step_count=3)
+        self.assertEqual(self.get_board().data[0]["step_count"], 3)
+
+        ProcedureStep.objects.create(procedure=procedure, step_order=4, description="Step 4")
+        self.assertEqual(self.get_board().data[0]["step_count"], 4)
+
+        procedure.name = "Renamed"
+        procedure.save()
+        self.assertEqual(self.get_board().data[0]["name"], "Renamed")
+
+        procedure.steps.filter(step_order=4).delete()
+        self.assertEqual(self.get_board().data[0]["step_count"], 3)
+
+        # A cascade sends a signal per step but bumps the version once
+        version = reference.reference_version()
+        Procedure.objects.filter(pk=procedure.pk).delete()
+        self.assertEqual(reference.reference_version(), version + 1)
+        self.assertEqual(self.get_board().data, [])
+
+    def test_bulk_import_invalidates(self):
+        procedure = self.create_procedure(step_count=2)
+        self.assertEqual(self.get_board().data[0]["step_count"], 2)
+
+        import_procedure_steps(procedure, [(2, {"Step Order": 3, "Description": "Record findings"})])
+
+        self.assertEqual(self.get_board().data[0]["step_count"], 3)
+
+    def test_evicted_version_does_not_revive_old_entries(self):
+        self.create_procedure(step_count=2)
+        self.get_board()
+        cache.delete(reference.VERSION_KEY)
+        Procedure.objects.filter(program=self.program).update(name="Changed behind the cache")
+
+        self.assertEqual(self.get_board().data[0]["name"], "Changed behind the cache")
+
+
+class ConditionalGetTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.examiner_b)
+        self.procedure = self.create_procedure(step_count=3)
+
+    def get_board(self, **headers):
+        return self.client.get(
+            f"/api/exams/programs/{self.program.id}/procedures/", {"student_id": self.student.id}, **headers
+        )
+
+    def get_reconciliation(self, **headers):
+        return self.client.get(
+            f"/api/exams/students/{self.student.id}/procedures/{self.procedure.id}/reconciliation/", **headers
+        )
+
+    def test_unchanged_board_is_not_modified(self):
+        self.create_assessment(self.procedure)
+        etag = self.get_board()["ETag"]
+
+        # ETag validator only
+        with self.assertNumQueries(1):
+            response = self.get_board(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_board_etag_follows_assessments_and_reference_data(self):
+        etag = self.get_board()["ETag"]
+        sp = self.create_assessment(self.procedure, status="scored")
+        response = self.get_board(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.score_all_steps(sp, self.examiner_a)
+        sp.save(update_fields=["updated_at"])
+        response = self.get_board(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.procedure.name = "Renamed"
+        self.procedure.save()
+        response = self.get_board(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["name"], "Renamed")
+
+    def test_board_etag_is_per_user(self):
+        etag = self.get_board()["ETag"]
+        self.client.force_authenticate(self.examiner_a)
+        self.assertEqual(self.get_board(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_student_detail(self):
+        url = f"/api/exams/students/{self.student.id}/"
+        response = self.client.get(url)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        Student.objects.filter(pk=self.student.pk).update(full_name="Ama Mensah-Owusu", updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["full_name"], "Ama Mensah-Owusu")
+
+    def test_reconciliation_is_validated_after_reconciler_assignment(self):
+        sp = self.create_assessment(self.procedure, status="scored")
+        self.score_all_steps(sp, self.examiner_a, score=1)
+        self.score_all_steps(sp, self.examiner_b, score=3)
+
+        # The first GET assigns the reconciler, so it is never answered with 304
+        response = self.get_reconciliation(HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 200)
+        sp.refresh_from_db()
+        self.assertEqual(sp.assigned_reconciler, self.examiner_b)
+
+        self.assertEqual(self.get_reconciliation(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+class AssessmentEventTests(ExamTestCase):
+
+    def test_status_changes_are_published(self):
+        procedure = self.create_procedure(step_count=2)
+        sp = self.create_assessment(procedure)
+        for examiner in (self.examiner_a, self.examiner_b):
+            self.client.force_authenticate(examiner)
+            self.client.post(
+                "/api/exams/autosave-step-scores/",
+                {"student_procedure": sp.id, "scores": [{"step": s.id, "score": 3} for s in procedure.steps.all()]},
+                format="json",
+            )
+        self.client.get(f"/api/exams/students/{self.student.id}/procedures/{procedure.id}/reconciliation/")
+        self.client.post(
+            "/api/exams/save-reconciliation/",
+            {
+                "student_procedure_id": sp.id,
+                "reconciled_scores": [{"step_id": s.id, "score": 3} for s in procedure.steps.all()],
+            },
+            format="json",
+        )
+
+        events = AssessmentEvent.objects.order_by("id")
+        self.assertEqual(
+            [(e.kind, e.status, e.actor_id) for e in events],
+            [
+                ("scored", "scored", self.examiner_b.id),
+                ("reconciler_assigned", "scored", self.examiner_b.id),
+                ("reconciled", "reconciled", self.examiner_b.id),
+            ],
+        )
+        self.assertEqual({(e.program_id, e.student_id, e.procedure_id) for e in events},
+                         {(self.program.id, self.student.id, procedure.id)})
+
+    def test_unchanged_resave_is_not_published(self):
+        procedure = self.create_procedure(step_count=2)
+        sp = self.create_assessment(procedure, status="scored")
+        self.client.force_authenticate(self.examiner_b)
+
+        def save(score):
+            response = self.client.post("/api/exams/save-reconciliation/", {
+                "student_procedure_id": sp.id,
+                "reconciled_scores": [{"step_id": s.id, "score": score} for s in procedure.steps.all()],
+            }, format="json")
+            self.assertEqual(response.status_code, 200)
+
+        save(3)
+        save(3)
+        self.assertEqual(AssessmentEvent.objects.filter(kind="reconciled").count(), 1)
+        summary_updated_at = StudentGradeSummary.objects.get(student=self.student).updated_at
+
+        save(4)
+        self.assertEqual(AssessmentEvent.objects.filter(kind="reconciled").count(), 2)
+        summary = StudentGradeSummary.objects.get(student=self.student)
+        self.assertEqual(summary.procedure_score, 8)
+        self.assertGreater(summary.updated_at, summary_updated_at)
+
+    def test_purge_keeps_recent_events(self):
+        sp = self.create_assessment(self.create_procedure(step_count=1))
+        old = AssessmentEvent.objects.create(
+            student_procedure=sp, program=self.program, student=self.student,
+            procedure=sp.procedure, kind="scored", status="scored",
+        )
+        AssessmentEvent.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=2))
+        AssessmentEvent.objects.create(
+            student_procedure=sp, program=self.program, student=self.student,
+            procedure=sp.procedure, kind="reconciled", status="reconciled",
+        )
+
+        self.assertEqual(purge_events(), 1)
+        self.assertEqual(list(AssessmentEvent.objects.values_list("kind", flat=True)), ["reconciled"])
+
+
+@override_settings(EVENT_STREAM_POLL_INTERVAL=0.05, EVENT_STREAM_HEARTBEAT=0.2, EVENT_STREAM_TIMEOUT=0)
+class AssessmentEventStreamTests(TransactionTestCase):
+    """The hub reads on its own threads, so the rows must be committed."""
+
+    def setUp(self):
+        self.program = Program.objects.create(name="Registered General Nursing", abbreviation="RGN")
+        self.other_program = Program.objects.create(name="Registered Midwifery", abbreviation="RM")
+        self.examiner = User.objects.create_user(username="examiner", password="pass", role="examiner")
+        self.events = [
+            self.create_event(program, index)
+            for index, program in enumerate([self.program, self.other_program, self.program])
+        ]
+
+    def create_event(self, program, index):
+        student = Student.objects.create(index_number=f"S-{index}", full_name=f"Student {index}", program=program)
+        procedure = Procedure.objects.create(program=program, name=f"Procedure {index}", total_score=4)
+        sp = StudentProcedure.objects.create(
+            student=student, procedure=procedure, examiner_a=self.examiner, examiner_b=self.examiner
+        )
+        return AssessmentEvent.objects.create(
+            student_procedure=sp, program=program, student=student,
+            procedure=procedure, kind="scored", status="scored",
+        )
+
+    async def read_stream(self, headers=None, **params):
+        if "ticket" not in params:
+            headers = {"Authorization": f"Bearer {AccessToken.for_user(self.examiner)}", **(headers or {})}
+        response = await self.async_client.get("/api/exams/events/", params, headers=headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_requires_token(self):
+        response = await self.async_client.get("/api/exams/events/")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_ticket_opens_one_stream(self):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.examiner)}"}
+        response = await self.async_client.post("/api/exams/events/tickets/", headers=headers)
+        self.assertEqual(response.status_code, 201)
+        ticket = response.json()["ticket"]
+
+        body = await self.read_stream(ticket=ticket, last_event_id=self.events[1].pk)
+        self.assertIn(f"id: {self.events[2].pk}", body)
+
+        response = await self.async_client.get("/api/exams/events/", {"ticket": ticket})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_access_token_is_not_read_from_the_query_string(self):
+        token = str(AccessToken.for_user(self.examiner))
+        response = await self.async_client.get("/api/exams/events/", {"token": token})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_resumes_after_last_event_id(self):
+        body = await self.read_stream(
+            program_id=self.program.id, headers={"Last-Event-ID": str(self.events[0].pk - 1)}
+        )
+
+        self.assertTrue(body.startswith("retry: 3000\n\n"))
+        self.assertEqual(
+            [line for line in body.splitlines() if line.startswith("id: ")],
+            [f"id: {self.events[0].pk}", f"id: {self.events[2].pk}"],
+        )
+        self.assertIn(f'"student_procedure": {self.events[2].student_procedure_id}', body)
+
+    async def test_new_connection_gets_live_events_only(self):
+        async def publish_later():
+            await asyncio.sleep(0.1)
+            return await sync_to_async(self.create_event)(self.program, 3)
+
+        with override_settings(EVENT_STREAM_TIMEOUT=0.5):
+            body, event = await asyncio.gather(self.read_stream(), publish_later())
+
+        self.assertEqual([line for line in body.splitlines() if line.startswith("id: ")], [f"id: {event.pk}"])
+        self.assertIn(": keep-alive", body)
+
+    async def test_failed_first_read_ends_streams(self):
+        with mock.patch("exams.events._current_events", side_effect=DatabaseError("unavailable")), \
+                self.assertLogs("exams.events", "ERROR"), override_settings(EVENT_STREAM_TIMEOUT=30):
+            body = await asyncio.wait_for(self.read_stream(), timeout=5)
+
+        self.assertEqual(body, "retry: 3000\n\n")
+
+    async def test_poll_failures_are_retried(self):
+        real_new_events = events._new_events
+        calls = []
+
+        def flaky_new_events(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise DatabaseError("unavailable")
+            return real_new_events(*args)
+
+        async def publish_later():
+            await asyncio.sleep(0.3)
+            return await sync_to_async(self.create_event)(self.program, 3)
+
+        with mock.patch("exams.events._new_events", side_effect=flaky_new_events), \
+                self.assertLogs("exams.events", "ERROR"), \
+                override_settings(EVENT_STREAM_TIMEOUT=1):
+            body, event = await asyncio.gather(self.read_stream(), publish_later())
+
+        self.assertIn(f"id: {event.pk}", body)
+
+    async def test_stopped_hub_ends_streams(self):
+        async def publish_later():
+            await asyncio.sleep(0.1)
+            await sync_to_async(self.create_event)(self.program, 3)
+
+        with mock.patch.object(Subscription, "matches", side_effect=RuntimeError("bug")), \
+                self.assertLogs("exams.events", "ERROR"), \
+                override_settings(EVENT_STREAM_TIMEOUT=30):
+            body, _ = await asyncio.wait_for(asyncio.gather(self.read_stream(), publish_later()), timeout=5)
+
+        self.assertEqual(body, "retry: 3000\n\n")
+
+class DashboardStatsTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.procedure = self.create_procedure(step_count=2)
+        midwifery = Program.objects.create(name="Registered Midwifery", abbreviation="RM")
+        self.other_student = Student.objects.create(
+            index_number="RM-001", full_name="Akosua Darko", program=midwifery, level="100", is_active=False
+        )
+        self.sp = self.create_assessment(self.procedure, status="scored")
+        self.create_assessment(self.procedure, student=self.other_student)
+
+    def get_stats(self):
+        return self.client.get("/api/exams/dashboard-stats/").data
+
+    def test_totals_and_breakdowns(self):
+        stats = self.get_stats()
+
+        self.assertEqual(
+            {key: value for key, value in stats.items() if key not in ("programs", "levels")},
+            {
+                "total_students": 2, "active_students": 1, "total_examiners": 2, "total_procedures": 1,
+                "pending_assessments": 1, "scored_assessments": 1, "reconciled_assessments": 0,
+                "total_programs": 2,
+            },
+        )
+        programs = {program["abbreviation"]: program for program in stats["programs"]}
+        self.assertEqual(
+            (programs["RGN"]["total_students"], programs["RGN"]["total_procedures"], programs["RGN"]["scored_assessments"]),
+            (1, 1, 1),
+        )
+        self.assertEqual((programs["RM"]["active_students"], programs["RM"]["pending_assessments"]), (0, 1))
+        levels = {level["level"]: level for level in stats["levels"]}
+        self.assertEqual(list(levels), ["100", "200", "300", "400"])
+        self.assertEqual((levels["100"]["total_students"], levels["300"]["scored_assessments"]), (1, 1))
+
+    def test_query_count_and_cache(self):
+        # students, assessments, examiners, programs (reference cache miss)
+        with self.assertNumQueries(4):
+            self.get_stats()
+        with self.assertNumQueries(0):
+            self.get_stats()
+
+    def test_writes_invalidate(self):
+        self.get_stats()
+
+        # Counter-only saves (autosave) keep the cached copy
+        self.sp.save(update_fields=StudentProcedure.COUNTER_FIELDS)
+        with self.assertNumQueries(0):
+            self.get_stats()
+
+        self.sp.status = "reconciled"
+        self.sp.save(update_fields=["status"])
+        self.assertEqual(self.get_stats()["reconciled_assessments"], 1)
+
+        Student.objects.create(index_number="RGN-002", full_name="Yaw Asante", program=self.program, level="200")
+        self.assertEqual(self.get_stats()["total_students"], 3)
+
+        self.create_procedure(name="Wound Dressing", step_count=1)
+        self.assertEqual(self.get_stats()["total_procedures"], 2)
+
+    def test_student_import_invalidates(self):
+        self.get_stats()
+        import_students([(2, {
+            "Index Number": "RGN-002", "Full Name": "Yaw Asante",
+            "Program": "Registered General Nursing", "Level": "200", "Status": "Yes",
+        })])
+        self.assertEqual(self.get_stats()["total_students"], 3)
+
+
+class BulkAssignmentTests(ExamTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.examiner_c = User.objects.create_user(username="examiner_c", password="pass", role="examiner")
+        cls.examiner_d = User.objects.create_user(username="examiner_d", password="pass", role="examiner")
+        for index in range(2, 6):
+            Student.objects.create(
+                index_number=f"RGN-00{index}", full_name=f"Student {index}", program=cls.program, level="300"
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.procedures = [self.create_procedure(name=f"Procedure {index}", step_count=2) for index in range(3)]
+        self.pool = [self.examiner_a.id, self.examiner_b.id, self.examiner_c.id, self.examiner_d.id]
+
+    def assign(self, **data):
+        return self.client.post(
+            "/api/exams/admin/assignments/",
+            {"program_id": self.program.id, "examiner_ids": self.pool, **data},
+            format="json",
+        )
+
+    def test_pairs_are_balanced_without_self_pairing(self):
+        response = self.assign(level="300")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["updated"]), (15, 0))
+        # 15 assessments x 2 examiners over a pool of 4
+        self.assertEqual(sorted(row["assessments"] for row in response.data["load"]), [7, 7, 8, 8])
+        pairs = StudentProcedure.objects.values_list("examiner_a_id", "examiner_b_id")
+        self.assertEqual(len(pairs), 15)
+        self.assertTrue(all(a != b for a, b in pairs))
+        self.assertEqual(len({frozenset(pair) for pair in pairs}), 6)
+
+    def test_started_and_assigned_rows_are_kept(self):
+        started = self.create_assessment(self.procedures[0])
+        self.score_all_steps(started, self.examiner_a)
+        kept = self.create_assessment(self.procedures[1])
+        placeholder = StudentProcedure.objects.create(
+            student=self.student, procedure=self.procedures[2],
+            examiner_a=self.examiner_c, examiner_b=self.examiner_c,
+        )
+
+        response = self.assign()
+
+        self.assertEqual(
+            {key: response.data[key] for key in ("created", "updated", "unchanged", "skipped")},
+            {"created": 12, "updated": 1, "unchanged": 1, "skipped": 1},
+        )
+        placeholder.refresh_from_db()
+        self.assertNotEqual(placeholder.examiner_a_id, placeholder.examiner_b_id)
+        kept.refresh_from_db()
+        self.assertEqual((kept.examiner_a_id, kept.examiner_b_id), (self.examiner_a.id, self.examiner_b.id))
+
+        response = self.assign(overwrite=True)
+        self.assertEqual(response.data["skipped"], 1)
+
+    def test_dry_run_and_validation(self):
+        response = self.assign(dry_run=True)
+        self.assertEqual(response.data["created"], 15)
+        self.assertFalse(StudentProcedure.objects.exists())
+
+        self.assertEqual(self.assign(examiner_ids=[self.examiner_a.id]).status_code, 400)
+        self.assertEqual(self.assign(examiner_ids=[self.examiner_a.id, self.admin.id]).status_code, 400)
+        other = Program.objects.create(name="Registered Midwifery", abbreviation="RM")
+        foreign = self.create_procedure(name="Delivery", program=other)
+        self.assertEqual(self.assign(procedure_ids=[foreign.id]).status_code, 400)
+
+    def test_writes_are_bulk(self):
+        # examiners, procedures, students, existing rows, then
+        # SAVEPOINT, one insert, RELEASE
+        with self.assertNumQueries(7):
+            self.assign()
+
+    def test_existing_rows_are_planned_under_lock(self):
+        with mock.patch("exams.assignments._plan_assignments", wraps=assignments._plan_assignments) as plan:
+            self.assign()
+            self.assign(dry_run=True)
+
+        self.assertEqual([call.args[0].query.select_for_update for call in plan.call_args_list], [True, False])
+
+    def test_concurrent_create_is_a_conflict(self):
+        real_plan_pairs = assignments.plan_pairs
+
+        def plan_pairs(*args, **kwargs):
+            # Another request assigns the first pair between the read and the write
+            self.create_assessment(self.procedures[0])
+            return real_plan_pairs(*args, **kwargs)
+
+        with mock.patch("exams.assignments.plan_pairs", side_effect=plan_pairs):
+            response = self.assign()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(StudentProcedure.objects.exists())
+
+
+class BulkDeleteTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.procedure = self.create_procedure(step_count=3)
+        self.other = Student.objects.create(
+            index_number="RGN-002", full_name="Yaw Asante", program=self.program, level="300"
+        )
+        for student in (self.student, self.other):
+            sp = self.create_assessment(self.procedure, student=student, status="reconciled")
+            self.score_all_steps(sp, self.examiner_a)
+            self.score_all_steps(sp, self.examiner_b)
+            ReconciledScore.objects.bulk_create([
+                ReconciledScore(student_procedure=sp, step=step, score=4, reconciled_by=self.examiner_b)
+                for step in self.procedure.steps.all()
+            ])
+            ScoreSyncReceipt.objects.create(
+                examiner=self.examiner_a, key=f"sync-{sp.pk}", student_procedure=sp, outcome="applied"
+            )
+            publish(sp, "reconciled", self.examiner_b)
+            CarePlan.objects.create(student=student, program=self.program, examiner=self.examiner_a, score=15)
+        call_command("rebuild_grade_summaries", stdout=StringIO())
+
+    def collected(self, queryset):
+        """What queryset.delete() removes, per model, rolled back afterwards."""
+        with transaction.atomic():
+            deleted = queryset.delete()[1]
+            transaction.set_rollback(True)
+        return {label: count for label, count in deleted.items() if count}
+
+    def test_preview_matches_collector(self):
+        for plan, queryset in (
+            (STUDENT_DELETE_PLAN, Student.objects.filter(pk=self.student.pk)),
+            (PROCEDURE_DELETE_PLAN, Procedure.objects.filter(pk=self.procedure.pk)),
+        ):
+            preview = preview_delete(plan, list(queryset.values_list("pk", flat=True)))
+            self.assertEqual({label: count for label, count in preview.items() if count}, self.collected(queryset))
+
+    def test_chunked_student_delete_loads_no_rows(self):
+        expected = preview_delete(STUDENT_DELETE_PLAN, [self.student.pk, self.other.pk])
+        self.assertEqual(expected["exams.ProcedureStepScore"], 12)
+
+        # ids, then per batch of one: a delete per table inside a savepoint
+        with self.assertNumQueries(1 + 2 * (len(STUDENT_DELETE_PLAN) + 2)):
+            deleted = delete_students([self.student.pk, self.other.pk], batch_size=1)
+
+        self.assertEqual(deleted, expected)
+        self.assertFalse(Student.objects.exists())
+        self.assertFalse(ProcedureStepScore.objects.exists() or AssessmentEvent.objects.exists())
+        self.assertEqual(Procedure.objects.count(), 1)
+
+    def test_chunked_procedure_delete_refreshes_grades_and_caches(self):
+        kept = self.create_procedure(name="Wound Care", step_count=1)
+        version = reference.reference_version()
+        self.assertEqual(self.client.get("/api/exams/dashboard-stats/").data["reconciled_assessments"], 2)
+
+        deleted = delete_procedures([self.procedure.pk, kept.pk + 100])
+
+        self.assertEqual((deleted["exams.Procedure"], deleted["exams.StudentProcedure"]), (1, 2))
+        self.assertEqual(list(Procedure.objects.all()), [kept])
+        self.assertNotEqual(reference.reference_version(), version)
+        summary = StudentGradeSummary.objects.get(student=self.student)
+        self.assertEqual((summary.procedure_score, summary.care_plan_score, summary.total_score), (0, 15, 15))
+        self.assertEqual(self.client.get("/api/exams/dashboard-stats/").data["reconciled_assessments"], 0)
+
+    def test_preview_and_chunked_endpoints(self):
+        response = self.client.post(
+            "/api/exams/students/bulk-delete/preview/", {"student_ids": [self.student.pk]}, format="json"
+        )
+        self.assertEqual(response.data["deleted"]["exams.ReconciledScore"], 3)
+        self.assertEqual(response.data["total"], 6 + 3 + 1 + 1 + 1 + 1 + 1 + 1)
+        self.assertTrue(Student.objects.filter(pk=self.student.pk).exists())
+
+        response = self.client.post(
+            "/api/exams/students/bulk-delete/", {"student_ids": [self.student.pk], "chunked": True}, format="json"
+        )
+        self.assertEqual(response.data["deleted_count"], 1)
+        self.assertEqual(response.data["deleted"]["exams.StudentProcedure"], 1)
+        self.assertFalse(Student.objects.filter(pk=self.student.pk).exists())
+
+        response = self.client.post("/api/exams/procedures/bulk-delete/preview/", {"procedure_ids": "1"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+class PdfReportTests(ExamTestCase):
+
+    def draw_report(self, rows):
+        tables = []
+
+        class RecordingReport(PdfReport):
+            def _draw(self, flowable, height):
+                if isinstance(flowable, Table):
+                    tables.append((self.page, flowable._cellvalues))
+                super()._draw(flowable, height)
+
+        output = BytesIO()
+        report = RecordingReport(output, "Report")
+        report.table(["Index Number", "Name"], rows)
+        report.save()
+        return output.getvalue(), report.page, tables
+
+    def test_one_table_per_page_under_repeated_header(self):
+        rows = ([f"RGN-{i:04d}", f"Student {i}"] for i in range(500))
+        pdf, pages, tables = self.draw_report(rows)
+
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        self.assertGreater(pages, 5)
+        self.assertEqual([page for page, _ in tables], list(range(1, pages + 1)))
+        self.assertTrue(all(cells[0] == ["Index Number", "Name"] for _, cells in tables))
+        drawn = [row for _, cells in tables for row in cells[1:]]
+        self.assertEqual(drawn, [[f"RGN-{i:04d}", f"Student {i}"] for i in range(500)])
+
+    def test_tall_rows_carry_over(self):
+        rows = [[str(i), "line\n" * (8 if i % 7 == 3 else 1)] for i in range(120)]
+        _, pages, tables = self.draw_report(iter(rows))
+
+        drawn = [row for _, cells in tables for row in cells[1:]]
+        self.assertEqual(drawn, rows)
+
+    def test_empty_table_keeps_header(self):
+        _, pages, tables = self.draw_report([])
+        self.assertEqual((pages, tables), (1, [(1, [["Index Number", "Name"]])]))
+
+    def test_exports_stream_pdfs(self):
+        self.create_procedure(step_count=3)
+        self.create_procedure(name="Empty", step_count=0)
+        self.client.force_authenticate(self.admin)
+
+        # procedures with program, then all their steps
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/exams/admin/procedures/", {"export": "pdf"})
+            content = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(content.startswith(b"%PDF"))
+
+        for url, filename in (("/api/exams/admin/students/", "students.pdf"), ("/api/exams/grades/", "student_grades.pdf")):
+            response = self.client.get(url, {"export": "pdf"})
+            self.assertEqual(response["Content-Disposition"], f'attachment; filename="{filename}"')
+            self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+
+class TranscriptTests(ExamTestCase):
+
+    def reconcile(self, procedure, scores, student=None):
+        sp = self.create_assessment(procedure, student=student, status="reconciled")
+        ReconciledScore.objects.bulk_create([
+            ReconciledScore(student_procedure=sp, step=step, score=score, reconciled_by=self.examiner_b)
+            for step, score in zip(procedure.steps.all(), scores)
+        ])
+        return sp
+
+    def test_transcript_data_is_loaded_in_bulk(self):
+        vital_signs = self.create_procedure(step_count=3)
+        wound_care = self.create_procedure(name="Wound Care", step_count=2)
+        self.reconcile(vital_signs, [4, 3, 2])
+        self.reconcile(wound_care, [1, 1])
+        self.create_assessment(self.create_procedure(name="Pending", step_count=2))
+        CarePlan.objects.create(student=self.student, program=self.program, examiner=self.examiner_a, score=15)
+        other = Student.objects.create(index_number="RGN-002", full_name="Yaw Asante", program=self.program, level="300")
+        self.reconcile(vital_signs, [1, 1, 1], student=other)
+
+        # students, reconciled assessments, their scores, care plans
+        with self.assertNumQueries(4):
+            transcripts = list(load_transcripts(Student.objects.order_by("index_number")))
+
+        ama, yaw = transcripts
+        self.assertEqual([procedure["name"] for procedure in ama["procedures"]], ["Vital Signs", "Wound Care"])
+        self.assertEqual(ama["procedures"][0]["steps"], [(1, "Step 1", 4), (2, "Step 2", 3), (3, "Step 3", 2)])
+        self.assertEqual((ama["procedure_score"], ama["procedure_max_score"]), (11, 20))
+        self.assertEqual((ama["total_score"], ama["max_score"], ama["grade"]), (26, 40, "Pass"))
+        self.assertEqual((yaw["total_score"], yaw["max_score"], yaw["grade"]), (3, 12, "Fail"))
+
+        filename, pdf = render_transcript(ama)
+        self.assertEqual(filename, "RGN-001.pdf")
+        self.assertTrue(pdf.startswith(b"%PDF"))
+
+    def test_command_renders_in_process_pool(self):
+        procedure = self.create_procedure(step_count=2)
+        self.reconcile(procedure, [4, 4])
+        Student.objects.bulk_create([
+            Student(index_number=f"RGN/{i:03d}", full_name=f"Student {i}", program=self.program, level="300")
+            for i in range(2, 26)
+        ])
+        output = os.path.join(tempfile.mkdtemp(), "transcripts.zip")
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+
+        out = StringIO()
+        call_command("export_transcripts", "--output", output, "--workers", "2", stdout=out)
+
+        self.assertIn("25 transcripts written", out.getvalue())
+        with zipfile.ZipFile(output) as archive:
+            names = archive.namelist()
+            self.assertEqual(names[:2], ["RGN-001.pdf", "RGN002.pdf"])
+            self.assertEqual(len(names), 25)
+            self.assertTrue(all(archive.read(name).startswith(b"%PDF") for name in names))
+
+
+@override_settings(QUERY_INSTRUMENTATION=True, QUERY_BUDGETS_ENFORCED=True)
+class QueryInstrumentationTests(ExamTestCase):
+
+    def setUp(self):
+        super().setUp()
+        view_stats.reset()
+
+    def login(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+    def test_exam_day_flow_stays_within_budgets(self):
+        procedure = self.create_procedure(step_count=4)
+        sp = self.create_assessment(procedure)
+        student_url = f"/api/exams/students/{self.student.id}"
+
+        # Any request over its view's budget raises QueryBudgetExceeded
+        for examiner in (self.examiner_a, self.examiner_b):
+            self.login(examiner)
+            self.client.get("/api/exams/programs/")
+            self.client.get(f"/api/exams/programs/{self.program.id}/students/")
+            self.client.get(f"{student_url}/")
+            self.client.get(f"/api/exams/programs/{self.program.id}/procedures/", {"student_id": self.student.id})
+            self.client.get(f"{student_url}/procedures/{procedure.id}/")
+            for step in procedure.steps.all():
+                response = self.client.post(
+                    "/api/exams/autosave-step-score/",
+                    {"student_procedure": sp.id, "step": step.id, "score": 3}, format="json",
+                )
+        self.assertEqual(response.data["status"], "scored")
+        response = self.client.get(f"{student_url}/procedures/{procedure.id}/reconciliation/")
+        self.assertEqual(response.status_code, 200)
+
+        self.login(self.admin)
+        self.client.get("/api/exams/dashboard-stats/")
+        self.client.get("/api/exams/grades/")
+
+        stats = {row["view"]: row for row in self.client.get("/api/exams/admin/query-stats/").data["views"]}
+        autosave = stats["exams.views.AutosaveStepScoreView"]
+        self.assertEqual((autosave["requests"], autosave["budget"], autosave["over_budget"]), (8, 10, 0))
+        self.assertLessEqual(autosave["max_queries"], 10)
+
+    def test_server_timing_header(self):
+        self.login(self.examiner_a)
+        response = self.client.get(f"/api/exams/students/{self.student.id}/")
+
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="\d+ queries", view;dur=[\d.]+, serialize;dur=[\d.]+;desc="\d+ queries", '
+            r'render;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+
+    def test_serialize_counts_the_queries_run_in_serializer_data(self):
+        Student.objects.create(index_number="RGN-002", full_name="Kwame Asante", program=self.program)
+        self.login(self.examiner_a)
+
+        # One lazy lookup per student, as an N+1 relation would run
+        with mock.patch.object(StudentByProgramView.serializer_class, "to_representation",
+                               lambda serializer, student: {"program": Program.objects.get(pk=student.program_id).name}), \
+                mock.patch.object(StudentByProgramView, "query_budget", None):
+            response = self.client.get(f"/api/exams/programs/{self.program.id}/students/")
+
+        # The lazy queryset itself, then one lookup per student
+        self.assertRegex(response["Server-Timing"], r'serialize;dur=[\d.]+;desc="3 queries"')
+        stats = view_stats.summary()["views"][0]
+        self.assertEqual(stats["view"], "exams.views.StudentByProgramView")
+        self.assertIn("avg_render_ms", stats)
+
+    def test_over_budget(self):
+        self.login(self.examiner_a)
+        with mock.patch.object(ProgramListView, "query_budget", 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/api/exams/programs/")
+
+            with override_settings(QUERY_BUDGETS_ENFORCED=False), self.assertLogs("exams.instrumentation", "WARNING"):
+                self.assertEqual(self.client.get("/api/exams/programs/").status_code, 200)
+
+        self.login(self.admin)
+        stats = self.client.get("/api/exams/admin/query-stats/").data
+        self.assertTrue(stats["enabled"])
+        self.assertEqual(stats["views"][0]["view"], "exams.views.ProgramListView")
+        self.assertEqual((stats["views"][0]["requests"], stats["views"][0]["over_budget"]), (2, 2))
+
+        self.assertEqual(self.client.delete("/api/exams/admin/query-stats/").status_code, 204)
+        # Only the DELETE itself, recorded once it returned
+        self.assertEqual([row["view"] for row in view_stats.summary()["views"]], ["exams.views.QueryStatsView"])
+
+        self.login(self.examiner_a)
+        self.assertEqual(self.client.get("/api/exams/admin/query-stats/").status_code, 403)
+
+    @override_settings(QUERY_INSTRUMENTATION=False)
+    def test_off_by_default(self):
+        self.client = APIClient()
+        self.login(self.examiner_a)
+        response = self.client.get("/api/exams/programs/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(view_stats.summary()["views"], [])
+
+
+class LoadTestTests(ExamTestCase):
+    EXAM = {"programs": 1, "students": 6, "procedures": 3, "steps": 3, "examiners": 2}
+
+    def test_replays_the_mix_without_errors(self):
+        report = run_load_test(request_count=120, warmup=10, **self.EXAM)
+
+        self.assertEqual((report["requests"], report["errors"]), (120, 0))
+        self.assertLessEqual({"board_poll", "autosave"}, set(report["operations"]))
+        self.assertLessEqual(set(report["operations"]), set(TRAFFIC_MIX))
+        for row in report["operations"].values():
+            self.assertLessEqual(row["p50_ms"], row["p95_ms"])
+            self.assertLessEqual(row["p95_ms"], row["p99_ms"])
+            self.assertGreater(row["queries_per_request"], 0)
+        # Everything seeded is rolled back
+        self.assertEqual(Student.objects.count(), 1)
+
+    def test_traffic_is_reproducible(self):
+        def plan():
+            with transaction.atomic():
+                rng = random.Random(7)
+                exam = seed_exam(rng=rng, **self.EXAM)
+                transaction.set_rollback(True)
+            # Ids differ between seedings; the sequence of operations does not
+            return [(operation, method) for operation, _, method, *_ in plan_traffic(exam, 50, rng)]
+
+        self.assertEqual(plan(), plan())
+
+    def test_baseline_comparison(self):
+        path = os.path.join(tempfile.mkdtemp(), "baseline.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        options = ["--requests", "60", "--warmup", "0", "--programs", "1", "--students", "4",
+                   "--procedures", "2", "--steps", "3", "--examiners", "2"]
+
+        call_command("loadtest", *options, "--save-baseline", path, stdout=StringIO())
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        self.assertEqual(compare_to_baseline(baseline, baseline), [])
+
+        self.assertEqual(
+            compare_to_baseline(baseline, {**baseline, "throughput_rps": baseline["throughput_rps"] * 2}),
+            [f"throughput {baseline['throughput_rps']} req/s, baseline {baseline['throughput_rps'] * 2} req/s"],
+        )
+
+        baseline["operations"]["board_poll"]["queries_per_request"] -= 1
+        baseline["operations"]["board_poll"]["p95_ms"] = 0
+
+        with open(path, "w") as baseline_file:
+            json.dump(baseline, baseline_file)
+        with self.assertRaisesMessage(CommandError, "board_poll: p95") as raised:
+            call_command("loadtest", *options, "--compare", path, stdout=StringIO())
+        self.assertRegex(str(raised.exception), r"board_poll: [\d.]+ queries per request")
@@ -0,0 +1,205 @@
+"""
+End-of-term assessment transcripts: one PDF per student, in a ZIP.
+
+Students are read in chunks of TRANSCRIPT_CHUNK_SIZE with four queries
+per chunk, whatever the number of procedures or steps. The data for each
+student is put in a plain dict, and the PDFs are rendered in a pool of
+worker processes. reportlab is pure Python, so threads would all wait on
+the GIL; with processes, rendering scales with the number of cores. The
+parent process only does the database reads and writes the ZIP.
+
+    python manage.py export_transcripts --program-id 1 --output transcripts.zip
+"""
+import os
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import islice
+
+import django
+from django.utils.html import escape
+from django.utils.text import get_valid_filename
+from reportlab.lib.pagesizes import letter
+
+from .grades import EMPTY_TOTALS, apply_totals
+from .models import CarePlan, ReconciledScore, StudentGradeSummary, StudentProcedure
+from .reports import GRID_STYLE, PdfReport
+
+TRANSCRIPT_CHUNK_SIZE = 200
+# Below this many transcripts, starting the pool costs more than it saves
+MIN_POOL_SIZE = 20
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def load_transcripts(students, chunk_size=TRANSCRIPT_CHUNK_SIZE):
+    """
+    Transcript data for each of `students` (a Student queryset), in its
+    order: the reconciled procedures with their step scores, the care
+    plans and the grade totals.
+    """
+    students = students.select_related('program').iterator(chunk_size=chunk_size)
+    for chunk in _chunks(students, chunk_size):
+        yield from _load_chunk(chunk)
+
+
+def _load_chunk(students):
+    student_ids = [student.pk for student in students]
+
+    procedures = defaultdict(list)
+    by_id = {}
+    for sp in (
+        StudentProcedure.objects
+        .filter(student_id__in=student_ids, status='reconciled')
+        .select_related('procedure')
+        .order_by('procedure__name', 'pk')
+    ):
+        by_id[sp.pk] = {
+            'name': sp.procedure.name,
+            'score': 0,
+            'max_score': sp.procedure.total_score,
+            'reconciled_at': sp.reconciled_at.date().isoformat() if sp.reconciled_at else '',
+            'steps': [],
+        }
+        procedures[sp.student_id].append(by_id[sp.pk])
+
+    for sp_id, step_order, description, score in (
+        ReconciledScore.objects
+        .filter(student_procedure_id__in=by_id)
+        .order_by('student_procedure_id', 'step__step_order')
+        .values_list('student_procedure_id', 'step__step_order', 'step__description', 'score')
+    ):
+        procedure = by_id[sp_id]
+        procedure['steps'].append((step_order, description, score))
+        procedure['score'] += score
+
+    care_plans = defaultdict(list)
+    for care_plan in CarePlan.objects.filter(student_id__in=student_ids).order_by('assessed_at'):
+        care_plans[care_plan.student_id].append({
+            'score': care_plan.score,
+            'max_score': care_plan.max_score,
+            'comments': care_plan.comments or '',
+        })
+
+    for student in students:
+        # The same totals as exams.grades.collect_grade_totals, from the rows read above
+        totals = dict(EMPTY_TOTALS)
+        for procedure in procedures[student.pk]:
+            totals['procedure_score'] += procedure['score']
+            totals['procedure_max_score'] += procedure['max_score']
+            totals['reconciled_count'] += 1
+        for care_plan in care_plans[student.pk]:
+            totals['care_plan_score'] += care_plan['score']
+            totals['care_plan_max_score'] += care_plan['max_score']
+        summary = apply_totals(StudentGradeSummary(), totals)
+
+        yield {
+            'index_number': student.index_number,
+            'full_name': student.full_name,
+            'program_name': student.program.name,
+            'level': student.level,
+            'procedures': procedures[student.pk],
+            'care_plans': care_plans[student.pk],
+            'procedure_score': summary.procedure_score,
+            'procedure_max_score': summary.procedure_max_score,
+            'care_plan_score': summary.care_plan_score,
+            'care_plan_max_score': summary.care_plan_max_score,
+            'total_score': summary.total_score,
+            'max_score': summary.max_score,
+            'percentage': round(summary.percentage, 1),
+            'grade': summary.grade,
+        }
+
+
+def transcript_filename(transcript):
+    return f"{get_valid_filename(transcript['index_number']) or 'student'}.pdf"
+
+
+def render_transcript(transcript):
+    """(filename, PDF bytes) for one student; runs in a worker process."""
+    output = BytesIO()
+    report = PdfReport(output, "Assessment Transcript", pagesize=letter)
+    report.paragraph(
+        f"<b>{escape(transcript['full_name'])}</b> ({escape(transcript['index_number'])})<br/>"
+        f"{escape(transcript['program_name'])}, Level {escape(transcript['level'])}"
+    )
+    report.spacer(12)
+
+    for procedure in transcript['procedures']:
+        report.table(
+            ['Step', 'Description', 'Score'],
+            ([order, description, f"{score}/4"] for order, description, score in procedure['steps']),
+            col_widths=[40, 400, 60],
+            style=GRID_STYLE,
+            title=f"{escape(procedure['name'])}: {procedure['score']}/{procedure['max_score']}",
+            title_style='Heading3',
+        )
+        report.spacer(6)
+    if not transcript['procedures']:
+        report.paragraph("No reconciled procedures.")
+
+    if transcript['care_plans']:
+        report.paragraph("Care Plan", 'Heading3')
+        for care_plan in transcript['care_plans']:
+            comments = f": {escape(care_plan['comments'])}" if care_plan['comments'] else ''
+            report.paragraph(f"{care_plan['score']}/{care_plan['max_score']}{comments}")
+
+    report.spacer(12)
+    report.table(
+        ['', 'Score'],
+        [
+            ['Procedures', f"{transcript['procedure_score']}/{transcript['procedure_max_score']}"],
+            ['Care plan', f"{transcript['care_plan_score']}/{transcript['care_plan_max_score']}"],
+            ['Total', f"{transcript['total_score']}/{transcript['max_score']}"],
+            ['Percentage', f"{transcript['percentage']}%"],
+            ['Grade', transcript['grade']],
+        ],
+        col_widths=[120, 120],
+        style=GRID_STYLE,
+        title="Summary",
+        title_style='Heading3',
+    )
+    report.save()
+    return transcript_filename(transcript), output.getvalue()
+
+
+def write_transcripts_zip(students, output, workers=None, progress=None):
+    """
+    Write one transcript PDF per student of `students` into a ZIP on
+    `output`, rendering on `workers` processes (default: one per core).
+    Calls progress(done, total) after each chunk. Returns the count.
+    """
+    total = students.count()
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if workers > 1 and total >= MIN_POOL_SIZE:
+        # Under "spawn" the workers import this module, which needs Django set up
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+
+    done = 0
+    names = set()
+    try:
+        # PDF streams are already compressed
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for chunk in _chunks(load_transcripts(students), TRANSCRIPT_CHUNK_SIZE):
+                if pool is not None:
+                    rendered = pool.map(render_transcript, chunk, chunksize=max(1, len(chunk) // (workers * 4)))
+                else:
+                    rendered = map(render_transcript, chunk)
+                for filename, pdf in rendered:
+                    if filename in names:
+                        filename = f"{os.path.splitext(filename)[0]}_{done + 1}.pdf"
+                    names.add(filename)
+                    archive.writestr(filename, pdf)
+                    done += 1
+                if progress:
+                    progress(done, total)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return done
@@ -1,17 +1,23 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (AutosaveStepScoreView, BulkDeleteProceduresView,
+from .views import (AssessmentEventStreamView, AutosaveStepScoreView,
+                    BackgroundJobDownloadView,
+                    BackgroundJobView, BatchAutosaveStepScoresView,
+                    BulkAssignExaminersView, BulkDeleteProceduresPreviewView,
+                    BulkDeleteProceduresView, BulkDeleteStudentsPreviewView,
                     BulkDeleteStudentsView, CarePlanView, DashboardStatsView,
                     DownloadProcedureStepsTemplateView,
                     DownloadProcedureTemplateView, DownloadStudentTemplateView,
-                    ExaminerViewSet, ImportProcedureStepsView,
+                    EventStreamTicketView, ExaminerViewSet, ImportProcedureStepsView,
                     ImportProceduresView, ImportStudentsView,
                     ProcedureByProgramView, ProcedureDetailView,
                     ProcedureStepViewSet, ProcedureViewSet, ProgramListView,
-                    ProgramViewSet, ReconciliationView, SaveReconciliationView,
+                    ProgramViewSet, QueryStatsView, ReconciliationView,
+                    SaveReconciliationView,
                     StudentByProgramView, StudentDetailView, StudentGradesView,
-                    StudentViewSet)
+                    StudentViewSet, SyncStepScoresView,
+                    TranscriptExportView)
 
 # Router for viewsets
 router = DefaultRouter()
@@ -29,11 +35,15 @@ urlpatterns = [
     path("students/<int:pk>/", StudentDetailView.as_view()),
     path("students/<int:student_id>/procedures/<int:pk>/", ProcedureDetailView.as_view()),
     path("autosave-step-score/", AutosaveStepScoreView.as_view()),
+    path("autosave-step-scores/", BatchAutosaveStepScoresView.as_view()),
+    path("sync/", SyncStepScoresView.as_view()),
 
     # Student import/export
     path("students/import/", ImportStudentsView.as_view(), name='import-students'),
     path("students/template/", DownloadStudentTemplateView.as_view(), name='student-template'),
     path("students/bulk-delete/", BulkDeleteStudentsView.as_view(), name='bulk-delete-students'),
+    path("students/bulk-delete/preview/", BulkDeleteStudentsPreviewView.as_view(),
+         name='bulk-delete-students-preview'),
 
     # Care Plan
     path("students/<int:student_id>/programs/<int:program_id>/care-plan/", 
@@ -43,17 +53,28 @@ urlpatterns = [
     path("students/<int:student_id>/procedures/<int:procedure_id>/reconciliation/", 
          ReconciliationView.as_view()),
     path("save-reconciliation/", SaveReconciliationView.as_view()),
+
+    # Live status changes (server-sent events, ASGI only)
+    path("events/", AssessmentEventStreamView.as_view(), name='assessment-events'),
+    path("events/tickets/", EventStreamTicketView.as_view(), name='assessment-event-tickets'),
     
+    # Examiner assignment for a whole cohort
+    path("admin/assignments/", BulkAssignExaminersView.as_view(), name='bulk-assign-examiners'),
+
     # Admin dashboard
     path("dashboard-stats/", DashboardStatsView.as_view()),
+    path("admin/query-stats/", QueryStatsView.as_view(), name='query-stats'),
     
     # Grades
     path("grades/", StudentGradesView.as_view(), name='student-grades'),
+    path("transcripts/", TranscriptExportView.as_view(), name='student-transcripts'),
 
     # Procedure import/template
     path("procedures/import/", ImportProceduresView.as_view(), name='import-procedures'),
     path("procedures/template/", DownloadProcedureTemplateView.as_view(), name='procedure-template'),
     path("procedures/bulk-delete/", BulkDeleteProceduresView.as_view(), name='bulk-delete-procedures'),
+    path("procedures/bulk-delete/preview/", BulkDeleteProceduresPreviewView.as_view(),
+         name='bulk-delete-procedures-preview'),
 
     
     # Procedure Steps Import/Export
@@ -62,6 +83,10 @@ urlpatterns = [
     path("procedures/<int:procedure_id>/steps/template/", 
          DownloadProcedureStepsTemplateView.as_view(), name='procedure-steps-template'),
 
+    # Background jobs
+    path("jobs/<uuid:job_id>/", BackgroundJobView.as_view(), name='job-status'),
+    path("jobs/<uuid:job_id>/download/", BackgroundJobDownloadView.as_view(), name='job-download'),
+
     # Router URLs LAST
     path('', include(router.urls)),
 ]
\ No newline at end of file
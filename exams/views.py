@@ -1,30 +1,57 @@
-import csv
+import os
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Count, Q, Sum, Value, OuterRef, Subquery
+from django.db.models import Count, F, Max, Prefetch, Q, Value
 from django.db.models.functions import Coalesce
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import escape
+from django.views import View
 # For Excel export
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
-from reportlab.lib import colors
 # For PDF export
-from reportlab.lib.pagesizes import landscape, letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from reportlab.lib import colors
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 
 from accounts.models import User
 
-from .models import (CarePlan, Procedure, ProcedureStep, ProcedureStepScore,
-                     Program, ReconciledScore, Student, StudentProcedure)
+from .assessment import AssessmentContext
+from .assignments import AssignmentError, assign_examiners
+from .conditional import ConditionalGetMixin, latest, make_etag
+from .dashboard import dashboard_stats
+from .deletion import (PROCEDURE_DELETE_PLAN, STUDENT_DELETE_PLAN, delete_procedures,
+                       delete_students, preview_delete)
+from .events import Subscription, issue_stream_ticket, publish, redeem_stream_ticket, stream_events
+from .exports import EXPORT_CHUNK_SIZE, ExcelExport, stream_csv, stream_excel
+from .grades import EMPTY_TOTALS, apply_totals, refresh_grade_summaries
+from .importers import (ERROR_REPORT_HEADER, ImportFailed, ImportRows, error_report_rows,
+                        import_procedure_steps, import_procedures_csv, import_procedures_excel,
+                        import_students)
+from .instrumentation import view_stats
+from .jobs import enqueue
+from .models import (BackgroundJob, CarePlan, Procedure, ProcedureStep,
+                     Program, ReconciledScore, Student,
+                     StudentGradeSummary, StudentProcedure)
+from .pagination import KeysetPagination
+from .reference import (cached, procedure_steps, program_procedures, reference_changed_at,
+                        reference_version)
+from .reports import GRID_STYLE, PdfReport, pdf_response
 from .permissions import IsAdmin, IsExaminer
-from .serializers import (CarePlanCreateSerializer, CarePlanSerializer, DashboardStatsSerializer,
+from .scoring import (ScoringError, apply_sync_journal, check_can_score,
+                      completion_payload, get_locked_student_procedure,
+                      parse_score, save_step_scores, sync_delta)
+from .serializers import (BackgroundJobSerializer, CarePlanCreateSerializer, CarePlanSerializer, DashboardStatsSerializer,
                           ProcedureAdminListSerializer, ProcedureCreateUpdateSerializer, ProcedureDetailSerializer, 
                           ProcedureListSerializer, ProcedureStepCreateUpdateSerializer, ProgramSerializer, 
                           ReconciliationSerializer, StudentCreateUpdateSerializer, StudentSerializer,
@@ -32,11 +59,16 @@ from .serializers import (CarePlanCreateSerializer, CarePlanSerializer, Dashboar
 
 
 class ProgramListView(ListAPIView):
+    query_budget = 2
     permission_classes = [IsAuthenticated, IsExaminer | IsAdmin]
     queryset = Program.objects.all()
     serializer_class = ProgramSerializer
 
+    def list(self, request, *args, **kwargs):
+        return Response(cached_program_list())
+
 class StudentByProgramView(ListAPIView):
+    query_budget = 3
     permission_classes = [IsAuthenticated, IsExaminer | IsAdmin]
     serializer_class = StudentSerializer
 
@@ -51,14 +83,45 @@ class StudentByProgramView(ListAPIView):
         
         return queryset    
 
-class ProcedureByProgramView(ListAPIView):
+class ProcedureByProgramView(ConditionalGetMixin, ListAPIView):
+    query_budget = 4
     permission_classes = [IsAuthenticated, IsExaminer | IsAdmin]
     serializer_class = ProcedureListSerializer
 
-    def get_queryset(self):
-        return Procedure.objects.filter(
-            program_id=self.kwargs["program_id"]
+    def get_validators(self, request):
+        # The board changes with the reference data and the student's
+        # assessments (count and latest updated_at, one indexed lookup)
+        program_id = self.kwargs["program_id"]
+        student_id = request.query_params.get("student_id")
+        last_modified = reference_changed_at()
+        assessments = None
+        if student_id:
+            assessments = StudentProcedure.objects.filter(
+                student_id=student_id, procedure__program_id=program_id
+            ).aggregate(count=Count('id'), last=Max('updated_at'))
+            if assessments['count']:
+                last_modified = latest(last_modified, assessments['last'])
+        etag = make_etag(
+            'procedure-board', program_id, student_id, request.user.pk, reference_version(), assessments
         )
+        return etag, last_modified
+
+    def list(self, request, *args, **kwargs):
+        # Procedures come from the reference cache; only the student's
+        # assessments are read from the database, in one query
+        procedures = program_procedures(self.kwargs["program_id"])
+
+        student_id = request.query_params.get("student_id")
+        if student_id:
+            assessments = {}
+            for sp in StudentProcedure.objects.filter(
+                student_id=student_id, procedure__in=[procedure.pk for procedure in procedures]
+            ).with_total_steps():
+                assessments.setdefault(sp.procedure_id, []).append(sp)
+            for procedure in procedures:
+                procedure.student_assessments = assessments.get(procedure.pk, [])
+
+        return Response(self.get_serializer(procedures, many=True).data)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -67,6 +130,8 @@ class ProcedureByProgramView(ListAPIView):
         return context
 
 class ProcedureDetailView(RetrieveAPIView):
+    query_budget = 5
+    # Steps come from the reference cache (see AssessmentContext.load)
     queryset = Procedure.objects.all()
     serializer_class = ProcedureDetailSerializer
     permission_classes = [IsAuthenticated, IsExaminer]
@@ -76,31 +141,34 @@ class ProcedureDetailView(RetrieveAPIView):
         procedure = self.get_object()
         
         # Get or create StudentProcedure
-        sp, created = StudentProcedure.objects.get_or_create(
-            student_id=student_id,
-            procedure=procedure,
-            defaults={
-                "examiner_a": request.user,
-                "examiner_b": request.user,  # Temporary placeholder
-            }
+        sp, created = (
+            StudentProcedure.objects
+            .select_related('examiner_a', 'examiner_b', 'assigned_reconciler')
+            .get_or_create(
+                student_id=student_id,
+                procedure=procedure,
+                defaults={
+                    "examiner_a": request.user,
+                    "examiner_b": request.user,  # Temporary placeholder
+                }
+            )
         )
         
         # Auto-assign second examiner
-        if sp.examiner_a == sp.examiner_b:
-            if sp.examiner_a == request.user:
+        if sp.examiner_a_id == sp.examiner_b_id:
+            if sp.examiner_a_id == request.user.pk:
                 # Current user is examiner_a, examiner_b not yet assigned
                 pass
             else:
                 # A different user is accessing, make them examiner_b
                 sp.examiner_b = request.user
+                sp.examiner_b_scored_steps = 0
+                sp.examiner_b_last_scored_at = None
                 sp.save()
-        elif request.user not in [sp.examiner_a, sp.examiner_b]:
+        elif request.user.pk not in [sp.examiner_a_id, sp.examiner_b_id]:
             # Check if both examiners have scored
-            total_steps = sp.procedure.steps.count()
-            examiner_a_scores = sp.step_scores.filter(examiner=sp.examiner_a).count()
-            examiner_b_scores = sp.step_scores.filter(examiner=sp.examiner_b).count()
-            
-            both_scored = (examiner_a_scores == total_steps and examiner_b_scores == total_steps)
+            sp.total_steps = len(procedure_steps(procedure.pk))
+            both_scored = all(sp.get_completion())
             
             # User is not an assigned examiner
             return Response(
@@ -124,11 +192,17 @@ class ProcedureDetailView(RetrieveAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        return super().retrieve(request, *args, **kwargs)
+        # Load the shared state once; every serializer field reads from it
+        self.assessment = AssessmentContext.load(
+            procedure, user=request.user, student_procedure=sp
+        )
+        serializer = self.get_serializer(procedure)
+        return Response(serializer.data)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context["student_id"] = self.kwargs.get("student_id")
+        context["assessment"] = getattr(self, "assessment", None)
         return context
 
 class AutosaveStepScoreView(APIView):
@@ -136,6 +210,7 @@ class AutosaveStepScoreView(APIView):
     Autosave the score for a single step.
     Expects POST data: { student_procedure: int, step: int, score: int }
     """
+    query_budget = 10
 
     def post(self, request, *args, **kwargs):
         data = request.data
@@ -151,86 +226,176 @@ class AutosaveStepScoreView(APIView):
             )
 
         try:
-            sp = StudentProcedure.objects.get(id=student_procedure_id)
-            step = ProcedureStep.objects.get(id=step_id)
-        except StudentProcedure.DoesNotExist:
-            return Response({"detail": "StudentProcedure not found."}, status=404)
-        except ProcedureStep.DoesNotExist:
-            return Response({"detail": "ProcedureStep not found."}, status=404)
+            with transaction.atomic():
+                sp = get_locked_student_procedure(student_procedure_id)
+                try:
+                    step = ProcedureStep.objects.get(id=step_id, procedure_id=sp.procedure_id)
+                except (ProcedureStep.DoesNotExist, ValueError):
+                    return Response({"detail": "ProcedureStep not found."}, status=404)
 
-        # Verify current user is one of the assigned examiners
-        if request.user not in [sp.examiner_a, sp.examiner_b]:
-            return Response(
-                {"detail": "You are not authorized to score this procedure."},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
-        # Check if procedure is locked
-        if sp.assigned_reconciler:
+                check_can_score(sp, request.user)
+                score = parse_score(score)
+
+                # Save the step score and update the completion counters
+                created = save_step_scores(sp, request.user, {step.id: score})[step.id]
+        except ScoringError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+
+        return Response(
+            {
+                "step": step.id, 
+                "score": score, 
+                "created": created,
+                **completion_payload(sp),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+class BatchAutosaveStepScoresView(APIView):
+    """
+    Autosave many step scores for one StudentProcedure in a single request.
+    Expects POST data: { student_procedure: int, scores: [{step: int, score: int}, ...] }
+    Later entries for the same step win.
+    """
+    query_budget = 11
+
+    def post(self, request, *args, **kwargs):
+        student_procedure_id = request.data.get("student_procedure")
+        entries = request.data.get("scores")
+
+        if not student_procedure_id or not isinstance(entries, list) or not entries:
             return Response(
-                {"detail": "Cannot modify scores. Reconciler has been assigned."},
-                status=status.HTTP_403_FORBIDDEN
+                {"detail": "student_procedure and a non-empty scores list are required."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        
-        if sp.status == "reconciled":
+
+        try:
+            with transaction.atomic():
+                sp = get_locked_student_procedure(student_procedure_id)
+                check_can_score(sp, request.user)
+
+                # Validate every entry against the procedure's step set (one query)
+                step_ids = set(
+                    ProcedureStep.objects
+                    .filter(procedure_id=sp.procedure_id)
+                    .values_list('id', flat=True)
+                )
+                scores = {}
+                invalid_steps = []
+                for entry in entries:
+                    if not isinstance(entry, dict) or entry.get("step") is None or entry.get("score") is None:
+                        return Response(
+                            {"detail": "Each entry must have step and score."},
+                            status=status.HTTP_400_BAD_REQUEST,
+                        )
+                    try:
+                        step_id = int(entry["step"])
+                    except (TypeError, ValueError):
+                        step_id = None
+                    if step_id not in step_ids:
+                        invalid_steps.append(entry["step"])
+                        continue
+                    scores[step_id] = parse_score(entry["score"])
+
+                if invalid_steps:
+                    return Response(
+                        {"detail": "Steps not found in this procedure.", "invalid_steps": invalid_steps},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+                created = save_step_scores(sp, request.user, scores)
+        except ScoringError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+
+        return Response(
+            {
+                "saved": [
+                    {"step": step_id, "score": score, "created": created[step_id]}
+                    for step_id, score in scores.items()
+                ],
+                **completion_payload(sp),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+class SyncStepScoresView(APIView):
+    """
+    Offline-first sync for examiner tablets.
+    Expects POST data: {
+        cursor: str | null,  # value returned by the previous sync
+        changes: [{key: str, student_procedure: int, step: int, score: int, client_ts: str}, ...]
+    }
+    Applies the journal in order (see scoring.apply_sync_journal) and returns
+    per-change results plus the server-side delta since `cursor`.
+    """
+    permission_classes = [IsAuthenticated, IsExaminer]
+    max_changes = 1000
+
+    def post(self, request, *args, **kwargs):
+        changes = request.data.get("changes", [])
+        cursor = request.data.get("cursor")
+
+        if not isinstance(changes, list):
+            return Response({"detail": "changes must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(changes) > self.max_changes:
             return Response(
-                {"detail": "Cannot modify scores. Procedure has been reconciled."},
-                status=status.HTTP_403_FORBIDDEN
+                {"detail": f"At most {self.max_changes} changes per sync."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Save the step score
-        step_score, created = ProcedureStepScore.objects.update_or_create(
-            student_procedure=sp,
-            step=step,
-            examiner=request.user,
-            defaults={"score": score},
-        )
+        if cursor:
+            parsed_cursor = parse_datetime(str(cursor))
+            if parsed_cursor is None:
+                return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+            cursor = parsed_cursor
 
-        # Update status logic - Check if BOTH DIFFERENT examiners have scored ALL steps
-        total_steps = sp.procedure.steps.count()
-        
-        # Only update status if both examiners are different users
-        if sp.examiner_a != sp.examiner_b:
-            examiner_a_scores = sp.step_scores.filter(examiner=sp.examiner_a).count()
-            examiner_b_scores = sp.step_scores.filter(examiner=sp.examiner_b).count()
-            
-            examiner_a_complete = examiner_a_scores == total_steps
-            examiner_b_complete = examiner_b_scores == total_steps
-
-            # If both examiners have scored all steps, mark as "scored"
-            if examiner_a_complete and examiner_b_complete:
-                if sp.status == "pending":
-                    sp.status = "scored"
-                    sp.save()
-        else:
-            # Only one examiner assigned, can't determine completion status
-            examiner_a_complete = False
-            examiner_b_complete = False
+        with transaction.atomic():
+            results = apply_sync_journal(request.user, changes)
+
+        delta, next_cursor = sync_delta(request.user, cursor)
 
         return Response(
             {
-                "step": step.id, 
-                "score": step_score.score, 
-                "created": created,
-                "status": sp.status,
-                "examiner_a_complete": examiner_a_complete,
-                "examiner_b_complete": examiner_b_complete,
-                "both_examiners_assigned": sp.examiner_a != sp.examiner_b,
-                "is_locked": sp.assigned_reconciler is not None,
+                "results": results,
+                "cursor": next_cursor.isoformat(),
+                **delta,
             },
             status=status.HTTP_200_OK,
         )
 
-class ReconciliationView(RetrieveAPIView):
+class ReconciliationView(ConditionalGetMixin, RetrieveAPIView):
     """
     GET endpoint to fetch StudentProcedure with both examiners' scores for reconciliation
     """
+    query_budget = 11
     serializer_class = ReconciliationSerializer
+
+    def get_validators(self, request):
+        sp = (
+            StudentProcedure.objects
+            .filter(student_id=self.kwargs['student_id'], procedure_id=self.kwargs['procedure_id'])
+            .values('pk', 'updated_at', 'status', 'assigned_reconciler_id')
+            .first()
+        )
+        if sp is None or (sp['status'] == 'scored' and sp['assigned_reconciler_id'] is None):
+            # This GET may create the assessment or assign the reconciler
+            return None
+        etag = make_etag('reconciliation', sp['pk'], sp['updated_at'], request.user.pk, reference_version())
+        return etag, latest(sp['updated_at'], reference_changed_at())
     
     def get_queryset(self):
-        return StudentProcedure.objects.filter(
-            student_id=self.kwargs['student_id'],
-            procedure_id=self.kwargs['procedure_id']
+        return (
+            StudentProcedure.objects
+            .filter(
+                student_id=self.kwargs['student_id'],
+                procedure_id=self.kwargs['procedure_id']
+            )
+            .select_related(
+                'student__program', 'procedure',
+                'examiner_a', 'examiner_b', 'reconciled_by',
+            )
+            .with_total_steps()
+            .prefetch_related('procedure__steps', 'step_scores', 'reconciled_scores')
         )
     
     def get_object(self):
@@ -247,10 +412,12 @@ class ReconciliationView(RetrieveAPIView):
             )
         
         # CRITICAL: Assign reconciler if not already assigned and user can reconcile
-        if obj.status == 'scored' and not obj.assigned_reconciler:
+        if obj.status == 'scored' and not obj.assigned_reconciler_id:
             if obj.can_user_reconcile(self.request.user):
                 obj.assigned_reconciler = self.request.user
-                obj.save()
+                with transaction.atomic():
+                    obj.save()
+                    publish(obj, 'reconciler_assigned', actor=self.request.user)
         
         return obj
 
@@ -287,6 +454,11 @@ class SaveReconciliationView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # A re-save that changes nothing is not a new reconciliation
+        was_reconciled = sp.status == 'reconciled'
+        previous_scores = dict(sp.reconciled_scores.values_list('step_id', 'score'))
+        new_scores = {}
+
         # Delete any existing reconciled scores for this student procedure
         sp.reconciled_scores.all().delete()
         
@@ -310,18 +482,23 @@ class SaveReconciliationView(APIView):
                 )
             
             # Create reconciled score in separate table
-            ReconciledScore.objects.create(
+            reconciled_score = ReconciledScore.objects.create(
                 student_procedure=sp,
                 step=step,
                 score=score,
                 reconciled_by=request.user,
             )
+            new_scores[step.id] = int(reconciled_score.score)
         
         # Update reconciliation metadata
         sp.status = 'reconciled'
         sp.reconciled_by = request.user
         sp.reconciled_at = timezone.now()
         sp.save()
+
+        if not was_reconciled or new_scores != previous_scores:
+            publish(sp, 'reconciled', actor=request.user)
+            refresh_grade_summaries([sp.student_id])
         
         return Response(
             {
@@ -333,6 +510,73 @@ class SaveReconciliationView(APIView):
             status=status.HTTP_200_OK
         )
 
+class EventStreamTicketView(APIView):
+    """
+    POST issues a single-use ticket for GET /api/exams/events/?ticket=,
+    since EventSource cannot send the Authorization header.
+    """
+    permission_classes = [IsAuthenticated, IsExaminer | IsAdmin]
+
+    def post(self, request):
+        return Response(
+            {"ticket": issue_stream_ticket(request.user), "expires_in": settings.EVENT_STREAM_TICKET_TIMEOUT},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+def authenticate_stream(request):
+    """
+    The user of a plain Django request, from its JWT Authorization header or
+    a stream ticket in ?ticket=, or None. Access tokens are never read from
+    the query string, where they would be logged.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        ticket = request.GET.get('ticket')
+        user_id = redeem_stream_ticket(ticket) if ticket else None
+        return User.objects.filter(pk=user_id).first() if user_id is not None else None
+
+    raw_token = authentication.get_raw_token(header)
+    if not raw_token:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+class AssessmentEventStreamView(View):
+    """
+    Server-sent events for StudentProcedure status changes (scored,
+    reconciler_assigned, reconciled), optionally limited to ?program_id=
+    and/or ?student_id=. An async view: run under ASGI (see exams.events).
+    """
+
+    async def get(self, request, *args, **kwargs):
+        user = await sync_to_async(authenticate_stream)(request)
+        if user is None or not user.is_active:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        if user.role not in ("examiner", "admin"):
+            return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+
+        try:
+            filters = {
+                key: int(request.GET[key]) for key in ("program_id", "student_id") if request.GET.get(key)
+            }
+            last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return JsonResponse({"detail": "program_id, student_id and Last-Event-ID must be integers."}, status=400)
+
+        response = StreamingHttpResponse(
+            stream_events(Subscription(**filters), last_event_id),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: do not buffer the stream
+        return response
+
 class AssignExaminersView(APIView):
     """
     POST endpoint to create/update StudentProcedure with assigned examiners
@@ -373,6 +617,10 @@ class AssignExaminersView(APIView):
             }
         )
 
+        # Examiners may have changed; recount their progress
+        sp.refresh_scoring_counters()
+        sp.save(update_fields=StudentProcedure.COUNTER_FIELDS + ['updated_at'])
+
         return Response(
             {
                 "id": sp.id,
@@ -383,12 +631,62 @@ class AssignExaminersView(APIView):
             status=status.HTTP_200_OK
         )
     
-class StudentDetailView(RetrieveAPIView):
+class BulkAssignExaminersView(APIView):
+    """
+    POST endpoint to assign examiner pairs across a cohort in one go
+    Expects: { program_id: int, examiner_ids: [int], level?: str, procedure_ids?: [int],
+               overwrite?: bool, dry_run?: bool }
+    Pairs are balanced across the pool (see exams.assignments); assessments
+    already being scored are left alone.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        try:
+            program_id = int(data.get("program_id"))
+            examiner_ids = [int(examiner_id) for examiner_id in data.get("examiner_ids") or []]
+            procedure_ids = data.get("procedure_ids")
+            if procedure_ids is not None:
+                procedure_ids = [int(procedure_id) for procedure_id in procedure_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "program_id, examiner_ids and procedure_ids must be integers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        level = data.get("level")
+        if level and level not in dict(Student.LEVEL_CHOICES):
+            return Response({"detail": f"Unknown level: {level}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            summary = assign_examiners(
+                program_id,
+                examiner_ids,
+                level=level or None,
+                procedure_ids=procedure_ids,
+                overwrite=request_flag(request, "overwrite"),
+                dry_run=request_flag(request, "dry_run"),
+            )
+        except AssignmentError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+
+        return Response(summary, status=status.HTTP_200_OK)
+
+class StudentDetailView(ConditionalGetMixin, RetrieveAPIView):
     """Get student details by ID"""
+    query_budget = 4
     permission_classes = [IsAuthenticated, IsExaminer]
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
 
+    def get_validators(self, request):
+        updated_at = Student.objects.filter(pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        etag = make_etag('student', self.kwargs['pk'], updated_at, reference_version())
+        return etag, latest(updated_at, reference_changed_at())
+
 
 # =======================
 # ADMIN DASHBOARD VIEWS 
@@ -396,23 +694,28 @@ class StudentDetailView(RetrieveAPIView):
 
 class DashboardStatsView(APIView):
     """Get dashboard statistics"""
+    query_budget = 5
     permission_classes = [IsAuthenticated, IsAdmin]
     
     def get(self, request):
-        stats = {
-            'total_students': Student.objects.count(),
-            'active_students': Student.objects.filter(is_active=True).count(),
-            'total_examiners': User.objects.filter(role="examiner").count(),
-            'total_procedures': Procedure.objects.count(),
-            'pending_assessments': StudentProcedure.objects.filter(status='pending').count(),
-            'scored_assessments': StudentProcedure.objects.filter(status='scored').count(),
-            'reconciled_assessments': StudentProcedure.objects.filter(status='reconciled').count(),
-            'total_programs': Program.objects.count(),
-        }
-        
-        serializer = DashboardStatsSerializer(stats)
+        # Totals plus per-program and per-level breakdowns, cached briefly
+        serializer = DashboardStatsSerializer(dashboard_stats())
         return Response(serializer.data)
 
+class QueryStatsView(APIView):
+    """
+    Per-view query counts and timings of this process (see exams.instrumentation)
+    DELETE starts the totals afresh.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response({'enabled': settings.QUERY_INSTRUMENTATION, **view_stats.summary()})
+
+    def delete(self, request):
+        view_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class ExaminerViewSet(viewsets.ModelViewSet):
     """CRUD operations for examiners (users)"""
     queryset = User.objects.filter(role="examiner")
@@ -480,16 +783,17 @@ class StudentViewSet(viewsets.ModelViewSet):
             )
         )
 
-        data = [
+        levels = dict(Student.LEVEL_CHOICES)
+        data = (
             {
                 'index_number': s['index_number'],
                 'full_name': s['full_name'],
                 'program_name': s['program__name'],
-                'level': dict(Student.LEVEL_CHOICES).get(s['level'], s['level']),
+                'level': levels.get(s['level'], s['level']),
                 'is_active': 'Yes' if s['is_active'] else 'No',
             }
-            for s in students
-        ]
+            for s in students.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
 
         if export_format == 'csv':
             return self._export_csv(data)
@@ -501,108 +805,64 @@ class StudentViewSet(viewsets.ModelViewSet):
         return Response({'error': 'Invalid format'}, status=400)
     
     def _export_csv(self, data):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="students.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Index Number', 'Full Name', 'Program', 'Level', 'Status'])
-        
-        for item in data:
-            writer.writerow([
+        rows = (
+            [
                 item['index_number'],
                 item['full_name'],
                 item['program_name'],
                 item['level'],
                 item['is_active'],
-            ])
-        
-        return response
+            ]
+            for item in data
+        )
+        return stream_csv(
+            'students.csv', ['Index Number', 'Full Name', 'Program', 'Level', 'Status'], rows
+        )
     
-    def _export_excel(self, data):   
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Students"
-        
-        # Headers
-        headers = ['Index Number', 'Full Name', 'Program', 'Level', 'Status']
-        ws.append(headers)
-        
-        # Style headers
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-        
-        # Data
-        for item in data:
-            ws.append([
+    def _export_excel(self, data):
+        rows = (
+            [
                 item['index_number'],
                 item['full_name'],
                 item['program_name'],
                 item['level'],
                 item['is_active'],
-            ])
-        
-        # Adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            ]
+            for item in data
+        )
+        return stream_excel(
+            'students.xlsx', 'Students',
+            ['Index Number', 'Full Name', 'Program', 'Level', 'Status'], rows,
         )
-        response['Content-Disposition'] = 'attachment; filename="students.xlsx"'
-        wb.save(response)
-        
-        return response
     
-    def _export_pdf(self, data):       
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="students.pdf"'
-        
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        elements = []
-        
-        styles = getSampleStyleSheet()
-        title = Paragraph("Students List", styles['Title'])
-        elements.append(title)
-        elements.append(Paragraph("<br/><br/>", styles['Normal']))
-        
-        table_data = [['Index Number', 'Full Name', 'Program', 'Level', 'Status']]
-        
-        for item in data:
-            table_data.append([
+    def _export_pdf(self, data):
+        rows = (
+            [
                 item['index_number'],
                 item['full_name'],
                 item['program_name'],
                 item['level'],
                 item['is_active'],
+            ]
+            for item in data
+        )
+
+        def write(output):
+            report = PdfReport(output, "Students List")
+            report.table(['Index Number', 'Full Name', 'Program', 'Level', 'Status'], rows, style=[
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('FONTSIZE', (0, 1), (-1, -1), 9),
             ])
-        
-        table = Table(table_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ]))
-        
-        elements.append(table)
-        doc.build(elements)
-        
-        return response
+            report.save()
+
+        return pdf_response('students.pdf', write)
     
     @action(detail=False, methods=['get'])
     def by_program(self, request):
@@ -641,103 +901,18 @@ class ImportStudentsView(APIView):
         if file_extension not in ['csv', 'xlsx', 'xls']:
             return Response({'error': 'Invalid file format. Use CSV or Excel.'}, status=400)
         
+        dry_run = request_flag(request, 'dry_run')
+        if wants_background(request):
+            job = enqueue(
+                'import_students', request.user, {'file_extension': file_extension, 'dry_run': dry_run}, upload=file
+            )
+            return job_accepted(request, job)
+        
         try:
-            if file_extension == 'csv':
-                return self._import_csv(file)
-            else:
-                return self._import_excel(file)
+            result = import_students(ImportRows(file, file_extension), dry_run=dry_run)
         except Exception as e:
             return Response({'error': str(e)}, status=400)
-    
-    def _import_csv(self, file):
-        decoded_file = file.read().decode('utf-8').splitlines()
-        reader = csv.DictReader(decoded_file)
-        
-        return self._process_import(reader)
-    
-    def _import_excel(self, file):
-        wb = load_workbook(file)
-        ws = wb.active
-        
-        # Get headers from first row
-        headers = [cell.value for cell in ws[1]]
-        
-        # Create list of dictionaries
-        data = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if not any(row):  # Skip empty rows
-                continue
-            row_dict = dict(zip(headers, row))
-            data.append(row_dict)
-        
-        return self._process_import(data)
-    
-    @transaction.atomic
-    def _process_import(self, data):
-        created_count = 0
-        updated_count = 0
-        error_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(data, start=2):
-            try:
-                # Get required fields
-                index_number = str(row.get('Index Number', '')).strip()
-                full_name = str(row.get('Full Name', '')).strip()
-                program_name = str(row.get('Program', '')).strip()
-                level_str = str(row.get('Level', '100')).strip()
-                is_active_str = str(row.get('Status', 'Yes')).strip()
-                
-                # Validate required fields
-                if not index_number or not full_name or not program_name:
-                    errors.append(f"Row {row_num}: Missing required fields")
-                    error_count += 1
-                    continue
-                
-                # Validate and parse level
-                if level_str not in ['100', '200', '300', '400']:
-                    errors.append(f"Row {row_num}: Invalid level '{level_str}'. Must be 100, 200, 300, or 400")
-                    error_count += 1
-                    continue
-                
-                # Get or create program
-                try:
-                    program = Program.objects.get(name=program_name)
-                except Program.DoesNotExist:
-                    errors.append(f"Row {row_num}: Program '{program_name}' not found")
-                    error_count += 1
-                    continue
-                
-                # Parse is_active
-                is_active = is_active_str.lower() in ['yes', 'true', '1', 'active']
-                
-                # Create or update student
-                student, created = Student.objects.update_or_create(
-                    index_number=index_number,
-                    defaults={
-                        'full_name': full_name,
-                        'program': program,
-                        'level': level_str,
-                        'is_active': is_active,
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-                    
-            except Exception as e:
-                errors.append(f"Row {row_num}: {str(e)}")
-                error_count += 1
-        
-        return Response({
-            'success': True,
-            'created': created_count,
-            'updated': updated_count,
-            'errors': error_count,
-            'error_details': errors[:10],  # Limit to first 10 errors
-        })
+        return import_response(request, result, 'student_import_errors.csv')
 
 class DownloadStudentTemplateView(APIView):
     """Download a template Excel file for student import"""
@@ -812,24 +987,20 @@ class DownloadStudentTemplateView(APIView):
         return response
 
 class BulkDeleteStudentsView(APIView):
-    """Bulk delete students"""
+    """
+    Bulk delete students
+    Expects: { student_ids: [int], chunked?: bool }
+    With `chunked`, students are deleted in batches without loading their
+    assessments and scores (see exams.deletion); each batch commits on its own.
+    """
     permission_classes = [IsAuthenticated, IsAdmin]
     
-    @transaction.atomic
+    # Not atomic as a whole: a chunked delete commits batch by batch, and
+    # queryset.delete() runs in its own transaction
     def post(self, request):
-        student_ids = request.data.get('student_ids', [])
-        
-        if not student_ids:
-            return Response(
-                {'error': 'No student IDs provided'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        if not isinstance(student_ids, list):
-            return Response(
-                {'error': 'student_ids must be a list'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        student_ids, error = requested_ids(request, 'student_ids', 'student')
+        if error:
+            return error
         
         try:
             # Get students to delete
@@ -843,11 +1014,15 @@ class BulkDeleteStudentsView(APIView):
                 )
             
             # Delete students
-            students.delete()
+            if request_flag(request, 'chunked'):
+                deleted = delete_students(student_ids)
+            else:
+                deleted = students.delete()[1]
             
             return Response({
                 'success': True,
                 'deleted_count': count,
+                'deleted': deleted,
                 'message': f'Successfully deleted {count} student(s)'
             })
             
@@ -857,17 +1032,54 @@ class BulkDeleteStudentsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )   
 
+
+class BulkDeleteStudentsPreviewView(APIView):
+    """
+    Rows a bulk student delete would remove, per table, from COUNT queries
+    Expects: { student_ids: [int] }
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        student_ids, error = requested_ids(request, 'student_ids', 'student')
+        if error:
+            return error
+        return Response(delete_preview_response(STUDENT_DELETE_PLAN, student_ids))
+
 class StudentGradesView(APIView):
     """Get or export grades for all students"""
+    query_budget = 2
     permission_classes = [IsAuthenticated, IsAdmin]
+    pagination_class = KeysetPagination
+
+    # sort_by -> column; summary columns default to 0 for students
+    # with no StudentGradeSummary row yet
+    SORT_FIELDS = {
+        'index_number': F('index_number'),
+        'full_name': F('full_name'),
+        'program_name': F('program__name'),
+        'level': F('level'),
+        'procedure_score': Coalesce('grade_summary__procedure_score', Value(0)),
+        'procedure_max_score': Coalesce('grade_summary__procedure_max_score', Value(0)),
+        'care_plan_score': Coalesce('grade_summary__care_plan_score', Value(0)),
+        'care_plan_max_score': Coalesce('grade_summary__care_plan_max_score', Value(0)),
+        'total_score': Coalesce('grade_summary__total_score', Value(0)),
+        'max_score': Coalesce('grade_summary__max_score', Value(0)),
+        'percentage': Coalesce('grade_summary__percentage', Value(0.0)),
+        'grade': Coalesce('grade_summary__grade', Value('N/A')),
+        'reconciled_count': Coalesce('grade_summary__reconciled_count', Value(0)),
+    }
 
     def get(self, request):
         export_format = request.query_params.get('export')
 
-        students = self._get_students(request)
-        grades_data = self._build_grades_data(students)
-
         if export_format:
+            if export_format == 'pdf' and wants_background(request):
+                return job_accepted(request, enqueue('grades_pdf', request.user, request.query_params.dict()))
+
+            grades_data = self._iter_grades_data(
+                self.get_export_queryset(request.query_params).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            )
             if export_format == 'csv':
                 return self._export_csv(grades_data)
             elif export_format == 'excel':
@@ -876,104 +1088,51 @@ class StudentGradesView(APIView):
                 return self._export_pdf(grades_data)
             return Response({'error': 'Invalid export format'}, status=400)
 
-        # Sorting
-        sort_by = request.query_params.get('sort_by', 'index_number')
-        order = request.query_params.get('order', 'asc')
-        reverse = order == 'desc'
-        grades_data.sort(key=lambda x: x.get(sort_by, 0), reverse=reverse)
+        # The direction reaches the paginator through get_ordering()
+        sort_by = self.get_sort(request.query_params)[0]
+        students = (
+            self._get_students(request.query_params)
+            .annotate(sort_key=self.SORT_FIELDS[sort_by])
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(students, request, view=self)
+        return paginator.get_paginated_response(list(self._iter_grades_data(page)))
+
+    def get_export_queryset(self, params):
+        """Every student matching the filters, in the requested order (no paging)."""
+        sort_by, descending = self.get_sort(params)
+        ordering = ['-sort_key', '-pk'] if descending else ['sort_key', 'pk']
+        return (
+            self._get_students(params)
+            .annotate(sort_key=self.SORT_FIELDS[sort_by])
+            .order_by(*ordering)
+        )
 
-        return Response(grades_data)
+    def get_sort(self, params):
+        """(sort_by, descending); unknown fields fall back to index_number."""
+        sort_by = params.get('sort_by', 'index_number')
+        if sort_by not in self.SORT_FIELDS:
+            sort_by = 'index_number'
+        return sort_by, params.get('order', 'asc') == 'desc'
+
+    def get_ordering(self, request):
+        """Keyset column for KeysetPagination: the `sort_key` annotation."""
+        return 'sort_key', self.get_sort(request.query_params)[1]
 
     # ------------------------------------------------------------------
     # Core data builders
     # ------------------------------------------------------------------
 
-    def _get_students(self, request):
-        program_id = request.query_params.get('program_id')
-        level = request.query_params.get('level')
-        search = request.query_params.get('search', '')
-
-        procedure_score_subquery = (
-            StudentProcedure.objects
-            .filter(student=OuterRef('pk'), status='reconciled')
-            .values('student')
-            .annotate(
-                total=Sum('reconciled_scores__score')
-            )
-            .values('total')[:1]
-        )
-
-        procedure_max_subquery = (
-            StudentProcedure.objects
-            .filter(student=OuterRef('pk'), status='reconciled')
-            .values('student')
-            .annotate(
-                total=Sum('procedure__total_score')
-            )
-            .values('total')[:1]
-        )
-
-        procedure_count_subquery = (
-            StudentProcedure.objects
-            .filter(student=OuterRef('pk'), status='reconciled')
-            .values('student')
-            .annotate(
-                total=Count('id')
-            )
-            .values('total')[:1]
-        )
-
-        care_plan_score_subquery = (
-            CarePlan.objects
-            .filter(student=OuterRef('pk'))
-            .values('student')
-            .annotate(
-                total=Sum('score')
-            )
-            .values('total')[:1]
-        )
-
-        care_plan_max_subquery = (
-            CarePlan.objects
-            .filter(student=OuterRef('pk'))
-            .values('student')
-            .annotate(
-                total=Sum('max_score')
-            )
-            .values('total')[:1]
-        )
+    def _get_students(self, params):
+        program_id = params.get('program_id')
+        level = params.get('level')
+        search = params.get('search', '')
 
+        # Totals are precomputed in StudentGradeSummary (see exams.grades)
         students = (
             Student.objects
-            .select_related('program')
+            .select_related('program', 'grade_summary')
             .filter(is_active=True)
-            .annotate(
-
-                procedure_score=Coalesce(
-                    Subquery(procedure_score_subquery),
-                    Value(0)
-                ),
-
-                procedure_max_score=Coalesce(
-                    Subquery(procedure_max_subquery),
-                    Value(0)
-                ),
-
-                reconciled_count=Coalesce(
-                    Subquery(procedure_count_subquery),
-                    Value(0)
-                ),
-
-                care_plan_score=Coalesce(
-                    Subquery(care_plan_score_subquery),
-                    Value(0)
-                ),
-
-                care_plan_max_score=Coalesce(
-                    Subquery(care_plan_max_subquery),
-                    Value(0)
-                ),
-            )
         )
 
         if program_id:
@@ -991,75 +1150,39 @@ class StudentGradesView(APIView):
         return students
     
 
-    def _build_grades_data(self, students):
-        grades_data = []
-
+    def _iter_grades_data(self, students):
         for student in students:
-            procedure_score = student.procedure_score or 0
-            procedure_max_score = student.procedure_max_score or 0
-            care_plan_score = student.care_plan_score or 0
-            care_plan_max_score = student.care_plan_max_score or 0
-
-            total_score = procedure_score + care_plan_score
-
-            if care_plan_score > 0:
-                max_score = procedure_max_score + care_plan_max_score
-            else:
-                max_score = procedure_max_score
-
-            # max_score = (
-            #     procedure_max_score + care_plan_max_score
-            #     if care_plan_score > 0
-            #     else procedure_max_score
-            # )
-
-            percentage = (total_score / max_score * 100) if max_score > 0 else 0
+            try:
+                summary = student.grade_summary
+            except StudentGradeSummary.DoesNotExist:
+                # Nothing reconciled or submitted yet
+                summary = apply_totals(StudentGradeSummary(student=student), EMPTY_TOTALS)
 
-            grades_data.append({
+            yield {
                 'student_id': student.id,
                 'index_number': student.index_number,
                 'full_name': student.full_name,
                 'program_name': student.program.name,
                 'program_id': student.program.id,
                 'level': student.level,
-                'procedure_score': round(procedure_score, 2),
-                'procedure_max_score': procedure_max_score,
-                'care_plan_score': care_plan_score,
-                'care_plan_max_score': care_plan_max_score,
-                'total_score': round(total_score, 2),
-                'max_score': max_score,
-                'percentage': round(percentage, 1),
-                'grade': self._calculate_grade(percentage),
-                'reconciled_count': student.reconciled_count,
-                'care_plan_completed': care_plan_score > 0,
-            })
-
-        return grades_data
-    # ------------------------------------------------------------------
-    # Grade logic
-    # ------------------------------------------------------------------
-
-    def _calculate_grade(self, percentage):
-        if percentage >= 80:
-            return 'Distinction'
-        elif percentage >= 70:
-            return 'Credit'
-        elif percentage >= 60:
-            return 'Pass'
-        elif percentage == 0:
-            return 'N/A'
-        return 'Fail'
+                'procedure_score': summary.procedure_score,
+                'procedure_max_score': summary.procedure_max_score,
+                'care_plan_score': summary.care_plan_score,
+                'care_plan_max_score': summary.care_plan_max_score,
+                'total_score': summary.total_score,
+                'max_score': summary.max_score,
+                'percentage': round(summary.percentage, 1),
+                'grade': summary.grade,
+                'reconciled_count': summary.reconciled_count,
+                'care_plan_completed': summary.care_plan_score > 0,
+            }
 
     # ------------------------------------------------------------------
     # Export handlers
     # ------------------------------------------------------------------
 
     def _export_csv(self, data):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="student_grades.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
+        header = [
             'Index Number',
             'Full Name',
             'Program',
@@ -1070,10 +1193,9 @@ class StudentGradesView(APIView):
             'Percentage (%)',
             'Grade',
             # 'Procedure Progress',
-        ])
-
-        for item in data:
-            writer.writerow([
+        ]
+        rows = (
+            [
                 item['index_number'],
                 item['full_name'],
                 item['program_name'],
@@ -1084,15 +1206,12 @@ class StudentGradesView(APIView):
                 item['percentage'],
                 item['grade'],
                 # item['progress'],
-            ])
-
-        return response
+            ]
+            for item in data
+        )
+        return stream_csv('student_grades.csv', header, rows)
 
     def _export_excel(self, data):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Student Grades"
-
         headers = [
             'Index Number',
             'Full Name',
@@ -1105,13 +1224,8 @@ class StudentGradesView(APIView):
             'Grade',
             # 'Procedure Progress',
         ]
-        ws.append(headers)
-
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-
-        for item in data:
-            ws.append([
+        rows = (
+            [
                 item['index_number'],
                 item['full_name'],
                 item['program_name'],
@@ -1122,32 +1236,16 @@ class StudentGradesView(APIView):
                 item['percentage'],
                 item['grade'],
                 # item['progress'],
-            ])
-
-        for column in ws.columns:
-            max_length = max(len(str(cell.value)) for cell in column if cell.value)
-            ws.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
-
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            ]
+            for item in data
         )
-        response['Content-Disposition'] = 'attachment; filename="student_grades.xlsx"'
-        wb.save(response)
-
-        return response
+        return stream_excel('student_grades.xlsx', 'Student Grades', headers, rows)
 
     def _export_pdf(self, data):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="student_grades.pdf"'
-
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        styles = getSampleStyleSheet()
-        elements = []
-
-        elements.append(Paragraph("Student Grades Report", styles['Title']))
-        elements.append(Paragraph("<br/><br/>", styles['Normal']))
+        return pdf_response('student_grades.pdf', lambda output: self._write_pdf(data, output))
 
-        table_data = [[
+    def _write_pdf(self, data, output):
+        header = [
             'Index Number',
             'Full Name',
             'Program',
@@ -1158,10 +1256,9 @@ class StudentGradesView(APIView):
             'Percentage (%)',
             'Grade',
             # 'Procedure Progress',
-        ]]
-
-        for item in data:
-            table_data.append([
+        ]
+        rows = (
+            [
                 item['index_number'],
                 item['full_name'],
                 item['program_name'],
@@ -1172,23 +1269,29 @@ class StudentGradesView(APIView):
                 f"{item['percentage']}%",
                 item['grade'],
                 # item['progress'],
-            ])
+            ]
+            for item in data
+        )
 
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ]))
+        report = PdfReport(output, "Student Grades Report")
+        report.table(header, rows, style=GRID_STYLE)
+        report.save()
 
-        elements.append(table)
-        doc.build(elements)
 
-        return response
+class TranscriptExportView(APIView):
+    """
+    POST endpoint queueing a ZIP of per-student transcript PDFs
+    Expects: { program_id?: int, level?: str, search?: str, sort_by?: str, order?: str }
+    Takes the same filters as the grades page; the ZIP is built by the job
+    worker (see exams.transcripts) and downloaded from the job.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    FILTERS = ['program_id', 'level', 'search', 'sort_by', 'order']
+
+    def post(self, request, *args, **kwargs):
+        params = {key: str(request.data[key]) for key in self.FILTERS if request.data.get(key)}
+        return job_accepted(request, enqueue('transcripts_zip', request.user, params))
 
 # =====================PROCEDURE IMPORT VIEWS============================
 class ProcedureViewSet(viewsets.ModelViewSet):
@@ -1211,18 +1314,16 @@ class ProcedureViewSet(viewsets.ModelViewSet):
         if export_format:
             return self._handle_export(request, export_format)
         
-        # Normal list behavior
-        return super().list(request, *args, **kwargs)
+        return Response(cached('admin-procedures', lambda: list(
+            ProcedureAdminListSerializer(self.filter_queryset(self.get_queryset()), many=True).data
+        )))
     
     def _handle_export(self, request, export_format):
         """Handle export requests"""
-        program_id = request.query_params.get('program_id')
-        
-        # Get procedures
-        procedures = Procedure.objects.select_related('program').prefetch_related('steps').all()
-        
-        if program_id and program_id != 'all':
-            procedures = procedures.filter(program_id=program_id)
+        if export_format == 'excel' and wants_background(request):
+            return job_accepted(request, enqueue('procedures_excel', request.user, request.query_params.dict()))
+
+        procedures = self.get_export_queryset(request.query_params)
         
         if export_format == 'excel':
             return self._export_excel(procedures)
@@ -1233,198 +1334,142 @@ class ProcedureViewSet(viewsets.ModelViewSet):
         else:
             return Response({'error': 'Invalid format'}, status=400)
     
-    def _export_excel(self, procedures):
-        """Export procedures and steps in a multi-sheet Excel file"""
+    def get_export_queryset(self, params):
+        program_id = params.get('program_id')
         
-        wb = Workbook()
+        # Get procedures
+        procedures = Procedure.objects.select_related('program').prefetch_related('steps').all()
         
+        if program_id and program_id != 'all':
+            procedures = procedures.filter(program_id=program_id)
+        return procedures
+    
+    def _export_excel(self, procedures):
+        """Export procedures and steps in a multi-sheet Excel file"""
+        return self._build_excel(procedures).response("procedures_and_steps.xlsx")
+    
+    def _build_excel(self, procedures):
+        export = ExcelExport()
+        header_font = Font(bold=True, color="FFFFFF")
+
         # Sheet 1: Procedures
-        wb.active.title = "Procedures"
-        ws_proc = wb.active
-        
-        proc_headers = ['Name', 'Program', 'Total Score', 'Steps Count']
-        ws_proc.append(proc_headers)
-        
-        # Style headers
-        for cell in ws_proc[1]:
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        
-        # Add procedures
-        for proc in procedures:
-            ws_proc.append([
-                proc.name,
-                proc.program.name,
-                proc.total_score,
-                proc.steps.count(),
-            ])
-        
-        # Adjust column widths
-        for column in ws_proc.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws_proc.column_dimensions[column_letter].width = adjusted_width
-        
+        procedure_rows = (
+            [proc.name, proc.program.name, proc.total_score, proc.steps_count]
+            for proc in (
+                procedures.prefetch_related(None)
+                .annotate(steps_count=Count('steps'))
+                .order_by('pk')
+                .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            )
+        )
+        export.add_sheet(
+            "Procedures", ['Name', 'Program', 'Total Score', 'Steps Count'], procedure_rows,
+            header_font=header_font, header_fill="4472C4",
+        )
+
         # Sheet 2: Procedure Steps
-        ws_steps = wb.create_sheet("Procedure Steps")
-        
-        step_headers = ['Procedure Name', 'Step Order', 'Description']
-        ws_steps.append(step_headers)
-        
-        # Style headers
-        for cell in ws_steps[1]:
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
-        
-        # Add steps
-        for proc in procedures:
-            for step in proc.steps.all().order_by('step_order'):
-                ws_steps.append([
-                    proc.name,
-                    step.step_order,
-                    step.description,
-                ])
-        
-        # Adjust column widths
-        for column in ws_steps.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 80)
-            ws_steps.column_dimensions[column_letter].width = adjusted_width
-        
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        step_rows = (
+            [step['procedure__name'], step['step_order'], step['description']]
+            for step in (
+                ProcedureStep.objects
+                .filter(procedure__in=procedures.values('pk'))
+                .order_by('procedure_id', 'step_order')
+                .values('procedure__name', 'step_order', 'description')
+                .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            )
         )
-        response['Content-Disposition'] = 'attachment; filename="procedures_and_steps.xlsx"'
-        wb.save(response)
-        
-        return response
+        export.add_sheet(
+            "Procedure Steps", ['Procedure Name', 'Step Order', 'Description'], step_rows,
+            max_width=80, header_font=header_font, header_fill="70AD47",
+        )
+        return export
     
     def _export_csv(self, procedures):
         """Export procedures and steps as CSV (combined format)"""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="procedures_and_steps.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Procedure Name', 'Program', 'Total Score', 
-            'Step Order', 'Step Description'
-        ])
-        
-        for proc in procedures:
-            steps = proc.steps.all().order_by('step_order')
-            if steps.exists():
-                for step in steps:
-                    writer.writerow([
+        procedures = procedures.prefetch_related(None).prefetch_related(
+            Prefetch('steps', queryset=ProcedureStep.objects.order_by('step_order'), to_attr='ordered_steps')
+        )
+
+        def rows():
+            for proc in procedures.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                if proc.ordered_steps:
+                    for step in proc.ordered_steps:
+                        yield [
+                            proc.name,
+                            proc.program.name,
+                            proc.total_score,
+                            step.step_order,
+                            step.description,
+                        ]
+                else:
+                    # Procedure with no steps
+                    yield [
                         proc.name,
                         proc.program.name,
                         proc.total_score,
-                        step.step_order,
-                        step.description,
-                    ])
-            else:
-                # Procedure with no steps
-                writer.writerow([
-                    proc.name,
-                    proc.program.name,
-                    proc.total_score,
-                    '',
-                    '',
-                ])
-        
-        return response
+                        '',
+                        '',
+                    ]
+
+        return stream_csv(
+            'procedures_and_steps.csv',
+            ['Procedure Name', 'Program', 'Total Score', 'Step Order', 'Step Description'],
+            rows(),
+        )
     
     def _export_pdf(self, procedures):
         """Export procedures and steps as PDF"""
-        
-        
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="procedures_and_steps.pdf"'
-        
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title = Paragraph("Procedures and Steps", styles['Title'])
-        elements.append(title)
-        elements.append(Spacer(1, 20))
-        
-        for proc in procedures:
-            # Procedure header
-            proc_title = Paragraph(
-                f"<b>{proc.name}</b> - {proc.program.name} (Total Score: {proc.total_score})",
-                styles['Heading2']
-            )
-            elements.append(proc_title)
-            elements.append(Spacer(1, 10))
-            
-            # Steps table
-            steps = proc.steps.all().order_by('step_order')
-            if steps.exists():
-                table_data = [['Step', 'Description']]
-                
-                for step in steps:
-                    table_data.append([
-                        str(step.step_order),
-                        step.description,
-                    ])
-                
-                table = Table(table_data, colWidths=[50, 450])
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('FONTSIZE', (0, 1), (-1, -1), 8),
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ]))
-                
-                elements.append(table)
-            else:
-                elements.append(Paragraph("<i>No steps defined</i>", styles['Normal']))
-            
-            elements.append(Spacer(1, 20))
-        
-        doc.build(elements)
-        return response
+        procedures = procedures.prefetch_related(None).prefetch_related(
+            Prefetch('steps', queryset=ProcedureStep.objects.order_by('step_order'), to_attr='ordered_steps')
+        )
+        style = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]
+
+        def write(output):
+            report = PdfReport(output, "Procedures and Steps")
+            for proc in procedures.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                title = f"<b>{escape(proc.name)}</b> - {escape(proc.program.name)} (Total Score: {proc.total_score})"
+                if proc.ordered_steps:
+                    report.table(
+                        ['Step', 'Description'],
+                        ([str(step.step_order), step.description] for step in proc.ordered_steps),
+                        col_widths=[50, 450],
+                        style=style,
+                        title=title,
+                    )
+                else:
+                    report.paragraph(title, 'Heading2')
+                    report.paragraph("<i>No steps defined</i>")
+                report.spacer(20)
+            report.save()
+
+        return pdf_response('procedures_and_steps.pdf', write)
 
 class BulkDeleteProceduresView(APIView):
-    """Bulk delete procedures"""
+    """
+    Bulk delete procedures
+    Expects: { procedure_ids: [int], chunked?: bool }
+    With `chunked`, procedures are deleted in batches without loading their
+    steps, assessments and scores (see exams.deletion); each batch commits on its own.
+    """
     permission_classes = [IsAuthenticated, IsAdmin]
     
-    @transaction.atomic
+    # Not atomic as a whole: a chunked delete commits batch by batch, and
+    # queryset.delete() runs in its own transaction
     def post(self, request):
-        procedure_ids = request.data.get('procedure_ids', [])
-        
-        if not procedure_ids:
-            return Response(
-                {'error': 'No procedure IDs provided'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        if not isinstance(procedure_ids, list):
-            return Response(
-                {'error': 'procedure_ids must be a list'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        procedure_ids, error = requested_ids(request, 'procedure_ids', 'procedure')
+        if error:
+            return error
         
         try:
             # Get procedures to delete
@@ -1438,11 +1483,15 @@ class BulkDeleteProceduresView(APIView):
                 )
             
             # Delete procedures
-            procedures.delete()
+            if request_flag(request, 'chunked'):
+                deleted = delete_procedures(procedure_ids)
+            else:
+                deleted = procedures.delete()[1]
             
             return Response({
                 'success': True,
                 'deleted_count': count,
+                'deleted': deleted,
                 'message': f'Successfully deleted {count} procedure(s)'
             })
             
@@ -1451,6 +1500,20 @@ class BulkDeleteProceduresView(APIView):
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )  
+
+
+class BulkDeleteProceduresPreviewView(APIView):
+    """
+    Rows a bulk procedure delete would remove, per table, from COUNT queries
+    Expects: { procedure_ids: [int] }
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        procedure_ids, error = requested_ids(request, 'procedure_ids', 'procedure')
+        if error:
+            return error
+        return Response(delete_preview_response(PROCEDURE_DELETE_PLAN, procedure_ids))
            
 class ImportProceduresView(APIView):
     """Import procedures and steps from Excel file (multi-sheet)"""
@@ -1464,286 +1527,24 @@ class ImportProceduresView(APIView):
         file_extension = file.name.split('.')[-1].lower()
         
         if file_extension == 'csv':
-            return self._import_csv(file)
+            importer = import_procedures_csv
         elif file_extension in ['xlsx', 'xls']:
-            return self._import_excel(file)
+            importer = import_procedures_excel
         else:
             return Response({'error': 'Invalid file format. Use CSV or Excel.'}, status=400)
-    
-    def _import_csv(self, file):
-        """Import from CSV (combined format)"""
-        try:
-            decoded_file = file.read().decode('utf-8').splitlines()
-        except UnicodeDecodeError:
-            return Response({'error': 'File encoding error. Please save as UTF-8.'}, status=400)
-        
-        reader = csv.DictReader(decoded_file)
-        
-        procedures_created = 0
-        procedures_updated = 0
-        steps_created = 0
-        steps_updated = 0
-        errors = []
-        
-        # Group by procedure
-        procedures_data = {}
-        
-        try:
-            for row_num, row in enumerate(reader, start=2):
-                proc_name = row.get('Procedure Name', '').strip()
-                program_name = row.get('Program', '').strip()
-                total_score_str = row.get('Total Score', '').strip()
-                step_order_str = row.get('Step Order', '').strip()
-                step_desc = row.get('Step Description', '').strip()
-                
-                if not proc_name:
-                    continue
-                
-                if proc_name not in procedures_data:
-                    procedures_data[proc_name] = {
-                        'program_name': program_name,
-                        'total_score': total_score_str,
-                        'steps': []
-                    }
-                
-                if step_order_str and step_desc:
-                    try:
-                        step_order = int(step_order_str)
-                        procedures_data[proc_name]['steps'].append({
-                            'order': step_order,
-                            'description': step_desc
-                        })
-                    except ValueError:
-                        errors.append(f"Row {row_num}: Invalid step order '{step_order_str}'")
-            
-            # Process procedures
-            with transaction.atomic():
-                for proc_name, data in procedures_data.items():
-                    try:
-                        # Validate total_score
-                        try:
-                            total_score = int(data['total_score'])
-                        except (ValueError, TypeError):
-                            errors.append(f"Procedure '{proc_name}': Invalid total score '{data['total_score']}'")
-                            continue
-                        
-                        # Check if program is specified
-                        if not data['program_name']:
-                            # Shared procedure - create for ALL programs
-                            programs = Program.objects.all()
-                            if not programs.exists():
-                                errors.append(f"Procedure '{proc_name}': No programs found in database")
-                                continue
-                        else:
-                            # Specific program
-                            try:
-                                programs = [Program.objects.get(name=data['program_name'])]
-                            except Program.DoesNotExist:
-                                errors.append(f"Procedure '{proc_name}': Program '{data['program_name']}' not found")
-                                continue
-                        
-                        # Create or update procedure for each program
-                        for program in programs:
-                            procedure, proc_created = Procedure.objects.update_or_create(
-                                name=proc_name,
-                                program=program,
-                                defaults={'total_score': total_score}
-                            )
-                            
-                            if proc_created:
-                                procedures_created += 1
-                            else:
-                                procedures_updated += 1
-                            
-                            # Create or update steps
-                            for step_data in data['steps']:
-                                step, step_created = ProcedureStep.objects.update_or_create(
-                                    procedure=procedure,
-                                    step_order=step_data['order'],
-                                    defaults={'description': step_data['description']}
-                                )
-                                
-                                if step_created:
-                                    steps_created += 1
-                                else:
-                                    steps_updated += 1
-                    
-                    except Exception as e:
-                        errors.append(f"Procedure '{proc_name}': {str(e)}")
-            
-            return Response({
-                'success': True,
-                'procedures_created': procedures_created,
-                'procedures_updated': procedures_updated,
-                'steps_created': steps_created,
-                'steps_updated': steps_updated,
-                'errors': len(errors),
-                'error_details': errors[:20],  # Show up to 20 errors
-            })
         
-        except Exception as e:
-            return Response({'error': f'Import failed: {str(e)}'}, status=400)
-    
-    def _import_excel(self, file):
-        """Import from Excel (multi-sheet format)"""        
-        try:
-            wb = load_workbook(file, data_only=True)
-        except Exception as e:
-            return Response({'error': f'Failed to read Excel file: {str(e)}'}, status=400)
-        
-        procedures_created = 0
-        procedures_updated = 0
-        steps_created = 0
-        steps_updated = 0
-        errors = []
-    
-        procedures_dict = {}
+        dry_run = request_flag(request, 'dry_run')
+        if wants_background(request):
+            job = enqueue(
+                'import_procedures', request.user, {'file_extension': file_extension, 'dry_run': dry_run}, upload=file
+            )
+            return job_accepted(request, job)
         
         try:
-            with transaction.atomic():
-                # Import Procedures (Sheet 1)
-                if 'Procedures' in wb.sheetnames:
-                    ws_proc = wb['Procedures']
-                    
-                    for row_num, row in enumerate(ws_proc.iter_rows(min_row=2, values_only=True), start=2):
-                        if not any(row):
-                            continue
-                        
-                        try:
-                            proc_name = str(row[0]).strip() if row[0] else ''
-                            program_name = str(row[1]).strip() if row[1] else ''
-                            
-                            # Handle total_score
-                            try:
-                                total_score = int(row[2]) if row[2] else 0
-                            except (ValueError, TypeError):
-                                errors.append(f"Procedures Row {row_num}: Invalid total score '{row[2]}'")
-                                continue
-                            
-                            if not proc_name:
-                                errors.append(f"Procedures Row {row_num}: Missing procedure name")
-                                continue
-                            
-                            # Check if program is specified
-                            if not program_name:
-                                # Shared procedure - create for ALL programs
-                                programs = Program.objects.all()
-                                if not programs.exists():
-                                    errors.append(f"Procedures Row {row_num}: No programs found in database")
-                                    continue
-                            else:
-                                # Specific program
-                                try:
-                                    programs = [Program.objects.get(name=program_name)]
-                                except Program.DoesNotExist:
-                                    errors.append(f"Procedures Row {row_num}: Program '{program_name}' not found")
-                                    continue
-                            
-                            # Create or update procedure for each program
-                            for program in programs:
-                                procedure, created = Procedure.objects.update_or_create(
-                                    name=proc_name,
-                                    program=program,
-                                    defaults={'total_score': total_score}
-                                )
-                                
-                                # Store for step import - use (proc_name, program.name) as key
-                                procedures_dict[(proc_name, program.name)] = procedure
-                                # Also store with empty program name for shared procedures
-                                if not program_name:
-                                    procedures_dict[(proc_name, '')] = procedure
-                                
-                                if created:
-                                    procedures_created += 1
-                                else:
-                                    procedures_updated += 1
-                        
-                        except Exception as e:
-                            errors.append(f"Procedures Row {row_num}: {str(e)}")
-                else:
-                    return Response({'error': 'Sheet "Procedures" not found in Excel file'}, status=400)
-                
-                # Import Procedure Steps (Sheet 2)
-                if 'Procedure Steps' in wb.sheetnames:
-                    ws_steps = wb['Procedure Steps']
-                    
-                    for row_num, row in enumerate(ws_steps.iter_rows(min_row=2, values_only=True), start=2):
-                        if not any(row):
-                            continue
-                        
-                        try:
-                            proc_name = str(row[0]).strip() if row[0] else ''
-                            
-                            # Handle step_order
-                            try:
-                                step_order = int(row[1]) if row[1] else 0
-                            except (ValueError, TypeError):
-                                errors.append(f"Steps Row {row_num}: Invalid step order '{row[1]}'")
-                                continue
-                            
-                            description = str(row[2]).strip() if row[2] else ''
-                            
-                            if not proc_name or not description:
-                                errors.append(f"Steps Row {row_num}: Missing procedure name or description")
-                                continue
-                            
-                            # Find all matching procedures (could be multiple if shared across programs)
-                            matching_procedures = []
-                            
-                            # First, check if this is a shared procedure
-                            if (proc_name, '') in procedures_dict:
-                                # This is a shared procedure - get all instances
-                                for key, proc in procedures_dict.items():
-                                    if key[0] == proc_name:
-                                        matching_procedures.append(proc)
-                            else:
-                                # Look for specific program procedures
-                                for key, proc in procedures_dict.items():
-                                    if key[0] == proc_name:
-                                        matching_procedures.append(proc)
-                            
-                            # If not found in dict, try database
-                            if not matching_procedures:
-                                try:
-                                    matching_procedures = list(Procedure.objects.filter(name=proc_name))
-                                except Procedure.DoesNotExist:
-                                    pass
-                            
-                            if not matching_procedures:
-                                errors.append(f"Steps Row {row_num}: Procedure '{proc_name}' not found")
-                                continue
-                            
-                            # Create or update step for each matching procedure
-                            for procedure in matching_procedures:
-                                step, created = ProcedureStep.objects.update_or_create(
-                                    procedure=procedure,
-                                    step_order=step_order,
-                                    defaults={'description': description}
-                                )
-                                
-                                if created:
-                                    steps_created += 1
-                                else:
-                                    steps_updated += 1
-                        
-                        except Exception as e:
-                            errors.append(f"Steps Row {row_num}: {str(e)}")
-                else:
-                    # Steps sheet is optional
-                    pass
-            
-            return Response({
-                'success': True,
-                'procedures_created': procedures_created,
-                'procedures_updated': procedures_updated,
-                'steps_created': steps_created,
-                'steps_updated': steps_updated,
-                'errors': len(errors),
-                'error_details': errors[:20],  # Show up to 20 errors
-            })
-        
-        except Exception as e:
-            return Response({'error': f'Import failed: {str(e)}'}, status=400)
+            result = importer(file, dry_run=dry_run)
+        except ImportFailed as e:
+            return Response({'error': str(e)}, status=400)
+        return import_response(request, result, 'procedure_import_errors.csv')
 
 class DownloadProcedureTemplateView(APIView):
     """Download template for procedures and steps import"""
@@ -1874,95 +1675,12 @@ class ImportProcedureStepsView(APIView):
         except Procedure.DoesNotExist:
             return Response({'error': 'Procedure not found'}, status=404)
         
+        dry_run = request_flag(request, 'dry_run')
         try:
-            if file_extension == 'csv':
-                return self._import_csv(file, procedure)
-            else:
-                return self._import_excel(file, procedure)
+            result = import_procedure_steps(procedure, ImportRows(file, file_extension), dry_run=dry_run)
         except Exception as e:
             return Response({'error': str(e)}, status=400)
-    
-    def _import_csv(self, file, procedure):        
-        try:
-            decoded_file = file.read().decode('utf-8').splitlines()
-        except UnicodeDecodeError:
-            return Response({'error': 'File encoding error. Please save as UTF-8.'}, status=400)
-        
-        reader = csv.DictReader(decoded_file)
-        return self._process_import(reader, procedure)
-    
-    def _import_excel(self, file, procedure):        
-        try:
-            wb = load_workbook(file, data_only=True)
-            ws = wb.active
-        except Exception as e:
-            return Response({'error': f'Failed to read Excel file: {str(e)}'}, status=400)
-        
-        # Get headers from first row
-        headers = [cell.value for cell in ws[1]]
-        
-        # Create list of dictionaries
-        data = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if not any(row):  # Skip empty rows
-                continue
-            row_dict = dict(zip(headers, row))
-            data.append(row_dict)
-        
-        return self._process_import(data, procedure)
-    
-    @transaction.atomic
-    def _process_import(self, data, procedure):
-        created_count = 0
-        updated_count = 0
-        error_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(data, start=2):
-            try:
-                # Get fields
-                step_order_str = str(row.get('Step Order', '')).strip()
-                description = str(row.get('Description', '')).strip()
-                
-                # Validate required fields
-                if not step_order_str or not description:
-                    errors.append(f"Row {row_num}: Missing step order or description")
-                    error_count += 1
-                    continue
-                
-                # Parse step order
-                try:
-                    step_order = int(step_order_str)
-                except ValueError:
-                    errors.append(f"Row {row_num}: Invalid step order '{step_order_str}'")
-                    error_count += 1
-                    continue
-                
-                # Create or update step
-                step, created = ProcedureStep.objects.update_or_create(
-                    procedure=procedure,
-                    step_order=step_order,
-                    defaults={
-                        'description': description,
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-                    
-            except Exception as e:
-                errors.append(f"Row {row_num}: {str(e)}")
-                error_count += 1
-        
-        return Response({
-            'success': True,
-            'created': created_count,
-            'updated': updated_count,
-            'errors': error_count,
-            'error_details': errors[:20],  # Limit to first 20 errors
-        })
+        return import_response(request, result, 'step_import_errors.csv')
 
 class DownloadProcedureStepsTemplateView(APIView):
     """Download template for procedure steps import"""
@@ -2053,6 +1771,13 @@ class ProgramViewSet(viewsets.ModelViewSet):
     serializer_class = ProgramSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
 
+    def list(self, request, *args, **kwargs):
+        return Response(cached_program_list())
+
+
+def cached_program_list():
+    return cached('programs', lambda: list(ProgramSerializer(Program.objects.all(), many=True).data))
+
 class CarePlanView(APIView):
     """Get or create care plan for a student"""
     permission_classes = [IsAuthenticated]
@@ -2092,8 +1817,89 @@ class CarePlanView(APIView):
                 examiner=request.user,
                 is_locked=True
             )
+            refresh_grade_summaries([care_plan.student_id])
             return Response(
                 CarePlanSerializer(care_plan).data,
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# ======================= BACKGROUND JOBS ==========================
+
+def request_flag(request, name):
+    """True when the client sent ?<name>=1 (or a `<name>` form field)."""
+    value = request.query_params.get(name) or request.data.get(name)
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def requested_ids(request, field, noun):
+    """(ids, None) for the list of ids in `field`, or (None, error response)."""
+    ids = request.data.get(field, [])
+
+    if not ids:
+        return None, Response(
+            {'error': f'No {noun} IDs provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if not isinstance(ids, list):
+        return None, Response(
+            {'error': f'{field} must be a list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return ids, None
+
+
+def delete_preview_response(plan, ids):
+    deleted = preview_delete(plan, ids)
+    return {'total': sum(deleted.values()), 'deleted': deleted}
+
+
+def wants_background(request):
+    return request_flag(request, 'background')
+
+
+def import_response(request, result, filename):
+    """
+    An import summary, or for a dry run with ?report=csv the full error
+    report as a CSV download.
+    """
+    if result.get('dry_run') and request.query_params.get('report') == 'csv':
+        return stream_csv(filename, ERROR_REPORT_HEADER, error_report_rows(result))
+    return Response(result)
+
+
+def job_accepted(request, job):
+    """202 response pointing the client at the job's status endpoint."""
+    return Response(BackgroundJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+class BackgroundJobView(RetrieveAPIView):
+    """Poll a background job's status and progress"""
+    serializer_class = BackgroundJobSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_url_kwarg = 'job_id'
+
+    def get_queryset(self):
+        jobs = BackgroundJob.objects.all()
+        if self.request.user.role != 'admin':
+            jobs = jobs.filter(created_by=self.request.user)
+        return jobs
+
+
+class BackgroundJobDownloadView(BackgroundJobView):
+    """Download the file produced by a finished export job"""
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != 'succeeded' or not job.artifact:
+            return Response(
+                {'detail': 'This job has no file to download yet.', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            job.artifact.open('rb'),
+            as_attachment=True,
+            filename=(job.result or {}).get('filename') or os.path.basename(job.artifact.name),
+        )
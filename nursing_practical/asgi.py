@@ -2,6 +2,8 @@
 ASGI config for nursing_practical project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn nursing_practical.asgi:application``)
+for the live assessment event stream, which holds one connection per tablet.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -62,6 +62,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it times the whole request; inactive unless QUERY_INSTRUMENTATION
+    'exams.instrumentation.QueryBudgetMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -112,6 +114,51 @@ DATABASES = {
 }
 
 
+# Cache
+# Reference data (programs, procedures, steps) is cached here. Set REDIS_URL
+# (e.g. redis://localhost:6379/1, needs the `redis` package) to share it
+# between worker processes; the in-process default suits a single process.
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a cached reference entry lives; invalidation makes it unreachable sooner
+REFERENCE_CACHE_TIMEOUT = int(os.getenv("REFERENCE_CACHE_TIMEOUT", 60 * 60))
+# Seconds the admin dashboard statistics are cached; writes drop them sooner
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", 30))
+
+
+# Live assessment events (GET /api/exams/events/, needs an ASGI server)
+# Seconds between each process's reads of new events
+EVENT_STREAM_POLL_INTERVAL = float(os.getenv("EVENT_STREAM_POLL_INTERVAL", 1))
+# Seconds between keep-alive comments on an idle stream
+EVENT_STREAM_HEARTBEAT = float(os.getenv("EVENT_STREAM_HEARTBEAT", 15))
+# Seconds before a stream ends; the client reconnects with Last-Event-ID
+EVENT_STREAM_TIMEOUT = float(os.getenv("EVENT_STREAM_TIMEOUT", 5 * 60))
+# Reconnection delay suggested to clients, in milliseconds
+EVENT_STREAM_RETRY_MS = int(os.getenv("EVENT_STREAM_RETRY_MS", 3000))
+# Seconds a stream ticket (POST /api/exams/events/tickets/) stays usable
+EVENT_STREAM_TICKET_TIMEOUT = int(os.getenv("EVENT_STREAM_TICKET_TIMEOUT", 30))
+
+
+# Query instrumentation (exams.instrumentation): per-view query counts and
+# timings in a Server-Timing header and at /api/exams/admin/query-stats/
+QUERY_INSTRUMENTATION = os.getenv("QUERY_INSTRUMENTATION", "false").lower() in ("1", "true", "yes")
+# Raise instead of logging when a request exceeds its view's query_budget
+QUERY_BUDGETS_ENFORCED = os.getenv("QUERY_BUDGETS_ENFORCED", "false").lower() in ("1", "true", "yes")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -150,6 +197,9 @@ STATIC_URL = 'staticfiles/'
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Uploaded import files and generated exports of background jobs
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", BASE_DIR / "media")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 